@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Mines a corpus of WHILE and E-WHILE programs for candidate rewrite rules (see
+minimal_compiler/src/optimiser/pattern_miner.py).
+
+Usage:
+    python mine_patterns.py [<file or directory> ...] [options]
+
+Options:
+    -O0 to -O3: Mine the programs after the passes of this optimisation level (default: -O1)
+    --top=<n>: Number of candidates written (default: 20)
+    --window=<n>: Longest window of consecutive statements counted (default: 4)
+    --min-count=<n>: Candidates occur at least n times (default: 2)
+    --output=<file>: Writes the candidates to a file instead of printing them
+"""
+
+import sys
+from minimal_compiler.src.generator.template_loader import set_path_explicitly
+from minimal_compiler.src.optimiser.pattern_miner import MAX_WINDOW, candidate_rules, mine
+
+# the transpiler outputs (E-WHILE samples), the self-compiler and the samples
+DEFAULT_CORPUS = [
+    "./bootstrapping/selfcompiler.while",
+    "./minimal_compiler/samples",
+    "./self_compiler/samples",
+    "./transpiler/samples",
+]
+
+
+def main():
+    sys.setrecursionlimit(1000000)  # needed for the E-WHILE transpiler (deep ANTLR ParseTree structure)
+    set_path_explicitly("./minimal_compiler/src/generator/templates/")
+
+    paths, level, top, window, min_count, output = [], 1, 20, MAX_WINDOW, 2, None
+    for arg in sys.argv[1:]:
+        if arg in ("-O0", "-O1", "-O2", "-O3"):
+            level = int(arg[2])
+        elif arg.startswith("--top="):
+            top = int(arg[len("--top="):])
+        elif arg.startswith("--window="):
+            window = int(arg[len("--window="):])
+        elif arg.startswith("--min-count="):
+            min_count = int(arg[len("--min-count="):])
+        elif arg.startswith("--output="):
+            output = arg[len("--output="):]
+        else:
+            paths.append(arg)
+
+    miner = mine(paths or DEFAULT_CORPUS, level, window, log=lambda message: print(message, file=sys.stderr))
+    rules = candidate_rules(miner.ranked(min_count)[:top], miner.files)
+    if output is None:
+        print(rules, end="")
+    else:
+        with open(output, "w") as file:
+            file.write(rules)
+        print(f"Candidates written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import hashlib
+import os
+from minimal_compiler.src.cache.ir_format import serialize_ir, deserialize_ir, IRFormatException, FORMAT_VERSION
+
+
+class IRCache:
+    """
+    Content-addressed on-disk cache of optimised IR (see ir_format for the encoding).
+
+    The key of an entry is a hash over the source text, the versions of the optimisers which
+    were applied (see OptimiserManager.version) and the format version, so compiling an
+    unchanged file with the same optimisers skips lexing, parsing and optimisation. Changing the
+    source, an optimiser or the format simply leads to a new key; stale entries are never read.
+    """
+
+    SUFFIX = ".wir"
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def key(self, source, optimiser_version):
+        """Key of a source text (str or bytes) compiled with the given optimiser version."""
+        digest = self.digest(optimiser_version)
+        digest.update(source.encode() if isinstance(source, str) else source)
+        return digest.hexdigest()
+
+    def file_key(self, filepath, optimiser_version):
+        """Key of a source file, which is hashed in chunks instead of being read at once."""
+        digest = self.digest(optimiser_version)
+        with open(filepath, "rb") as file:
+            for chunk in iter(lambda: file.read(self.CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def digest(self, optimiser_version):
+        return hashlib.sha256(f"{FORMAT_VERSION}:{optimiser_version}:".encode())
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def load(self, key):
+        """Returns (ast, symbol_table, constant_table) of the entry or None if there is no valid entry."""
+        try:
+            with open(self.path(key), "rb") as file:
+                data = file.read()
+        except OSError:
+            return None
+
+        try:
+            return deserialize_ir(data)
+        except IRFormatException:
+            return None
+
+    def store(self, key, ast, symbol_table, constant_table):
+        data = serialize_ir(ast, symbol_table, constant_table)
+        os.makedirs(self.directory, exist_ok=True)
+
+        # write to a temporary file first, so a concurrent or interrupted run never sees half an entry
+        path = self.path(key)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+        os.replace(temporary_path, path)
+        return path
@@ -0,0 +1,258 @@
+"""
+Compact binary encoding of the tree-IR together with its symbol table and constant table.
+
+Layout (all integers are unsigned LEB128 varints):
+
+    magic "WIR" + FORMAT_VERSION (1 byte)
+    strings:    count, then per string: byte length + utf-8 bytes (operators, reasons of empty nodes)
+    constants:  count, then per constant: byte length + little endian bytes (arbitrary size)
+    symbols:    count, then per variable: variable id + flags (see SymbolTable, in order of declaration)
+    constant table: count, then per entry: constant index (in the order of the table)
+    nodes:      the statement of the ProgramNode in pre-order, see the OP_* codes
+
+Variables are stored as their id, strings and constants are stored once in the pools and
+referenced by their index, which keeps the repetitive IR of large programs (e.g. the
+self-compiler) small.
+Encoding and decoding use an explicit stack, so arbitrarily deep nesting is supported.
+"""
+
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.parser.symbol_table import SymbolTable
+from minimal_compiler.src.parser.constant_table import ConstantTable
+
+MAGIC = b"WIR"
+FORMAT_VERSION = 4
+
+# node opcodes, followed by their operands
+OP_EMPTY = 0 # reason (string)
+OP_SEQUENCE = 1 # number of statements, then the statements
+OP_ASSIGNMENT = 2 # target, source (variables), operator (string), value (constant)
+OP_ASSIGNMENT_TWO_VAR = 3 # target, source (variables), operator (string), x_k (variable), c_2, c_1 (constants)
+OP_PRINT = 4 # variable
+OP_WHILE = 5 # condition variable, condition value (constant), then the body
+OP_IF = 6 # condition variable, condition value (constant), number of bodies (1 or 2), then the then and else body
+OP_COPY = 7 # target, source (variables)
+
+
+class IRFormatException(Exception):
+    pass
+
+
+def write_varint(buffer, value):
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+class Pool:
+    # values in order of their first use, encoded as their index
+    def __init__(self):
+        self.indices = {}
+
+    def index(self, value):
+        index = self.indices.get(value)
+        if index is None:
+            index = self.indices[value] = len(self.indices)
+        return index
+
+
+def serialize_ir(ast, symbol_table, constant_table):
+    """Encodes a ProgramNode and its symbol and constant table into bytes."""
+    strings, constants = Pool(), Pool()
+    nodes = bytearray()
+
+    stack = [ast.stmt]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, AssignmentNode):
+            nodes.append(OP_ASSIGNMENT)
+            write_varint(nodes, node.target)
+            write_varint(nodes, node.source)
+            write_varint(nodes, strings.index(node.operator))
+            write_varint(nodes, constants.index(node.value))
+        elif isinstance(node, SequenceNode):
+            nodes.append(OP_SEQUENCE)
+            write_varint(nodes, len(node.statements))
+            stack.extend(reversed(node.statements))
+        elif isinstance(node, WhileNode):
+            nodes.append(OP_WHILE)
+            write_varint(nodes, node.condition.variable)
+            write_varint(nodes, constants.index(node.condition.value))
+            stack.append(node.body)
+        elif isinstance(node, IfNode):
+            nodes.append(OP_IF)
+            write_varint(nodes, node.condition.variable)
+            write_varint(nodes, constants.index(node.condition.value))
+            if node.else_body is None:
+                write_varint(nodes, 1)
+            else:
+                write_varint(nodes, 2)
+                stack.append(node.else_body)
+            stack.append(node.then_body)
+        elif isinstance(node, AssignmentNodeTwoVar):
+            nodes.append(OP_ASSIGNMENT_TWO_VAR)
+            write_varint(nodes, node.target)
+            write_varint(nodes, node.source)
+            write_varint(nodes, strings.index(node.operator))
+            write_varint(nodes, node.x_k)
+            write_varint(nodes, constants.index(node.c_2))
+            write_varint(nodes, constants.index(node.c_1))
+        elif isinstance(node, CopyNode):
+            nodes.append(OP_COPY)
+            write_varint(nodes, node.target)
+            write_varint(nodes, node.source)
+        elif isinstance(node, PrintNode):
+            nodes.append(OP_PRINT)
+            write_varint(nodes, node.variable)
+        elif isinstance(node, EmptyNode):
+            nodes.append(OP_EMPTY)
+            write_varint(nodes, strings.index(str(node.reason)))
+        else:
+            raise IRFormatException(f"Can not serialize {type(node).__name__}")
+
+    symbols = bytearray()
+    write_varint(symbols, len(symbol_table))
+    for id in symbol_table:
+        write_varint(symbols, id)
+        symbols.append(symbol_table.flags[id])
+
+    table = constant_table.get_full_table()
+    write_varint(symbols, len(table))
+    for value in table:
+        write_varint(symbols, constants.index(value))
+
+    data = bytearray(MAGIC)
+    data.append(FORMAT_VERSION)
+    write_varint(data, len(strings.indices))
+    for string in strings.indices:
+        encoded = string.encode()
+        write_varint(data, len(encoded))
+        data += encoded
+    write_varint(data, len(constants.indices))
+    for value in constants.indices:
+        if value < 0:
+            raise IRFormatException(f"Can not serialize negative constant {value}")
+        encoded = value.to_bytes((value.bit_length() + 7) // 8, "little")
+        write_varint(data, len(encoded))
+        data += encoded
+    data += symbols
+    data += nodes
+    return bytes(data)
+
+
+class Reader:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def varint(self):
+        data = self.data
+        result = shift = 0
+        while True:
+            try:
+                byte = data[self.pos]
+            except IndexError:
+                raise IRFormatException("Unexpected end of data")
+            self.pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def bytes(self):
+        length = self.varint()
+        end = self.pos + length
+        if end > len(self.data):
+            raise IRFormatException("Unexpected end of data")
+        value = self.data[self.pos:end]
+        self.pos = end
+        return value
+
+
+def deserialize_ir(data):
+    """Decodes bytes written by serialize_ir, returns (ProgramNode, SymbolTable, ConstantTable)."""
+    if data[:len(MAGIC)] != MAGIC or len(data) <= len(MAGIC) or data[len(MAGIC)] != FORMAT_VERSION:
+        raise IRFormatException("Not an IR file of the current format version")
+
+    reader = Reader(data)
+    reader.pos = len(MAGIC) + 1
+    try:
+        strings = [reader.bytes().decode() for _ in range(reader.varint())]
+        constants = [int.from_bytes(reader.bytes(), "little") for _ in range(reader.varint())]
+
+        symbol_table = SymbolTable()
+        for _ in range(reader.varint()):
+            id = reader.varint()
+            flags = reader.varint()
+            symbol_table.add_variable(id)
+            symbol_table.flags[id] |= flags
+
+        constant_table = ConstantTable()
+        for _ in range(reader.varint()):
+            constant_table.add(constants[reader.varint()])
+
+        varint = reader.varint
+        root = []
+        # open parents: (list to fill, number of missing children), the root takes one node
+        stack = [(root, 1)]
+        while stack:
+            children, missing = stack.pop()
+            if missing > 1:
+                stack.append((children, missing - 1))
+
+            op = varint()
+            if op == OP_ASSIGNMENT:
+                node = AssignmentNode(varint(), varint(), strings[varint()], constants[varint()])
+            elif op == OP_SEQUENCE:
+                node = SequenceNode([])
+                count = varint()
+                if count:
+                    stack.append((node.statements, count))
+            elif op == OP_WHILE:
+                node = WhileNode(ConditionNode(varint(), constants[varint()]), None)
+                stack.append((BodySetter(node), 1))
+            elif op == OP_IF:
+                node = IfNode(ConditionNode(varint(), constants[varint()]), None)
+                stack.append((BranchSetter(node), varint()))
+            elif op == OP_ASSIGNMENT_TWO_VAR:
+                node = AssignmentNodeTwoVar(
+                    varint(), varint(), strings[varint()], varint(),
+                    constants[varint()], constants[varint()],
+                )
+            elif op == OP_COPY:
+                node = CopyNode(varint(), varint())
+            elif op == OP_PRINT:
+                node = PrintNode(varint())
+            elif op == OP_EMPTY:
+                node = EmptyNode(strings[varint()])
+            else:
+                raise IRFormatException(f"Unknown node opcode {op}")
+            children.append(node)
+    except (IndexError, UnicodeDecodeError) as e:
+        raise IRFormatException(f"Corrupt IR data: {e}")
+
+    if reader.pos != len(data):
+        raise IRFormatException("Trailing data after the IR")
+    return ProgramNode(root[0]), symbol_table, constant_table
+
+
+class BodySetter:
+    # stands in for the children list of a WhileNode, which has exactly one child
+    def __init__(self, node):
+        self.node = node
+
+    def append(self, body):
+        self.node.body = body
+
+
+class BranchSetter:
+    # stands in for the children list of an IfNode: its then body, then its else body (if any)
+    def __init__(self, node):
+        self.node = node
+
+    def append(self, body):
+        if self.node.then_body is None:
+            self.node.then_body = body
+        else:
+            self.node.else_body = body
@@ -1,17 +1,35 @@
 from minimal_compiler.src.generator.template_loader import load_helper_functions
 from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.flat_ir import FlatIR, KIND_SEQUENCE, KIND_WHILE, KIND_IF
+from minimal_compiler.src.optimiser.zero_analysis import ZeroAnalysis
 from utils import config
 
 
+class CodeBuffer:
+    # collects the generated code in parts: "+=" on a str attribute copies the whole code every time
+    # (quadratic for large programs), appending a part does not
+    def __init__(self, code=""):
+        self.parts = [code] if code else []
+
+    def __iadd__(self, code):
+        self.parts.append(code)
+        return self
+
+    def __str__(self):
+        return "".join(self.parts)
+
+
 class WhileWasmVisitor:
     def __init__(self, symbol_table, constant_table):
-        self.wasm_code = ""
+        self.wasm_code = CodeBuffer()
 
         self.optimisation_counter = 0
 
         self.symbol_table = symbol_table
+        self.used_variables = None # ids of the variables used by the program, None: all of the symbol table
 
         self.constant_table = constant_table
+        self.used_constants = None # values of the constants used by the program, None: all of the constant table
         self.constant_pointers = {}
         self.declared_constants = set()
 
@@ -22,12 +40,18 @@ class WhileWasmVisitor:
 
         if isinstance(node, ProgramNode):
             return self.visitProgramNode(node)
+        elif isinstance(node, FlatIR):
+            return self.visitFlatIR(node)
         elif isinstance(node, SequenceNode):
             return self.visitSequenceNode(node)
         elif isinstance(node, AssignmentNode):
             return self.visitAssignmentNode(node)
+        elif isinstance(node, CopyNode):
+            return self.visitCopyNode(node)
         elif isinstance(node, WhileNode):
             return self.visitWhileNode(node)
+        elif isinstance(node, IfNode):
+            return self.visitIfNode(node)
         elif isinstance(node, ConditionNode):
             return self.visitConditionNode(node)
         elif isinstance(node, AssignmentNodeTwoVar):
@@ -40,9 +64,73 @@ class WhileWasmVisitor:
             raise Exception(f"Unhandled node type: {type(node)}")
 
     def get_wasm_code(self):
-        return self.wasm_code
+        return str(self.wasm_code)
 
     def visitProgramNode(self, node: ProgramNode):
+        # the whole program is generated from its struct-of-arrays form, which gives every node an index for the analyses
+        return self.visitFlatIR(FlatIR.from_tree(node) if node.stmt is not None else FlatIR())
+
+    def visitFlatIR(self, flat: FlatIR):
+        # the node arrays are walked in order and only one (short lived) node per statement is built
+        self.used_variables = flat.variables()
+        self.used_constants = flat.used_constants()
+        self.emit_program_header()
+
+        # variables known to be 0 or non-zero: zeroing a zero variable and the first check of a loop
+        # whose counter is non-zero are skipped, loops whose counter is 0 are not generated at all
+        analysis = ZeroAnalysis(flat, self.initially_zero())
+
+        # (end index, block counter, condition checked at the end or None) of the while loops around the current node,
+        # (end index, "if", None) of the if blocks and (start of the else body, "else", None) of their then bodies
+        open_loops = []
+        index = 0
+        while index < len(flat):
+            while open_loops and open_loops[-1][0] <= index:
+                _, block, condition = open_loops.pop()
+                self.close_block(block, condition)
+
+            kind = flat.kinds[index]
+            if kind == KIND_SEQUENCE:
+                index += 1
+                continue
+
+            node = flat.node(index)
+            if kind == KIND_WHILE:
+                if index in analysis.never_entered:
+                    self.wasm_code += f";; Loop skipped: x{node.condition.variable} is 0\n"
+                    index = flat.end[index]
+                    continue
+                entered = index in analysis.entered
+                counter = self.emit_while_start(node, check_first=not entered)
+                open_loops.append((flat.end[index], counter, node.condition if entered else None))
+            elif kind == KIND_IF:
+                self.emit_if_start(node)
+                open_loops.append((flat.end[index], "if", None))
+                if flat.end[index + 1] < flat.end[index]:
+                    open_loops.append((flat.end[index + 1], "else", None))
+            elif index in analysis.redundant_zeroing:
+                self.wasm_code += f";; x{node.target} is already 0\n"
+            else:
+                self.visit(node)
+            index += 1
+
+        while open_loops:
+            _, block, condition = open_loops.pop()
+            self.close_block(block, condition)
+
+        self.emit_program_footer()
+
+        if config.opt_stats:
+            print("Native operations emitted instead of templates:", self.optimisation_counter)
+        return None
+
+    def initially_zero(self):
+        if self.symbol_table is None:
+            return {0}
+        return self.symbol_table.initially_zero(config.max_argument_id)
+
+    def emit_program_header(self):
+        # module, imports, main function signature, declarations and initialisation of locals
         self.wasm_code += "(module\n"
         self.wasm_code += load_helper_functions()
         self.wasm_code += """
@@ -55,7 +143,8 @@ class WhileWasmVisitor:
             (import "env" "left_shift" (func $left_shift (param i32 i32 i32)))
             (import "env" "mod" (func $mod (param i32 i32 i32)))
             (import "env" "set_to_zero" (func $set_to_zero (param i32)))
-            (import "env" "is_gt" (func $is_gt (param i32 i32) (result i32)))"""
+            (import "env" "is_gt" (func $is_gt (param i32 i32) (result i32)))
+            (import "env" "is_equal" (func $is_equal (param i32 i32) (result i32)))"""
         if config.use_gmp:
             self.wasm_code += """
             (import "env" "create_bigint" (func $create_bigint (result i32)))
@@ -76,29 +165,25 @@ class WhileWasmVisitor:
         # [Min, Max] = [0, 4] => x1, x2, x3, x4
         # find argument with highest index
         self.wasm_code += '(func $main (export "main")'
-        max_index = (
-            max([int(var[1:]) for var in self.symbol_table.variables])
-            if self.symbol_table.variables
-            else 0
-        )
-        arguments_incl_between = [f"x{i}" for i in range(1, max_index + 1)]
-        for var_name in arguments_incl_between:
-            self.wasm_code += f"(param $arg_{var_name} i32)\n"  # Before bigint chunk pointers: f"(param $arg_{var_name} {var_type})\n"
+        max_index = self.symbol_table.max_argument_id()
+        for var_id in range(1, max_index + 1):
+            self.wasm_code += f"(param $arg_x{var_id} i32)\n"  # Before bigint chunk pointers: f"(param $arg_{var_name} {var_type})\n"
         self.wasm_code += f" (result i32)\n"
         self.wasm_code += f"(local $currentNode i32)\n"
         self.wasm_code += f"(local $nextNode i32)\n"
         self.wasm_code += (
             f"(local $x0 i32)\n"  # return value (can not be defined via arguments)
         )
-        for var_name in self.symbol_table.variables:  # declaration section
-            if var_name == "x0":
+        for var_id in self.symbol_table:  # declaration section
+            if var_id == 0 or not self.is_used(var_id):
                 continue
 
-            self.wasm_code += f"(local ${var_name} i32)\n"  # Before bigint chunk pointers: f"(local ${var_name} {var_type})\n"
-        for var_name in self.constant_table.get_full_table().values():
+            self.wasm_code += f"(local $x{var_id} i32)\n"  # Before bigint chunk pointers: f"(local ${var_name} {var_type})\n"
+        constants = [(value, var_name) for value, var_name in self.constant_table.get_full_table().items() if self.is_used_constant(value)]
+        for _, var_name in constants:
             self.wasm_code += f"(local ${var_name} i32)\n"
             self.wasm_code += f"(local $node_ptr_{var_name} i32)\n"
-        for value, var_name in self.constant_table.get_full_table().items():
+        for value, var_name in constants:
             if config.use_gmp:
                 self.wasm_code += f";; Creating bigint from u32 blocks for {var_name}\n"
                 self.wasm_code += f"(local.set ${var_name} (call $create_bigint))\n"
@@ -130,11 +215,19 @@ class WhileWasmVisitor:
                             f"(local.set $currentNode (local.get $nextNode))\n"
                         )
 
-        for var_name in self.symbol_table.variables:
-            if var_name == "x0":
+        for var_id in self.symbol_table:
+            if var_id == 0 or not self.is_used(var_id):
+                continue  # unused variables (e.g. removed by the optimisers) need no local, the parameter stays
+
+            if self.symbol_table.is_temporary(var_id):
+                # temporaries of the optimisers are no arguments, they start as 0 (like x0)
+                if config.use_gmp:
+                    self.wasm_code += f"(local.set $x{var_id} (call $create_bigint))\n"
+                else:
+                    self.wasm_code += f"(local.set $x{var_id} (call $create_chunk (i32.const 0)))\n"
                 continue
 
-            self.wasm_code += f"(local.set ${var_name} (local.get $arg_{var_name}))\n"  # default value 0: via an extension of while can we change this now outside via arguments (previously (i32.const 0))
+            self.wasm_code += f"(local.set $x{var_id} (local.get $arg_x{var_id}))\n"  # default value 0: via an extension of while can we change this now outside via arguments (previously (i32.const 0))
 
         # init x0 with 0
         if config.use_gmp:
@@ -143,16 +236,18 @@ class WhileWasmVisitor:
             self.wasm_code += "(call $create_chunk (i32.const 0))\n"
         self.wasm_code += "(local.set $x0)\n"
 
-        if node.stmt is not None:
-            self.visit(node.stmt)
+    def is_used(self, var_id):
+        return self.used_variables is None or var_id in self.used_variables
+
+    def is_used_constant(self, value):
+        # constants only used by removed or merged statements are not created
+        return self.used_constants is None or value in self.used_constants
 
+    def emit_program_footer(self):
         self.wasm_code += "(local.get $x0)\n"
         self.wasm_code += ")\n"
         self.wasm_code += ")\n"
 
-        # print("Optimisation Counter:", self.optimisation_counter)
-        return None
-
     def visitAssignmentNode(self, node: AssignmentNode):
         x_i = node.target
         x_j = node.source
@@ -163,12 +258,12 @@ class WhileWasmVisitor:
         right_operand_name = self.constant_table.get(int(right_operand))
 
         # debug print
-        # self.wasm_code += f"(i32.load (local.get ${x_j}))(call $printf)(drop)"
+        # self.wasm_code += f"(i32.load (local.get $x{x_j}))(call $printf)(drop)"
 
         if operator == "+":
-            self.wasm_code += f"(call $add (local.get ${x_i}) (local.get ${x_j}) (local.get ${right_operand_name}))\n"
+            self.wasm_code += f"(call $add (local.get $x{x_i}) (local.get $x{x_j}) (local.get ${right_operand_name}))\n"
         else:
-            self.wasm_code += f"(call $sub (local.get ${x_i}) (local.get ${x_j}) (local.get ${right_operand_name}))\n"
+            self.wasm_code += f"(call $sub (local.get $x{x_i}) (local.get $x{x_j}) (local.get ${right_operand_name}))\n"
 
         return None
 
@@ -180,51 +275,84 @@ class WhileWasmVisitor:
         c_2 = node.c_2
         c_1 = node.c_1
 
-        self.wasm_code += f";; Optimised assignment detected: {x_i} = {x_j} {operator} ({x_k} / {c_2} * {c_1})\n"
+        self.wasm_code += f";; Optimised assignment detected: x{x_i} = x{x_j} {operator} (x{x_k} / {c_2} * {c_1})\n"
 
         if (
             x_j == x_k and c_2 == 1 and c_1 == 1 and operator == "-"
         ):  # if x_j - x_j then we can just set x_i to 0
-            self.wasm_code += f"(call $set_to_zero (local.get ${x_i}))\n"
+            self.wasm_code += f"(call $set_to_zero (local.get $x{x_i}))\n"
         elif operator == "+":
-            self.wasm_code += f"(call $add (local.get ${x_i}) (local.get ${x_j}) (local.get ${x_k}))\n"
+            self.wasm_code += f"(call $add (local.get $x{x_i}) (local.get $x{x_j}) (local.get $x{x_k}))\n"
         elif operator == ">>":
-            self.wasm_code += f"(call $right_shift (local.get ${x_i}) (local.get ${x_j}) (local.get ${x_k}))\n"
+            self.wasm_code += f"(call $right_shift (local.get $x{x_i}) (local.get $x{x_j}) (local.get $x{x_k}))\n"
             self.optimisation_counter += 1
 
         elif operator == "<<":
-            self.wasm_code += f"(call $left_shift (local.get ${x_i}) (local.get ${x_j}) (local.get ${x_k}))\n"
+            self.wasm_code += f"(call $left_shift (local.get $x{x_i}) (local.get $x{x_j}) (local.get $x{x_k}))\n"
             self.optimisation_counter += 1
 
         elif operator == "%":
-            self.wasm_code += f"(call $mod (local.get ${x_i}) (local.get ${x_j}) (local.get ${x_k}))\n"
+            self.wasm_code += f"(call $mod (local.get $x{x_i}) (local.get $x{x_j}) (local.get $x{x_k}))\n"
             self.optimisation_counter += 1
 
         elif operator == "/":
-            self.wasm_code += f"(call $div (local.get ${x_i}) (local.get ${x_j}) (local.get ${x_k}))\n"
+            self.wasm_code += f"(call $div (local.get $x{x_i}) (local.get $x{x_j}) (local.get $x{x_k}))\n"
         elif operator == "*":
-            self.wasm_code += f"(call $mul (local.get ${x_i}) (local.get ${x_j}) (local.get ${x_k}))\n"
+            self.wasm_code += f"(call $mul (local.get $x{x_i}) (local.get $x{x_j}) (local.get $x{x_k}))\n"
+            self.optimisation_counter += 1
+        elif operator in ("==", "!=", ">"):
+            # 1 or 0 with a single comparison of the bigints instead of the loops of the templates
+            one = self.constant_table.get(1)
+            test = "is_gt" if operator == ">" else "is_equal"
+            self.wasm_code += f"(call ${test} (local.get $x{x_j}) (local.get $x{x_k}))\n"
+            if operator == "!=":
+                self.wasm_code += "(i32.eqz)\n"
+            self.wasm_code += f"(if (then (call $copy (local.get $x{x_i}) (local.get ${one}))) (else (call $set_to_zero (local.get $x{x_i}))))\n"
+            self.optimisation_counter += 1
+        elif operator in ("max", "min"):
+            larger, smaller = (x_j, x_k) if operator == "max" else (x_k, x_j)
+            self.wasm_code += f"(call $is_gt (local.get $x{x_j}) (local.get $x{x_k}))\n"
+            self.wasm_code += f"(if (then {self.copy_code(x_i, larger)}) (else {self.copy_code(x_i, smaller)}))\n"
             self.optimisation_counter += 1
         else:
-            self.wasm_code += f"(call $sub (local.get ${x_i}) (local.get ${x_j}) (local.get ${x_k}))\n"
+            self.wasm_code += f"(call $sub (local.get $x{x_i}) (local.get $x{x_j}) (local.get $x{x_k}))\n"
 
         # set x_k to 0
-        # self.wasm_code += f"(call $set_to_zero (local.get ${x_k}))\n"
+        # self.wasm_code += f"(call $set_to_zero (local.get $x{x_k}))\n"
 
         return None
 
+    @staticmethod
+    def copy_code(target, source):
+        # $copy clears its destination first, so a variable is never copied onto itself
+        return "" if target == source else f"(call $copy (local.get $x{target}) (local.get $x{source}))"
+
+    def visitCopyNode(self, node: CopyNode):
+        # a single copy of the limbs instead of an addition of the zero constant
+        self.wasm_code += self.copy_code(node.target, node.source) + "\n"
+        return None
+
     def visitPrintNode(self, node: PrintNode):
-        var_name = node.variable
-        self.wasm_code += f";; Printing {var_name}\n"
-        self.wasm_code += f"(call $printf (local.get ${var_name}))(drop)\n"
+        var_id = node.variable
+        self.wasm_code += f";; Printing x{var_id}\n"
+        self.wasm_code += f"(call $printf (local.get $x{var_id}))(drop)\n"
         return None
 
     def visitWhileNode(self, node: WhileNode):
+        return self.visit_statements(node)
+
+    def emit_while_start(self, node: WhileNode, check_first=True):
+        # opens the block and loop of a while loop and checks its condition, returns the block counter
+        # (without check_first the loop is entered unchecked and emit_while_end checks the condition)
         current_counter = self.block_counter
         self.block_counter += 1
         self.wasm_code += f"\n(block $while_block{current_counter}\n"
         self.wasm_code += f"(loop $while_loop{current_counter}\n"
 
+        if not check_first:
+            self.wasm_code += f";; x{node.condition.variable} > 0 on entry\n"
+            return current_counter
+
         self.visit(node.condition)
 
         # Attention: No use of is_zero function: greater_than gives a value 0 or 1 back (and no pointer)
@@ -233,22 +361,67 @@ class WhileWasmVisitor:
 
         self.wasm_code += f"(br_if $while_block{current_counter})\n"
 
-        self.visit(node.body)
+        return current_counter
 
-        self.wasm_code += f"(br $while_loop{current_counter})\n"
+    def emit_while_end(self, current_counter, condition: ConditionNode = None):
+        # condition: the loop was entered unchecked, it repeats while the condition holds
+        if condition is None:
+            self.wasm_code += f"(br $while_loop{current_counter})\n"
+        else:
+            self.visit(condition)
+            self.wasm_code += f"(br_if $while_loop{current_counter})\n"
         self.wasm_code += ")\n"
         self.wasm_code += ")\n"
 
-        return None
+    def emit_if_start(self, node: IfNode):
+        # if and else are native blocks of WASM, the then body follows
+        self.visit(node.condition)
+        self.wasm_code += "(if\n(then\n"
+
+    def close_block(self, block, condition: ConditionNode = None):
+        # block: the counter of a while loop, "else" after a then body which is followed by an else body, "if" at the end of an if
+        if block == "else":
+            self.wasm_code += ")\n(else\n"
+        elif block == "if":
+            self.wasm_code += ")\n)\n"
+        else:
+            self.emit_while_end(block, condition)
+
+    def visitIfNode(self, node: IfNode):
+        return self.visit_statements(node)
 
     def visitSequenceNode(self, node: SequenceNode):
-        for stmt_ctx in node.statements:
-            self.visit(stmt_ctx)
+        return self.visit_statements(node)
+
+    def visit_statements(self, node: Node):
+        # walks sequences and (nested) while loops with an explicit stack instead of recursion,
+        # so arbitrarily deep programs need neither a raised recursion limit nor a large C stack
+        stack = [node]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, SequenceNode):
+                stack.extend(reversed(item.statements))
+            elif isinstance(item, WhileNode):
+                stack.append(self.emit_while_start(item)) # block counter: closes the loop after the body
+                stack.append(item.body)
+            elif isinstance(item, IfNode):
+                self.emit_if_start(item)
+                stack.append("if")
+                if item.else_body is not None:
+                    stack.append(item.else_body)
+                    stack.append("else")
+                stack.append(item.then_body)
+            elif isinstance(item, str):
+                self.close_block(item)
+            elif isinstance(item, int):
+                self.emit_while_end(item)
+            else:
+                self.visit(item)
 
         return None
 
     def visitConditionNode(self, node: ConditionNode):
-        var_name = node.variable
+        var_id = node.variable
         condition_value = node.value
 
         if int(condition_value) != 0:
@@ -259,8 +432,8 @@ class WhileWasmVisitor:
         # Compile time constant handling
         condition_value_name = self.constant_table.get(int(condition_value))
 
-        self.wasm_code += f";; Checking {var_name} > {condition_value}\n"
-        self.wasm_code += f"(call $is_gt (local.get ${var_name})(local.get ${condition_value_name}))\n"
+        self.wasm_code += f";; Checking x{var_id} > {condition_value}\n"
+        self.wasm_code += f"(call $is_gt (local.get $x{var_id})(local.get ${condition_value_name}))\n"
 
         return None
 
@@ -0,0 +1,309 @@
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import accumulate
+from operator import add
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.base_optimiser import OptimiserManager
+from minimal_compiler.src.optimiser.ast import copy_ast
+from minimal_compiler.src.parser.lexer import tokenize_compact, skip_pattern, TokenType
+from minimal_compiler.src.parser.ir_parser import IRParser
+from minimal_compiler.src.parser.symbol_table import SymbolTable
+from minimal_compiler.src.parser.constant_table import ConstantTable
+from minimal_compiler.src.generator.visitor import WhileWasmVisitor, CodeBuffer
+
+
+class Region:
+    # consecutive top-level statements which are optimised and generated together
+    def __init__(self, statements):
+        self.statements = statements
+        self.wasm_code = None
+
+
+class IncrementalCompiler:
+    """
+    Compiles successive versions of the same WHILE program (e.g. on every save in a watch workflow)
+    and only redoes the work for the part of the program which changed.
+
+    - Front end: the new source is compared with the previous one; only the top-level statements
+      touched by the edit are lexed and parsed again, the IR of all other statements is reused.
+    - Optimiser: the top-level statements are cut into regions at the split points of the
+      optimisers (see BaseOptimiser.split_points), so every region optimises to the same result as
+      the whole program would. Only regions near the edit are optimised again. (The fixpoint
+      rounds of OptimiserManager.optimise run per region: a match which only a rewrite exposes
+      across a split point stays unoptimised.)
+    - Generator: the WAT of every region is cached. Constant names stay stable between versions
+      and every region gets its own range of block labels, so cached code stays valid. Only the
+      module header (locals and constants) is generated again.
+    """
+
+    def __init__(self, optimiser_manager=None):
+        self.optimiser_manager = optimiser_manager or OptimiserManager([])
+
+        self.source = None
+        self.statements = [] # top-level statements (IR before optimisation, never modified)
+        self.widths = [] # distance from the start of the previous statement to the start of each statement
+        self.lengths = [] # source length of each statement
+        self.symbols = [] # (variables, assigned variables, constants) of each statement
+        self.regions = []
+
+        self.variable_counts = Counter()
+        self.assigned_counts = Counter()
+        self.constant_counts = Counter()
+        self.constant_names = ConstantTable() # grows only, so names of constants never change
+        self.block_counter = 0
+
+        # statistics of the last compilation
+        self.parsed_statements = 0
+        self.optimised_regions = 0
+
+    def compile(self, source):
+        """Compiles the source to WAT, reusing as much of the previous version as possible."""
+        self.update(source)
+        return self.generate()
+
+    def update(self, source):
+        self.parsed_statements = 0
+        self.optimised_regions = 0
+        if source == self.source:
+            return
+
+        change = self.reparse(source) if self.source is not None else None
+        if change is None:
+            statements, starts, lengths = self.parse(source)
+            change = (0, len(self.statements), statements, self.to_widths(starts, 0), lengths, None)
+
+        self.replace_statements(*change)
+        self.source = source
+
+    def parse(self, code, offset=0):
+        """Parses code, returns its top-level statements with their (offset based) starts and lengths."""
+        tokens = tokenize_compact(code)
+        ast, _, _ = IRParser(tokens).parse_prog()
+        statements = ast.stmt.statements if isinstance(ast.stmt, SequenceNode) else [ast.stmt]
+        starts, ends = self.statement_spans(tokens, 0, len(tokens) - 1)
+        self.parsed_statements += len(statements)
+        return statements, [offset + start for start in starts], [end - start for start, end in zip(starts, ends)]
+
+    def reparse(self, source):
+        """
+        Re-lexes and re-parses only the top-level statements touched by the difference between the
+        previous and the new source. Returns None if the change can not be confined to whole
+        top-level statements (e.g. a while loop was opened or closed), then everything is parsed again.
+        """
+        old = self.source
+        prefix = self.common_prefix(old, source)
+        suffix = self.common_suffix(old, source, prefix)
+        delta = len(source) - len(old)
+
+        starts = list(accumulate(self.widths))
+        ends = list(map(add, starts, self.lengths))
+        count = len(self.statements)
+
+        first = bisect_left(ends, prefix) # first statement ending at or after the start of the change
+        last = bisect_right(starts, len(old) - suffix) - 1 # last statement starting at or before its end
+        if first > last: # change between two statements
+            if first < count:
+                last = first
+            else:
+                first = last
+
+        region_start = ends[first - 1] if first > 0 else 0
+        region_end = (starts[last + 1] if last + 1 < count else len(old)) + delta
+        text = source[region_start:region_end]
+        try:
+            tokens = tokenize_compact(text)
+        except RuntimeError:
+            return None
+
+        # separators to the untouched statements before and after the region
+        begin, stop = 0, len(tokens) - 1 # without EOF
+        if first > 0:
+            if tokens.types[begin] != TokenType.SEMI:
+                return None
+            begin += 1
+        if last + 1 < count:
+            if stop <= begin or tokens.types[stop - 1] != TokenType.SEMI:
+                return None
+            stop -= 1
+            # the region must not swallow the start of the next statement (e.g. into a new comment)
+            separator_end = region_start + tokens.offsets[stop] + tokens.lengths[stop]
+            if skip_pattern.match(source, separator_end).end() != region_end:
+                return None
+
+        spans = self.statement_spans(tokens, begin, stop)
+        if spans is None:
+            return None
+        code_start, code_end = spans[0][0], spans[1][-1]
+        try:
+            statements, new_starts, lengths = self.parse(text[code_start:code_end], region_start + code_start)
+        except (RuntimeError, SyntaxError):
+            return None
+
+        widths = self.to_widths(new_starts, starts[first - 1] if first > 0 else 0)
+        next_width = region_end - new_starts[-1] if last + 1 < count else None
+        return first, last + 1, statements, widths, lengths, next_width
+
+    def statement_spans(self, tokens, begin, stop):
+        """Source spans of the top-level statements in tokens[begin:stop], None if they are not well formed."""
+        types, offsets, lengths = tokens.types, tokens.offsets, tokens.lengths
+        starts, ends = [], []
+        depth = 0
+        start = begin
+        for index in range(begin, stop):
+            typ = types[index]
+            if typ == TokenType.WHILE:
+                depth += 1
+            elif typ == TokenType.END:
+                depth -= 1
+                if depth < 0:
+                    return None
+            elif typ == TokenType.SEMI and depth == 0:
+                if index == start:
+                    return None
+                starts.append(offsets[start])
+                ends.append(offsets[index - 1] + lengths[index - 1])
+                start = index + 1
+
+        if depth != 0 or start >= stop:
+            return None
+        starts.append(offsets[start])
+        ends.append(offsets[stop - 1] + lengths[stop - 1])
+        return starts, ends
+
+    def replace_statements(self, first, end, statements, widths, lengths, next_width):
+        for symbols in self.symbols[first:end]:
+            self.count_symbols(symbols, -1)
+        new_symbols = [self.collect_symbols(statement) for statement in statements]
+        for symbols in new_symbols:
+            self.count_symbols(symbols, 1)
+
+        if next_width is not None:
+            self.widths[end] = next_width
+        self.statements[first:end] = statements
+        self.symbols[first:end] = new_symbols
+        self.widths[first:end] = widths
+        self.lengths[first:end] = lengths
+
+        self.replace_regions(first, end, len(statements))
+
+    def replace_regions(self, first, end, count):
+        """Rebuilds the regions around the replaced statements old[first:end] (now count new statements)."""
+        region_starts = list(accumulate([0] + [len(region.statements) for region in self.regions]))
+        old_total = region_starts[-1]
+
+        # split points depend on the statements up to one window before them
+        margin = self.optimiser_manager.window_size()
+        first_region = max(bisect_right(region_starts, first - margin) - 1, 0)
+        last_region = min(bisect_right(region_starts, end + margin - 1) - 1, len(self.regions) - 1)
+        span_start = region_starts[first_region] if self.regions else 0
+        span_end = (region_starts[last_region + 1] if self.regions else old_total) + count - (end - first)
+
+        cached = {}
+        for region in self.regions[first_region:last_region + 1]:
+            cached[tuple(map(id, region.statements))] = region
+
+        statements = self.statements[span_start:span_end]
+        points = [0] + self.optimiser_manager.split_points(statements) + [len(statements)]
+        regions = []
+        for start, stop in zip(points, points[1:]):
+            region_statements = statements[start:stop]
+            regions.append(cached.get(tuple(map(id, region_statements))) or Region(region_statements))
+
+        self.regions[first_region:last_region + 1] = regions
+
+    def generate(self):
+        for region in self.regions:
+            if region.wasm_code is None:
+                self.generate_region(region)
+
+        symbol_table = SymbolTable()
+        for name, count in self.variable_counts.items():
+            if count > 0:
+                symbol_table.add_variable(name)
+                if self.assigned_counts[name] > 0:
+                    symbol_table.mark_assigned(name)
+                if self.assigned_counts[name] < count:
+                    symbol_table.mark_used(name)
+
+        constant_table = ConstantTable()
+        for value, name in self.constant_names.get_full_table().items():
+            if self.constant_counts[value] > 0:
+                constant_table.table[value] = name
+        constant_table.index = self.constant_names.index
+
+        visitor = WhileWasmVisitor(symbol_table, constant_table)
+        visitor.emit_program_header()
+        header = visitor.get_wasm_code()
+        visitor.wasm_code = CodeBuffer()
+        visitor.emit_program_footer()
+
+        return header + "".join(region.wasm_code for region in self.regions) + visitor.get_wasm_code()
+
+    def generate_region(self, region):
+        statements = [copy_ast(statement) for statement in region.statements] # the optimiser rewrites nodes in place
+        stmt = statements[0] if len(statements) == 1 else SequenceNode(statements)
+        optimised = self.optimiser_manager.optimise(ProgramNode(stmt))
+
+        visitor = WhileWasmVisitor(None, self.constant_names)
+        visitor.block_counter = self.block_counter
+        visitor.visit(optimised.stmt)
+        self.block_counter = visitor.block_counter
+
+        region.wasm_code = visitor.get_wasm_code()
+        self.optimised_regions += 1
+
+    def collect_symbols(self, statement):
+        variables, assigned, constants = [], [], []
+        stack = [statement]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, AssignmentNode):
+                variables += [node.target, node.source]
+                assigned.append(node.target)
+                constants.append(node.value)
+            elif isinstance(node, WhileNode):
+                variables.append(node.condition.variable)
+                constants.append(node.condition.value)
+                stack.append(node.body)
+            elif isinstance(node, SequenceNode):
+                stack.extend(reversed(node.statements))
+            elif isinstance(node, PrintNode):
+                variables.append(node.variable)
+        return variables, assigned, constants
+
+    def count_symbols(self, symbols, sign):
+        variables, assigned, constants = symbols
+        for name in variables:
+            self.variable_counts[name] += sign
+        for name in assigned:
+            self.assigned_counts[name] += sign
+        for value in constants:
+            self.constant_counts[value] += sign
+            self.constant_names.add(value)
+
+    @staticmethod
+    def common_prefix(a, b):
+        low, high = 0, min(len(a), len(b))
+        while low < high:
+            middle = (low + high + 1) // 2
+            if a[low:middle] == b[low:middle]:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    @staticmethod
+    def common_suffix(a, b, prefix):
+        # common suffix which does not overlap the common prefix
+        low, high = 0, min(len(a), len(b)) - prefix
+        while low < high:
+            middle = (low + high + 1) // 2
+            if a[len(a) - middle:len(a) - low] == b[len(b) - middle:len(b) - low]:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    @staticmethod
+    def to_widths(starts, previous_start):
+        return [start - before for start, before in zip(starts, [previous_start] + starts[:-1])]
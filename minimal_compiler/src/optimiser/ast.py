@@ -1,13 +1,48 @@
 from minimal_compiler.src.optimiser.ir_classes import * 
-from minimal_compiler.src.parser.lexer import tokenize
-from minimal_compiler.src.parser.parser import HandParser
+from minimal_compiler.src.parser.lexer import tokenize, tokenize_compact
+from minimal_compiler.src.parser.parser import HandParser, ProgContext, WhileStmtContext, SequenceStmtContext
+from minimal_compiler.src.parser.ir_parser import IRParser
+from minimal_compiler.src.parser.symbol_table import variable_id
 
 
 class ASTBuilder: # Builder for tree-IR before optimisation
-    def visit(self, node): # dynamic dispatch method for visitor pattern
-            method_name = "visit" + type(node).__name__
-            visitor = getattr(self, method_name, self.generic_visit)
-            return visitor(node)
+    # The parse tree is traversed with an explicit stack (children first), so deep parse trees need no raised recursion limit.
+    # The visit methods of compound contexts get the already built nodes of their children.
+
+    def visit(self, node):
+        results = [] # built nodes whose parent is not built yet
+        stack = [(node, None)] # (context, number of children or None if the children are not visited yet)
+        while stack:
+            ctx, child_count = stack.pop()
+            if child_count is None:
+                children = self.child_contexts(ctx)
+                stack.append((ctx, len(children)))
+                stack.extend((child, None) for child in reversed(children))
+                continue
+
+            children = results[len(results) - child_count:]
+            del results[len(results) - child_count:]
+            visitor = getattr(self, "visit" + type(ctx).__name__, None) # dynamic dispatch method for visitor pattern
+            results.append(visitor(ctx, *children) if visitor else self.generic_visit(ctx))
+
+        return results[0]
+
+    def child_contexts(self, ctx):
+        if isinstance(ctx, ProgContext):
+            return [ctx.stmt] if ctx.stmt else []
+        elif isinstance(ctx, WhileStmtContext):
+            return [ctx.condition_ctx, ctx.stmt_ctx]
+        elif isinstance(ctx, SequenceStmtContext): # Important: Flattening of the tree
+            statements = []
+            pending = [ctx]
+            while pending:
+                stmt = pending.pop()
+                if isinstance(stmt, SequenceStmtContext):
+                    pending += [stmt.right_stmt, stmt.left_stmt]
+                else:
+                    statements.append(stmt)
+            return statements
+        return []
     
     def generic_visit(self, node): # fallback method for nodes without specific visit method
         if hasattr(node, "getText"):
@@ -15,49 +50,33 @@ class ASTBuilder: # Builder for tree-IR before optimisation
         else:
             raise Exception("No visit method for " + type(node).__name__)
 
-    def visitProgContext(self, ctx):
-        if ctx.stmt:
-            return ProgramNode(self.visit(ctx.stmt))
+    def visitProgContext(self, ctx, stmt=None):
+        if stmt:
+            return ProgramNode(stmt)
         else:
             return ProgramNode(EmptyNode("File is empty"))
 
     def visitAssignmentContext(self, ctx):
-        target = ctx.VAR(0).getText()
-        source = ctx.VAR(1).getText()
+        target = variable_id(ctx.VAR(0).getText())
+        source = variable_id(ctx.VAR(1).getText())
         operator = ctx.op.getText() 
         value = int(ctx.const.getText())
         return AssignmentNode(target, source, operator, value)
 
-    def visitWhileStmtContext(self, ctx):
-        condition = self.visit(ctx.condition_ctx)
-        body = self.visit(ctx.stmt_ctx)
+    def visitWhileStmtContext(self, ctx, condition, body):
         return WhileNode(condition, body)
 
     def visitConditionContext(self, ctx):
-        variable = ctx.var_token.getText()
+        variable = variable_id(ctx.var_token.getText())
         value = int(ctx.const_token.getText())
         return ConditionNode(variable, value)
     
     def visitPrintContext(self, ctx):
-        variable = ctx.var_token.getText()
+        variable = variable_id(ctx.var_token.getText())
         return PrintNode(variable)
 
-    def visitSequenceStmtContext(self, ctx): # Important: Flattening of the tree
-        left_node = self.visit(ctx.left_stmt)
-        right_node = self.visit(ctx.right_stmt)
-        
-        statements = []
-        if isinstance(left_node, SequenceNode):
-            statements.extend(left_node.statements)
-        else:
-            statements.append(left_node)
-        
-        if isinstance(right_node, SequenceNode):
-            statements.extend(right_node.statements)
-        else:
-            statements.append(right_node)
-            
-        return SequenceNode(statements)
+    def visitSequenceStmtContext(self, ctx, *statements): # statements of the whole (flattened) sequence
+        return SequenceNode(list(statements))
     
 def parse_code(code: str):
     tokens = tokenize(code)
@@ -66,38 +85,65 @@ def parse_code(code: str):
     return tree
 
 def build_ast(code: str):
-    tree = parse_code(code)
-    ast_builder = ASTBuilder()  
-    return ast_builder.visit(tree)
+    tokens = tokenize_compact(code)
+    ast, _, _ = IRParser(tokens).parse_prog()
+    return ast
 
-def unflatten_ast(node: 'Node') -> 'Node':
-    if isinstance(node, SequenceNode):
-        new_statements = [unflatten_ast(stmt) for stmt in node.statements]
-        
-        if len(new_statements) <= 1:
-            return SequenceNode(new_statements)
+def flatten_ast(node: 'Node') -> 'Node':
+    # splices nested SequenceNodes (e.g. inserted replacements) into their enclosing sequence, so every
+    # sequence stays one flat n-ary SequenceNode; uses an explicit stack instead of recursion
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, SequenceNode):
+            statements = []
+            pending = current.statements[::-1]
+            while pending:
+                stmt = pending.pop()
+                if isinstance(stmt, SequenceNode):
+                    pending.extend(reversed(stmt.statements))
+                else:
+                    statements.append(stmt)
+                    stack.append(stmt)
+            current.statements = statements
         else:
-            nested = new_statements[0]
-            for stmt in new_statements[1:]:
-                nested = SequenceNode([nested, stmt])
-            return nested
-    else:
-        for key, value in node.__dict__.items():
-            if hasattr(value, "getText") or isinstance(value, (SequenceNode, ProgramNode)):
-                setattr(node, key, unflatten_ast(value))
+            for key in current.FIELDS:
+                value = getattr(current, key)
+                if isinstance(value, Node):
+                    stack.append(value)
+    return node
+
+def copy_ast(node: 'Node', variables: dict = None) -> 'Node':
+    # fresh copy of a tree (built with an explicit stack), variable ids found in variables are mapped
+    variables = variables or {}
+    root = type(node).__new__(type(node))
+    stack = [(node, root)]
+    while stack:
+        original, node_copy = stack.pop()
+        for key in original.FIELDS:
+            value = getattr(original, key)
+            if key in original.VARIABLES:
+                value = variables.get(value, value)
+            elif isinstance(value, Node):
+                child = type(value).__new__(type(value))
+                stack.append((value, child))
+                value = child
             elif isinstance(value, list):
-                new_list = []
+                items = []
                 for item in value:
-                    if hasattr(item, "getText") or isinstance(item, (SequenceNode, ProgramNode)):
-                        new_list.append(unflatten_ast(item))
-                    else:
-                        new_list.append(item)
-                setattr(node, key, new_list)
-        return node
+                    if isinstance(item, Node):
+                        child = type(item).__new__(type(item))
+                        stack.append((item, child))
+                        item = child
+                    items.append(item)
+                value = items
+            setattr(node_copy, key, value)
+    return root
 
 def print_ast_structure(node, indent=0):
     print(' ' * indent + f"{type(node).__name__}:")
-    for key, value in node.__dict__.items():
+    for key in node.FIELDS:
+        value = getattr(node, key)
         if hasattr(value, "getText") and not isinstance(value, list):
             print(' ' * (indent + 2) + f"{key}: {value.getText()}")
         elif isinstance(value, (ProgramNode, AssignmentNode, WhileNode, ConditionNode, SequenceNode)):
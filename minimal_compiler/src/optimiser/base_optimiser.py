@@ -1,16 +1,166 @@
+from minimal_compiler.src.optimiser.flat_ir import FlatIR
+
+class DirtyRegions:
+    """
+    The parts of the tree-IR which an optimiser round rewrote, so the next round only has to revisit
+    them (see OptimiserManager.optimise). Statements are tracked by identity:
+
+    - new: statements inserted by a rewrite, their whole subtree has to be visited again
+    - changed: statements (WhileNode or nested SequenceNode) and the program itself (ROOT) which
+      contain a new statement somewhere below them, and statements next to a removed statement
+    - everything: the whole program has to be visited again (the changes are not known)
+    """
+    ROOT = object()
+
+    def __init__(self, everything=False):
+        self.everything = everything
+        self.new = {} # id -> node, the nodes are kept alive so their ids are not reused
+        self.changed = {}
+
+    def __bool__(self):
+        return self.everything or bool(self.new) or bool(self.changed)
+
+    def add_new(self, node):
+        self.new[id(node)] = node
+
+    def add_changed(self, owner, parents):
+        # marks the owner of the changed statements and all its ancestors (parents: id -> enclosing owner)
+        while owner is not None and id(owner) not in self.changed:
+            self.changed[id(owner)] = owner
+            owner = parents.get(id(owner))
+
+    def add_rewritten(self, owner, parents, before, after):
+        # records the rewrite of the statement list of owner from before to after: statements which were not
+        # in the list are new, the ones next to a removed statement form new windows and count as changed
+        kept = {id(stmt) for stmt in after}
+        previous = {id(stmt) for stmt in before}
+        for stmt in after:
+            if id(stmt) not in previous:
+                self.add_new(stmt)
+        for i, stmt in enumerate(before):
+            if id(stmt) in kept:
+                continue
+            for j in (i - 1, i + 1):
+                if 0 <= j < len(before) and id(before[j]) in kept:
+                    self.changed[id(before[j])] = before[j]
+        self.add_changed(owner, parents)
+
+    def is_new(self, node):
+        return id(node) in self.new
+
+    def is_changed(self, node):
+        return id(node) in self.changed
+
+    def update(self, other):
+        self.everything = self.everything or other.everything
+        self.new.update(other.new)
+        self.changed.update(other.changed)
+
 class BaseOptimiser:
+    # bump whenever the output of the optimiser changes, this invalidates cached IR (see IRCache)
+    VERSION = 1
+
+    # tables of the program being optimised (set by OptimiserManager.optimise, may be None), needed
+    # by optimisers which introduce temporary variables or new constants
+    symbol_table = None
+    constant_table = None
+
     def optimise(self, node):
         return node.accept(self)
 
+    def version(self):
+        return f"{type(self).__name__}:{self.VERSION}"
+
+    def optimise_round(self, node, dirty):
+        # One round of the fixpoint driver: optimises the regions of dirty (None: the whole program) and
+        # returns the new node and the DirtyRegions it rewrote. Optimisers which do not track their
+        # rewrites only run in the first round and report the whole program as rewritten.
+        if dirty is not None:
+            return node, DirtyRegions()
+        return self.optimise(node), DirtyRegions(everything=True)
+
+    def window_size(self):
+        # number of consecutive top-level statements a single rewrite can span
+        return 1
+
+    def patterns(self):
+        # the CompiledPatterns of a pattern based optimiser (their attempts and hits are reported by OptimisationStats)
+        return []
+
+    def split_points(self, statements):
+        # indices at which the top-level statements can be split into regions that give the
+        # same result when optimised independently (default: none, the program is one region)
+        return []
+
 class OptimiserManager:
-    def __init__(self, optimisers):
+    # upper bound for the rounds of the fixpoint iteration, in case rewrites never settle
+    MAX_ROUNDS = 100
+
+    def __init__(self, optimisers, lowering=None, stats=None):
         self.optimisers = optimisers or []
+        # run once on the result of the fixpoint iteration, they create nodes the optimisers do not know (e.g. IfNode)
+        self.lowering = lowering or []
+        self.stats = stats # OptimisationStats collecting the statistics of the passes (None: not collected)
     
     def add_optimiser(self, optimiser):
         self.optimisers.append(optimiser)
     
-    def optimise(self, ast):
+    def optimise(self, ast, symbol_table=None, constant_table=None):
+        if isinstance(ast, FlatIR):
+            # the optimisers rewrite the tree-IR, the result is flattened again
+            return FlatIR.from_tree(self.optimise(ast.to_tree(), symbol_table, constant_table))
+
+        for optimiser in self.optimisers + self.lowering:
+            optimiser.symbol_table = symbol_table
+            optimiser.constant_table = constant_table
+
+        # A rewrite can expose new matches (for the same or another optimiser), so the optimisers are
+        # iterated to a fixpoint: the first round optimises the whole program, every further round
+        # only revisits the regions rewritten (by any optimiser) since the optimiser last ran.
+        pending = [None] * len(self.optimisers) # regions each optimiser still has to revisit
+        if self.stats is not None:
+            self.stats.start(self.optimisers + self.lowering, ast)
+        self.rounds = 0
+        while self.rounds < self.MAX_ROUNDS:
+            changed = False
+            for k, optimiser in enumerate(self.optimisers):
+                dirty = pending[k]
+                if dirty is not None and not dirty:
+                    continue
+                pending[k] = DirtyRegions()
+                ast, changes = self.run(optimiser, ast, dirty)
+                if changes:
+                    changed = True
+                    for regions in pending:
+                        if regions is not None:
+                            regions.update(changes)
+            self.rounds += 1
+            if not changed:
+                break
+
+        for optimiser in self.lowering:
+            ast, _ = self.run(optimiser, ast, None, lowering=True)
+        if self.stats is not None:
+            self.stats.finish(self.optimisers + self.lowering, self.rounds)
+        return ast
+
+    def run(self, optimiser, ast, dirty, lowering=False):
+        if lowering:
+            step = lambda: (optimiser.optimise(ast), None)
+        else:
+            step = lambda: optimiser.optimise_round(ast, dirty)
+        return step() if self.stats is None else self.stats.measure(optimiser, step)
+
+    def version(self):
+        # identifies the optimisers and their order, part of the key of cached IR
+        return ",".join(optimiser.version() for optimiser in self.optimisers + self.lowering)
+
+    def window_size(self):
+        return max((optimiser.window_size() for optimiser in self.optimisers), default=1)
+
+    def split_points(self, statements):
+        points = set(range(1, len(statements)))
         for optimiser in self.optimisers:
-            ast = optimiser.optimise(ast)  
+            points.intersection_update(optimiser.split_points(statements))
 
-        return ast
\ No newline at end of file
+        return sorted(points)
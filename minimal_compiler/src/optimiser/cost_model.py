@@ -0,0 +1,469 @@
+"""
+Static cost model of the tree-IR: annotates every statement with the calls into the bigint library
+it makes (as stats.estimated_calls counts them: one per statement and per check of a condition) and
+with the sizes of the numbers it works on, from which the limb operations of a run are estimated.
+
+The calls are polynomials in the trip counts of the loops (see Cost): a loop counting its condition
+variable down by a constant runs (entry value - bound) / step times, named after the variable it was
+copied from just before the loop (e.g. x1 for x3 = x1 + 0; while x3 > 0 do x3 = x3 - 1; ... end), a
+loop setting it to 0 runs once and all other loops get a symbol n<k> (the k-th loop of the program).
+Symbols without a value are evaluated as LOOP_ITERATIONS, so the evaluated calls of a program whose
+trip counts are all unknown are its estimated_calls.
+
+The sizes (in bits) follow the operators (x + y has one bit more than the larger operand, x * y the
+bits of both, ...), starting with input_bits for the variables which are not 0 at the start. A loop
+body is analysed once, so the sizes inside a loop are those of its first iteration: a variable the
+loop multiplies (or shifts or doubles) grows by the bits it gained in that iteration per iteration,
+any other one which grew (a sum) by log2 of the evaluated trip count. The bigint
+library stores numbers in 32-bit limbs: additions, subtractions, comparisons and shifts take as many
+limb operations as the larger number has limbs, multiplications, divisions and the decimal output
+of print quadratically many.
+
+    python3 run.py <file> --cost-report
+
+prints the totals and the statements and loops which dominate them (see cost_report). Passes can
+compare equivalent alternatives with cheapest.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.pattern_library import format_statements
+from minimal_compiler.src.optimiser.stats import LOOP_ITERATIONS
+
+LIMB_BITS = 32
+# assumed size of the inputs of a program
+INPUT_BITS = 64
+# estimated sizes are capped (a loop growing a number by its own size would not end in a run either)
+MAX_BITS = 1 << 24
+# statements looked at before a loop for the copy its counter starts with
+LOOKBACK = 8
+# statements and loops listed by cost_report
+TOP = 10
+
+
+class Cost:
+    """
+    A polynomial in the trip counts of loops with integer coefficients: terms maps a monomial (the
+    sorted tuple of its symbols, () for the constant) to its coefficient.
+    """
+    __slots__ = ("terms",)
+
+    def __init__(self, terms: Dict[Tuple[str, ...], int] = None):
+        self.terms = terms or {}
+
+    @staticmethod
+    def constant(value: int) -> "Cost":
+        return Cost({(): value} if value else {})
+
+    @staticmethod
+    def symbol(name: str) -> "Cost":
+        return Cost({(name,): 1})
+
+    @staticmethod
+    def sum(costs: Iterable["Cost"]) -> "Cost":
+        # in one dictionary (adding the costs of a long sequence one by one would copy the sum every time)
+        terms = {}
+        for cost in costs:
+            for monomial, coefficient in cost.terms.items():
+                terms[monomial] = terms.get(monomial, 0) + coefficient
+        return Cost({monomial: coefficient for monomial, coefficient in terms.items() if coefficient})
+
+    def __add__(self, other: "Cost") -> "Cost":
+        return Cost.sum((self, other))
+
+    def __mul__(self, other: "Cost") -> "Cost":
+        terms = {}
+        for left, a in self.terms.items():
+            for right, b in other.terms.items():
+                monomial = tuple(sorted(left + right))
+                terms[monomial] = terms.get(monomial, 0) + a * b
+        return Cost({monomial: coefficient for monomial, coefficient in terms.items() if coefficient})
+
+    def __eq__(self, other):
+        return isinstance(other, Cost) and self.terms == other.terms
+
+    def term(self, monomial: Tuple[str, ...], values: Dict[str, int] = None, default: int = LOOP_ITERATIONS) -> int:
+        value = self.terms[monomial]
+        for name in monomial:
+            value *= values.get(name, default) if values else default
+        return value
+
+    def evaluate(self, values: Dict[str, int] = None, default: int = LOOP_ITERATIONS) -> int:
+        """The value with the given trip counts, other symbols are default."""
+        return sum(self.term(monomial, values, default) for monomial in self.terms)
+
+    def format(self, terms: Optional[int] = None, values: Dict[str, int] = None) -> str:
+        # the terms of the highest degree first, with terms only the largest ones (evaluated) and the number left out
+        monomials = sorted(self.terms, key=lambda monomial: (-len(monomial), monomial))
+        left_out = 0
+        if terms is not None and len(monomials) > terms:
+            kept = set(sorted(monomials, key=lambda monomial: -self.term(monomial, values))[:terms])
+            left_out = len(monomials) - terms
+            monomials = [monomial for monomial in monomials if monomial in kept]
+        parts = []
+        for monomial in monomials:
+            coefficient = self.terms[monomial]
+            factors = ([str(coefficient)] if coefficient != 1 or not monomial else []) + list(monomial)
+            parts.append("*".join(factors))
+        if left_out:
+            parts.append(f"... ({left_out} more terms)")
+        return " + ".join(parts) or "0"
+
+    def __str__(self):
+        return self.format()
+
+    def __repr__(self):
+        return f"Cost({self})"
+
+
+ZERO, ONE = Cost(), Cost.constant(1)
+
+
+class NodeCost:
+    __slots__ = ("runs", "calls", "bits", "work", "total")
+
+    def __init__(self, runs: Cost):
+        self.runs = runs # how often the statement runs (a loop or if: how often it is reached)
+        self.calls = ONE # calls of one run of the statement (with its body)
+        self.bits = 0 # size of the target after the statement (a loop or if: of its condition variable)
+        self.work = 0 # limb operations of one run of the statement itself (a loop or if: of a check of its condition)
+        self.total = 0 # limb operations of all runs of the statement with its body (evaluated)
+
+
+class LoopCost:
+    __slots__ = ("symbol", "trips", "reason", "growth", "sums")
+
+    def __init__(self, symbol: str, trips: Cost, reason: str):
+        self.symbol = symbol # n<k>, the name of the loop in the report
+        self.trips = trips # iterations per run of the loop
+        self.reason = reason # how the trip count was found
+        self.growth: Dict[int, int] = {} # variable -> bits it grows by per iteration (products)
+        self.sums: Set[int] = set() # variables growing by log2(trips) bits (sums)
+
+
+def limbs(bits: int) -> int:
+    return max(1, -(-bits // LIMB_BITS))
+
+
+def operation_bits(operator: str, a: int, b: int, value: Optional[int] = None) -> int:
+    # the size of x op y for operands of a and b bits (value: y if it is a constant)
+    if operator == "+":
+        return max(a, b) + 1 if a and b else max(a, b)
+    if operator == "-":
+        return a
+    if operator == "*":
+        return a + b if a and b else 0
+    if operator == "/":
+        return max(a - b + 1, 0) if b else 0
+    if operator == "%":
+        return min(a, b) if b else a
+    if operator == "<<":
+        return a + (value if value is not None else (1 << min(b, 24)) - 1) if a else 0
+    if operator == ">>":
+        return max(a - value, 0) if value is not None else a
+    if operator in ("==", "!=", ">"):
+        return 1
+    if operator == "max":
+        return max(a, b)
+    return min(a, b)
+
+
+def operation_work(operator: str, a: int, b: int, result: int) -> int:
+    if operator in ("*", "/", "%"):
+        return limbs(a) * limbs(b)
+    return max(limbs(a), limbs(b), limbs(result))
+
+
+def describe(node: Node) -> str:
+    # a statement in one line (loops and ifs without their bodies)
+    if isinstance(node, WhileNode):
+        return f"while x{node.condition.variable} > {node.condition.value} do"
+    if isinstance(node, IfNode):
+        return f"if x{node.condition.variable} > {node.condition.value} then"
+    return format_statements(node)
+
+
+def writes(node: Node) -> List[Node]:
+    # the assignments in a subtree
+    found, stack = [], [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, SequenceNode):
+            stack.extend(node.statements)
+        elif isinstance(node, WhileNode):
+            stack.append(node.body)
+        elif isinstance(node, IfNode):
+            stack.append(node.then_body)
+            if node.else_body is not None:
+                stack.append(node.else_body)
+        elif isinstance(node, (AssignmentNode, AssignmentNodeTwoVar, CopyNode)):
+            found.append(node)
+    return found
+
+
+class CostModel:
+    """
+    The costs of a program (or a statement): nodes maps the id of every statement to its NodeCost,
+    loops the id of every loop to its LoopCost. zero are the variables which are 0 at the start
+    (see SymbolTable.initially_zero), values the trip counts assumed for symbols.
+    """
+
+    def __init__(self, node: Node, zero: Iterable[int] = (0,), input_bits: int = INPUT_BITS,
+                 values: Dict[str, int] = None):
+        self.root = node.stmt if isinstance(node, ProgramNode) else node
+        self.zero: Set[int] = set(zero)
+        # the variables which stay 0 (a loop setting its counter to one of them runs once)
+        self.constant_zero = self.zero - {stmt.target for stmt in writes(self.root)}
+        self.input_bits = input_bits
+        self.values = values or {}
+        self.nodes: Dict[int, NodeCost] = {}
+        self.loops: Dict[int, LoopCost] = {}
+        self.statements: List[Node] = [] # in program order
+        self.analyse()
+        self.accumulate()
+
+    def cost(self, node: Node) -> NodeCost:
+        return self.nodes[id(node)]
+
+    def calls(self) -> Cost:
+        return self.cost(self.root).calls
+
+    def evaluate(self, cost: Cost) -> int:
+        return cost.evaluate(self.values)
+
+    def work(self) -> int:
+        return self.cost(self.root).total
+
+    def executions(self, node: Node) -> int:
+        # evaluated runs of a statement, for a loop the checks of its condition
+        cost = self.cost(node)
+        runs = self.evaluate(cost.runs)
+        if isinstance(node, WhileNode):
+            return runs * (self.evaluate(self.loops[id(node)].trips) + 1)
+        return runs
+
+    def trip_count(self, loop: WhileNode, previous: Sequence[Node]) -> Tuple[Cost, str]:
+        # the trip count of a loop and how it was found, previous are the statements before it in its sequence
+        variable, bound = loop.condition.variable, loop.condition.value
+        body = loop.body.statements if isinstance(loop.body, SequenceNode) else [loop.body]
+        assignments = [stmt for stmt in writes(loop.body) if stmt.target == variable]
+        if len(assignments) != 1 or not any(stmt is assignments[0] for stmt in body):
+            return None, "unknown"
+        stmt = assignments[0]
+        if isinstance(stmt, AssignmentNodeTwoVar) and stmt.source == stmt.x_k == variable and stmt.operator == "-" \
+                and (stmt.c_2, stmt.c_1) == (1, 1) \
+                or isinstance(stmt, AssignmentNode) and stmt.source in self.constant_zero and stmt.operator in ("+", "-") and stmt.value == 0 \
+                or isinstance(stmt, CopyNode) and stmt.source in self.constant_zero:
+            return ONE, f"sets x{variable} to 0"
+        if not (isinstance(stmt, AssignmentNode) and stmt.source == variable and stmt.operator == "-" and stmt.value > 0):
+            return None, "unknown"
+
+        # the value the counter starts with: the variable it is copied from just before the loop
+        start, copied = f"x{variable}", set()
+        for stmt in reversed(previous[-LOOKBACK:]):
+            if not isinstance(stmt, (AssignmentNode, AssignmentNodeTwoVar, CopyNode, PrintNode)):
+                break
+            if isinstance(stmt, PrintNode):
+                continue
+            if stmt.target == variable:
+                copy = isinstance(stmt, CopyNode) or isinstance(stmt, AssignmentNode) and stmt.operator == "+" and stmt.value == 0
+                if copy and stmt.source != variable and stmt.source not in copied:
+                    start = f"x{stmt.source}"
+                break
+            copied.add(stmt.target)
+        step = assignments[0].value
+        name = start if bound == 0 else f"({start} - {bound})"
+        name = name if step == 1 else f"({name} / {step})"
+        return Cost.symbol(name), f"counts x{variable} down by {step}"
+
+    def analyse(self):
+        # in program order: the runs, trip counts and sizes, frames hold the sizes of the variables before the
+        # innermost open loop or if changed them, scaling the variables it multiplies (or shifts or doubles)
+        bits: Dict[int, int] = {}
+        size = lambda variable: bits.get(variable, 0 if variable in self.zero else self.input_bits)
+        frames: List[Dict[int, int]] = [{}]
+        scaling: List[Set[int]] = [set()]
+        then_sizes: Dict[int, Dict[int, int]] = {}
+        loop_count = 0
+
+        def assign(variable, value, scales):
+            frames[-1].setdefault(variable, size(variable))
+            bits[variable] = min(value, MAX_BITS)
+            if scales:
+                scaling[-1].add(variable)
+
+        def close():
+            frame, scaled = frames.pop(), scaling.pop()
+            for variable, value in frame.items():
+                frames[-1].setdefault(variable, value)
+            scaling[-1].update(scaled)
+            return frame, scaled
+
+        stack = [(self.root, None, 0, ONE)] # (node, its sequence, index in it, runs) or (marker, node, 0, None)
+        while stack:
+            node, sequence, index, runs = stack.pop()
+            if node == "loop":
+                loop = self.loops[id(sequence)]
+                trips = self.evaluate(loop.trips)
+                frame, scaled = close()
+                for variable, before in frame.items():
+                    after = size(variable)
+                    if after <= before:
+                        continue
+                    if variable in scaled:
+                        # a product grows by the same number of bits per iteration
+                        loop.growth[variable] = after - before
+                        bits[variable] = min(after + (after - before) * max(trips - 1, 0), MAX_BITS)
+                    else:
+                        # a sum of trips numbers has log2(trips) bits more than the largest one
+                        loop.sums.add(variable)
+                        bits[variable] = min(after + max(trips - 1, 0).bit_length(), MAX_BITS)
+                continue
+            if node == "else":
+                then_sizes[id(sequence)] = {variable: size(variable) for variable in frames[-1]}
+                bits.update(frames[-1])
+                continue
+            if node == "join":
+                changed = then_sizes.pop(id(sequence))
+                for variable, before in close()[0].items():
+                    bits[variable] = max(size(variable), changed.get(variable, before))
+                continue
+            if node is None or isinstance(node, EmptyNode):
+                continue
+            if isinstance(node, SequenceNode):
+                stack.extend((stmt, node, k, runs) for k, stmt in reversed(list(enumerate(node.statements))))
+                continue
+
+            cost = self.nodes[id(node)] = NodeCost(runs)
+            self.statements.append(node)
+            if isinstance(node, WhileNode):
+                loop_count += 1
+                trips, reason = self.trip_count(node, sequence.statements[:index] if sequence is not None else [])
+                symbol = f"n{loop_count}"
+                loop = self.loops[id(node)] = LoopCost(symbol, trips or Cost.symbol(symbol), reason)
+                cost.bits = size(node.condition.variable)
+                cost.work = limbs(cost.bits)
+                frames.append({})
+                scaling.append(set())
+                stack.append(("loop", node, 0, None))
+                stack.append((node.body, None, 0, runs * loop.trips))
+            elif isinstance(node, IfNode):
+                cost.bits = size(node.condition.variable)
+                cost.work = limbs(cost.bits)
+                frames.append({})
+                scaling.append(set())
+                stack.append(("join", node, 0, None))
+                stack.append((node.else_body, None, 0, runs))
+                stack.append(("else", node, 0, None))
+                stack.append((node.then_body, None, 0, runs))
+            elif isinstance(node, AssignmentNode):
+                a, b = size(node.source), node.value.bit_length()
+                cost.bits = operation_bits(node.operator, a, b, node.value)
+                cost.work = operation_work(node.operator, a, b, cost.bits)
+                assign(node.target, cost.bits, node.operator in ("*", "<<") or node.source in scaling[-1])
+            elif isinstance(node, AssignmentNodeTwoVar):
+                # x_i = x_j op (x_k / c_2 * c_1)
+                a, b = size(node.source), size(node.x_k)
+                if (node.c_2, node.c_1) != (1, 1):
+                    b = operation_bits("*", operation_bits("/", b, node.c_2.bit_length()), node.c_1.bit_length())
+                if node.source == node.x_k and (node.c_2, node.c_1) == (1, 1) and node.operator in ("-", "%"):
+                    cost.bits = 0
+                else:
+                    cost.bits = operation_bits(node.operator, a, b)
+                cost.work = operation_work(node.operator, a, b, cost.bits)
+                assign(node.target, cost.bits, node.operator in ("*", "<<") or node.operator == "+" and node.source == node.x_k
+                       or node.source in scaling[-1] or node.x_k in scaling[-1])
+            elif isinstance(node, CopyNode):
+                cost.bits = size(node.source)
+                cost.work = limbs(cost.bits)
+                assign(node.target, cost.bits, node.source in scaling[-1])
+            elif isinstance(node, PrintNode):
+                cost.bits = size(node.variable)
+                cost.work = limbs(cost.bits) ** 2 # the conversion to decimal digits
+            else:
+                raise TypeError(f"CostModel: unexpected {type(node).__name__}")
+
+    def accumulate(self):
+        # bottom-up: the symbolic calls and the evaluated limb operations of every subtree
+        stack = [(self.root, False)]
+        while stack:
+            node, done = stack.pop()
+            if node is None:
+                continue
+            if isinstance(node, EmptyNode):
+                cost = self.nodes[id(node)] = NodeCost(ONE)
+                cost.calls = ZERO
+                continue
+            children = node.statements if isinstance(node, SequenceNode) else [node.body] if isinstance(node, WhileNode) \
+                else [node.then_body, node.else_body] if isinstance(node, IfNode) else []
+            if not done:
+                stack.append((node, True))
+                stack.extend((child, False) for child in children)
+                continue
+            parts = [self.nodes[id(child)] for child in children if child is not None]
+            if isinstance(node, SequenceNode):
+                cost = self.nodes[id(node)] = NodeCost(parts[0].runs if parts else ONE)
+                cost.calls = Cost.sum(part.calls for part in parts)
+                cost.total = sum(part.total for part in parts)
+                continue
+            cost = self.nodes[id(node)]
+            body_calls = Cost.sum(part.calls for part in parts)
+            body_total = sum(part.total for part in parts)
+            if isinstance(node, WhileNode):
+                trips = self.loops[id(node)].trips
+                cost.calls = trips * (ONE + body_calls) + ONE
+            else:
+                cost.calls = ONE + body_calls
+            cost.total = self.executions(node) * cost.work + body_total
+
+    def report(self, top: int = TOP) -> str:
+        """The totals, the statements with the most limb operations and the loops which take the most."""
+        total = max(self.work(), 1)
+        counted = sum(loop.reason.startswith("counts") for loop in self.loops.values())
+        once = sum(loop.reason.startswith("sets") for loop in self.loops.values())
+        lines = [
+            f"cost model: {len(self.statements)} statements, {len(self.loops)} loops ({counted} counted down, "
+            f"{once} run at most once, {len(self.loops) - counted - once} with unknown trip counts)",
+            f"estimated runtime calls: {self.calls().format(4, self.values)} = {self.evaluate(self.calls()):.3g}",
+            f"estimated limb operations: {self.work():.3g} ({LIMB_BITS}-bit limbs, inputs of {self.input_bits} bits)",
+            f"(unknown trip counts n<k> and start values x<i> counted as {LOOP_ITERATIONS}, sizes of the first iteration of a loop)",
+        ]
+        leaves = [node for node in self.statements if not isinstance(node, (WhileNode, IfNode))]
+        leaves.sort(key=lambda node: -self.cost(node).total)
+        lines += ["", f"{'share':>7} {'runs':>9} {'bits':>8} {'limbs':>6}  statement [runs]"]
+        for node in leaves[:top]:
+            cost = self.cost(node)
+            lines.append(
+                f"{cost.total / total:>7.1%} {self.executions(node):>9.3g} {cost.bits:>8} {cost.work:>6}  "
+                f"{describe(node)} [{cost.runs.format(2, self.values)}]"
+            )
+        loops = sorted((node for node in self.statements if isinstance(node, WhileNode)), key=lambda node: -self.cost(node).total)
+        if loops:
+            lines += ["", f"{'share':>7} {'loop':>6} {'trips':>12}  statement (growth per iteration)"]
+        for node in loops[:top]:
+            loop = self.loops[id(node)]
+            growth = [f"x{variable} +{bits} bits" for variable, bits in sorted(loop.growth.items(), key=lambda item: -item[1])]
+            growth += [f"x{variable} +log2" for variable in sorted(loop.sums)]
+            grows = ", ".join(growth[:3]) + (", ..." if len(growth) > 3 else "")
+            lines.append(
+                f"{self.cost(node).total / total:>7.1%} {loop.symbol:>6} {loop.trips.format(1):>12}  "
+                f"{describe(node)} ({loop.reason}{'; ' + grows if grows else ''})"
+            )
+        return "\n".join(lines)
+
+
+def cost_report(program: Node, zero: Iterable[int] = (0,), input_bits: int = INPUT_BITS, top: int = TOP) -> str:
+    return CostModel(program, zero, input_bits).report(top)
+
+
+def cheapest(alternatives: Sequence[Node], zero: Iterable[int] = (0,), input_bits: int = INPUT_BITS,
+             values: Dict[str, int] = None) -> int:
+    """
+    The index of the alternative with the fewest estimated limb operations (then the fewest calls), for
+    a pass choosing between equivalent rewrites of the same statements.
+    """
+    zero = set(zero)
+    costs = []
+    for alternative in alternatives:
+        model = CostModel(alternative, zero, input_bits, values)
+        costs.append((model.work(), model.evaluate(model.calls())))
+    return min(range(len(alternatives)), key=lambda index: costs[index])
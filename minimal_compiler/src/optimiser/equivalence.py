@@ -0,0 +1,307 @@
+"""
+Checks rewrite rules (see pattern_library) by running the pattern and its replacement on thousands of
+random inputs at once and comparing the values they leave in their variables. The statements are
+interpreted on NumPy arrays with one lane per input (BatchInterpreter), first with int64 lanes; the
+lanes whose values do not fit into an int64 are run again with Python ints.
+
+Every variable of a rule is an input (except for the values the rule assumes, see its where clause),
+the placeholders are bound to different variables. A lane which runs more than `budget` loop
+iterations (e.g. a shift loop with a large shift) is not decided and not compared.
+
+    python3 test.py -p [<file>.patterns ...]
+
+checks the built-in libraries and the given ones (parsed like PatternLibraryOptimiser does).
+"""
+from typing import Callable, Dict, List, Optional, Set
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.pattern_library import read_rules, parse_statements
+
+try:
+    import numpy
+except ImportError: # numpy is only needed for the equivalence checks
+    numpy = None
+
+INT64_MAX = 2**63 - 1
+# a lane stops after this many loop iterations (it is not decided)
+BUDGET = 1000
+# larger shifts are not evaluated with Python ints either (the lane is not decided)
+MAX_SHIFT = 1 << 16
+
+
+class BatchInterpreter:
+    """
+    Runs statements on many inputs at once: a variable is an array with one value per lane, a
+    statement runs on an array of lanes (indices), a loop runs its body on the lanes which still hold
+    its condition (so a long loop only costs for the lanes it runs on). The operators give the values
+    of the bigint library (- saturates at 0, x / 0 is 0 and x % 0 is x), the comparisons 1 or 0, also
+    where its shortcuts copy an operand onto the target which is that operand (see aliased).
+    dtype is int64 (a lane whose values leave the int64 range is marked in overflow and stops) or
+    object (Python ints).
+    """
+
+    def __init__(self, inputs: Dict[int, "numpy.ndarray"], dtype, budget: int = BUDGET):
+        self.lanes = len(next(iter(inputs.values())))
+        self.dtype = dtype
+        self.budget = budget
+        self.values = {variable: values.astype(dtype) for variable, values in inputs.items()}
+        self.steps = numpy.zeros(self.lanes, numpy.int64)
+        self.live = numpy.ones(self.lanes, bool) # lanes neither out of budget nor in overflow
+        self.overflow = numpy.zeros(self.lanes, bool)
+        self.printed = [] # (lanes, values) per echo
+
+    def variable(self, variable: int):
+        # variables which are no input start as 0
+        if variable not in self.values:
+            self.values[variable] = numpy.zeros(self.lanes, self.dtype) if self.dtype is not object else numpy.full(self.lanes, 0, object)
+        return self.values[variable]
+
+    def run(self, node: Node, lanes=None):
+        lanes = numpy.flatnonzero(self.live) if lanes is None else lanes
+        if isinstance(node, SequenceNode):
+            for stmt in node.statements:
+                lanes = lanes[self.live[lanes]]
+                self.run(stmt, lanes)
+        elif isinstance(node, AssignmentNode):
+            a = self.variable(node.source)[lanes]
+            self.assign(node.target, lanes, self.operate(node.operator, lanes, a, self.constant(node.value, lanes)))
+        elif isinstance(node, AssignmentNodeTwoVar):
+            a, b = self.variable(node.source)[lanes], self.variable(node.x_k)[lanes]
+            result = self.operate(node.operator, lanes, a, b)
+            self.assign(node.target, lanes, numpy.where(self.aliased(node, a, b), 0, result))
+        elif isinstance(node, CopyNode):
+            self.assign(node.target, lanes, self.variable(node.source)[lanes])
+        elif isinstance(node, PrintNode):
+            self.printed.append((lanes, self.variable(node.variable)[lanes]))
+        elif isinstance(node, WhileNode):
+            active = lanes[self.holds(node.condition, lanes)]
+            while len(active):
+                self.run(node.body, active)
+                self.steps[active] += 1
+                self.live[active[self.steps[active] > self.budget]] = False
+                active = active[self.live[active]]
+                active = active[self.holds(node.condition, active)]
+        elif isinstance(node, IfNode):
+            condition = self.holds(node.condition, lanes)
+            self.run(node.then_body, lanes[condition])
+            if node.else_body is not None:
+                self.run(node.else_body, lanes[~condition])
+        elif not isinstance(node, EmptyNode):
+            raise TypeError(f"Cannot interpret {type(node).__name__}")
+
+    def holds(self, condition: ConditionNode, lanes):
+        return self.variable(condition.variable)[lanes] > condition.value
+
+    def constant(self, value: int, lanes):
+        if self.dtype is not object and value > INT64_MAX:
+            self.fail(lanes)
+            return numpy.zeros(len(lanes), self.dtype)
+        return numpy.full(len(lanes), value, self.dtype)
+
+    def assign(self, target: int, lanes, values):
+        self.variable(target)[lanes] = values
+
+    def fail(self, lanes):
+        # lanes whose values cannot be computed with this dtype stop (with int64 they are in overflow)
+        self.live[lanes] = False
+        if self.dtype is not object:
+            self.overflow[lanes] = True
+
+    def operate(self, operator: str, lanes, a, b):
+        exact = self.dtype is object
+        if operator == "+":
+            result = a + b
+            if not exact:
+                self.fail(lanes[result < 0])
+        elif operator == "-":
+            result = numpy.where(a > b, a - b, 0)
+        elif operator == "*":
+            if not exact:
+                self.fail(lanes[(a > 0) & (b > INT64_MAX // numpy.maximum(a, 1))])
+            result = a * b
+        elif operator in ("/", "%"):
+            divisor = numpy.where(b == 0, 1, b)
+            result = numpy.where(b == 0, 0, a // divisor) if operator == "/" else numpy.where(b == 0, a, a % divisor)
+        elif operator == "<<":
+            too_large = (a > 0) & (b > (MAX_SHIFT if exact else 62))
+            shift = numpy.where(too_large, 0, b)
+            if not exact:
+                too_large |= a > INT64_MAX >> shift
+            self.fail(lanes[too_large])
+            result = numpy.where(too_large, 0, a << numpy.where(too_large, 0, shift))
+        elif operator == ">>":
+            too_large = b > (MAX_SHIFT if exact else 62)
+            result = numpy.where(too_large, 0, a >> numpy.where(too_large, 0, b))
+        elif operator in ("==", "!=", ">"):
+            result = numpy.where(a == b if operator == "==" else a != b if operator == "!=" else a > b, 1, 0)
+        elif operator == "max":
+            result = numpy.where(a > b, a, b)
+        elif operator == "min":
+            result = numpy.where(a > b, b, a)
+        else:
+            raise ValueError(f"Unknown operator {operator}")
+        return result
+
+    @staticmethod
+    def aliased(node: AssignmentNodeTwoVar, a, b):
+        # the lanes on which the bigint library gives 0: mul (an operand is 1), div (by 1) and mod (by a power of two)
+        # copy the other operand onto the target, and copy clears its destination first (x * 1 is 0 if the target is x)
+        power = lambda values: (values > 0) & ((values & (values - 1)) == 0)
+        target_a, target_b = node.target == node.source, node.target == node.x_k
+        if node.operator == "*":
+            return (a == 1) & target_b | ~power(a) & (b == 1) & target_a
+        if node.operator == "/":
+            return (b == 1) & target_a
+        if node.operator == "%":
+            return power(b) & (b != 1) & target_a
+        return numpy.zeros(len(a), bool)
+
+    def output(self, lane: int) -> List[int]:
+        # the values echoed by a lane
+        return [int(values[numpy.searchsorted(lanes, lane)]) for lanes, values in self.printed if lane in lanes]
+
+
+class Counterexample:
+    __slots__ = ("inputs", "pattern", "replacement")
+
+    def __init__(self, inputs: Dict[int, int], pattern: Dict, replacement: Dict):
+        self.inputs = inputs
+        self.pattern = pattern # the differing variables (and "echo") after the pattern
+        self.replacement = replacement # ... and after the replacement
+
+    def __str__(self):
+        inputs = ", ".join(f"x{variable} = {value}" for variable, value in sorted(self.inputs.items()))
+        differences = ", ".join(
+            f"{variable if variable == 'echo' else f'x{variable}'} is {self.pattern[variable]} instead of {self.replacement[variable]}"
+            for variable in self.pattern
+        )
+        return f"with {inputs or 'no inputs'}: {differences} after the pattern"
+
+
+class CheckResult:
+    __slots__ = ("name", "checked", "undecided", "counterexample")
+
+    def __init__(self, name: str, checked: int, undecided: int, counterexample: Optional[Counterexample]):
+        self.name = name
+        self.checked = checked # inputs both ran on to the end
+        self.undecided = undecided # inputs one of them ran out of budget on
+        self.counterexample = counterexample
+
+    def __str__(self):
+        if self.counterexample is not None:
+            return f"{self.name}: counterexample {self.counterexample}"
+        if self.checked == 0:
+            return f"{self.name}: not checked (no input ran to the end)"
+        return f"{self.name}: ok ({self.checked} inputs, {self.undecided} undecided)"
+
+
+def variables(node: Node) -> Set[int]:
+    found, stack = set(), [node]
+    while stack:
+        node = stack.pop()
+        for key in node.FIELDS:
+            value = getattr(node, key)
+            if key in node.VARIABLES:
+                found.add(value)
+            elif isinstance(value, Node):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend(value)
+    return found
+
+
+def random_inputs(names: List[int], samples: int, seed: int, max_bits: int = 6, assumptions: Dict[int, int] = None):
+    """
+    Random inputs (object arrays of Python ints): mostly small values (of up to max_bits bits, the
+    loops of the patterns run as often), so that 0 and equal values are frequent. In every eighth lane
+    about half of the values have up to 96 bits.
+    """
+    generator = numpy.random.default_rng(seed)
+    large_lanes = generator.random(samples) < 1 / 8
+    inputs = {}
+    for variable in names:
+        if assumptions and variable in assumptions:
+            inputs[variable] = numpy.full(samples, assumptions[variable], object)
+            continue
+        bits = generator.integers(0, max_bits + 1, samples)
+        values = generator.integers(0, numpy.left_shift(1, bits)).astype(object)
+        large = large_lanes & (generator.random(samples) < 1 / 2)
+        shifts = generator.integers(0, 35, samples).astype(object)
+        values[large] = generator.integers(0, 2**62, int(large.sum())).astype(object) << shifts[large]
+        inputs[variable] = values
+    return inputs
+
+
+def run_fast(node: Node, inputs: Dict, budget: int) -> BatchInterpreter:
+    # runs node with int64 lanes (the inputs which do not fit into an int64 are in overflow)
+    fits = numpy.ones(len(next(iter(inputs.values()))), bool)
+    for values in inputs.values():
+        fits &= values <= INT64_MAX
+    fast = BatchInterpreter({variable: numpy.where(fits, values, 0) for variable, values in inputs.items()}, numpy.int64, budget)
+    fast.fail(numpy.flatnonzero(~fits))
+    fast.run(node)
+    return fast
+
+
+def check_rule(pattern: Node, replacement: Node, assumptions: Dict[int, int] = None, name: str = "",
+               samples: int = 4096, seed: int = 0, budget: int = BUDGET) -> CheckResult:
+    """
+    Runs pattern and replacement on the same random inputs and compares the variables of both and
+    what they echo. Returns the counterexample with the smallest inputs (if there is one).
+    """
+    if numpy is None:
+        raise RuntimeError("NumPy is required for the equivalence checks")
+    names = sorted(variables(pattern) | variables(replacement))
+    inputs = random_inputs(names, samples, seed, assumptions=assumptions)
+
+    runs = [run_fast(pattern, inputs, budget), run_fast(replacement, inputs, budget)]
+    # the lanes one of them left the int64 range on are run again with Python ints
+    exact_lanes = numpy.flatnonzero(runs[0].overflow | runs[1].overflow)
+    exact = []
+    if len(exact_lanes):
+        for node in (pattern, replacement):
+            interpreter = BatchInterpreter({variable: values[exact_lanes] for variable, values in inputs.items()}, object, budget)
+            interpreter.run(node)
+            exact.append(interpreter)
+
+    def result(k: int, lane: int, variable):
+        # value of a variable (or the echoed values) of run k after a lane
+        position = numpy.searchsorted(exact_lanes, lane)
+        if position < len(exact_lanes) and exact_lanes[position] == lane:
+            interpreter, lane = exact[k], position
+        else:
+            interpreter = runs[k]
+        return interpreter.output(lane) if variable == "echo" else int(interpreter.variable(variable)[lane])
+
+    decided = runs[0].live & runs[1].live
+    if len(exact_lanes):
+        decided[exact_lanes] = exact[0].live & exact[1].live
+    differs = numpy.zeros(samples, bool)
+    for variable in names:
+        differs |= runs[0].variable(variable) != runs[1].variable(variable)
+    if runs[0].printed or runs[1].printed:
+        differs[:] = True # the echoed values are compared lane by lane below
+    differs[exact_lanes] = True
+    differs &= decided
+
+    counterexamples = []
+    for lane in numpy.flatnonzero(differs):
+        expected, actual = {}, {}
+        for variable in names + ["echo"]:
+            a, b = result(0, lane, variable), result(1, lane, variable)
+            if a != b:
+                expected[variable], actual[variable] = a, b
+        if expected:
+            counterexamples.append(Counterexample({variable: int(inputs[variable][lane]) for variable in names}, expected, actual))
+    counterexample = min(counterexamples, key=lambda example: sorted(example.inputs.values(), reverse=True), default=None)
+    return CheckResult(name, int(decided.sum()), samples - int(decided.sum()), counterexample)
+
+
+def check_library(path: str, parse_pattern: Callable[[str], Node] = parse_statements, samples: int = 4096,
+                  seed: int = 0) -> List[CheckResult]:
+    """Checks the rules of a library file, parse_pattern parses the patterns as the optimiser does."""
+    with open(path) as file:
+        text = file.read()
+    return [
+        check_rule(parse_pattern(pattern), parse_statements(replacement), assumptions, name, samples, seed)
+        for name, pattern, replacement, _, _, assumptions in read_rules(path, text)
+    ]
@@ -0,0 +1,205 @@
+from array import array
+from minimal_compiler.src.optimiser.ir_classes import *
+
+try:
+    import numpy
+except ImportError: # numpy is only needed for numpy_views
+    numpy = None
+
+
+# node kinds (a ConditionNode is stored in its WhileNode or IfNode)
+KIND_SEQUENCE = 0
+KIND_ASSIGNMENT = 1
+KIND_ASSIGNMENT_TWO_VAR = 2
+KIND_PRINT = 3
+KIND_WHILE = 4
+KIND_EMPTY = 5
+KIND_IF = 6
+KIND_COPY = 7
+
+# comparisons give 1 or 0, max and min the larger or smaller operand (see ComparisonOptimiser)
+OPERATORS = ("+", "-", "*", "/", "%", "<<", ">>", "==", "!=", ">", "max", "min")
+COMPARISONS = ("==", "!=", ">")
+OPERATOR_CODES = {operator: code for code, operator in enumerate(OPERATORS)}
+
+
+class FlatIR:
+    """
+    Struct-of-arrays form of the tree-IR of a program (the statement of its ProgramNode).
+
+    Every node is one index into parallel arrays, in pre-order, so the subtree of node i is
+    the range i .. end[i] - 1 and its children start at i + 1 (the next child at end[child]).
+
+    - kinds: KIND_* of the node
+    - target, source, x_k: variable ids (AssignmentNode and CopyNode: target, source; AssignmentNodeTwoVar:
+      target, source, x_k; PrintNode, WhileNode and IfNode: the variable in target)
+    - operators: index into OPERATORS
+    - values, c_2, c_1: index into constants (AssignmentNode: value; AssignmentNodeTwoVar:
+      c_2, c_1; WhileNode and IfNode: the value of the condition in values)
+
+    The children of an IfNode are its then body and, if it has one, its else body.
+
+    Constants are arbitrary size Python ints and therefore kept in a separate pool. There are
+    no per-node objects, so a large program takes a fraction of the memory of the tree and
+    bulk analyses can work on whole arrays (see numpy_views).
+    """
+
+    def __init__(self):
+        self.kinds = array("B")
+        self.end = array("I")
+        self.target = array("I")
+        self.source = array("I")
+        self.x_k = array("I")
+        self.operators = array("B")
+        self.values = array("I")
+        self.c_2 = array("I")
+        self.c_1 = array("I")
+
+        self.constants = [] # constant index -> value
+        self.constant_indices = {} # value -> constant index
+        self.reasons = {} # node index -> reason of an EmptyNode
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def constant(self, value):
+        index = self.constant_indices.get(value)
+        if index is None:
+            index = self.constant_indices[value] = len(self.constants)
+            self.constants.append(value)
+        return index
+
+    def add(self, kind, target=0, source=0, x_k=0, operator=0, value=0, c_2=0, c_1=0):
+        index = len(self.kinds)
+        self.kinds.append(kind)
+        self.end.append(index + 1) # corrected once the children are added
+        self.target.append(target)
+        self.source.append(source)
+        self.x_k.append(x_k)
+        self.operators.append(operator)
+        self.values.append(value)
+        self.c_2.append(c_2)
+        self.c_1.append(c_1)
+        return index
+
+    @classmethod
+    def from_tree(cls, node):
+        """Flattens a ProgramNode (or a statement) without recursion."""
+        flat = cls()
+        constant = flat.constant
+        end = flat.end
+
+        stack = [node.stmt if isinstance(node, ProgramNode) else node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, int): # all children of the node at this index are added
+                end[node] = len(flat.kinds)
+            elif isinstance(node, AssignmentNode):
+                flat.add(KIND_ASSIGNMENT, node.target, node.source, operator=OPERATOR_CODES[node.operator], value=constant(node.value))
+            elif isinstance(node, SequenceNode):
+                stack.append(flat.add(KIND_SEQUENCE))
+                stack.extend(reversed(node.statements))
+            elif isinstance(node, WhileNode):
+                stack.append(flat.add(KIND_WHILE, node.condition.variable, value=constant(node.condition.value)))
+                stack.append(node.body)
+            elif isinstance(node, IfNode):
+                stack.append(flat.add(KIND_IF, node.condition.variable, value=constant(node.condition.value)))
+                if node.else_body is not None:
+                    stack.append(node.else_body)
+                stack.append(node.then_body)
+            elif isinstance(node, AssignmentNodeTwoVar):
+                flat.add(
+                    KIND_ASSIGNMENT_TWO_VAR, node.target, node.source, node.x_k,
+                    OPERATOR_CODES[node.operator], c_2=constant(node.c_2), c_1=constant(node.c_1),
+                )
+            elif isinstance(node, CopyNode):
+                flat.add(KIND_COPY, node.target, node.source)
+            elif isinstance(node, PrintNode):
+                flat.add(KIND_PRINT, node.variable)
+            elif isinstance(node, EmptyNode):
+                flat.reasons[flat.add(KIND_EMPTY)] = node.reason
+            else:
+                raise TypeError(f"Can not flatten {type(node).__name__}")
+
+        return flat
+
+    def children(self, index):
+        child, end = index + 1, self.end[index]
+        while child < end:
+            yield child
+            child = self.end[child]
+
+    def variables(self):
+        """The ids of all variables used in the program."""
+        used = set()
+        for index, kind in enumerate(self.kinds):
+            if kind == KIND_ASSIGNMENT_TWO_VAR:
+                used.update((self.target[index], self.source[index], self.x_k[index]))
+            elif kind == KIND_ASSIGNMENT or kind == KIND_COPY:
+                used.update((self.target[index], self.source[index]))
+            elif kind in (KIND_PRINT, KIND_WHILE, KIND_IF):
+                used.add(self.target[index])
+        return used
+
+    def used_constants(self):
+        """The values of the constants the generated code reads (assignment values, conditions, the 1 of comparisons)."""
+        used = set()
+        comparisons = {OPERATOR_CODES[operator] for operator in COMPARISONS}
+        for index, kind in enumerate(self.kinds):
+            if kind == KIND_ASSIGNMENT or kind == KIND_WHILE or kind == KIND_IF:
+                used.add(self.constants[self.values[index]])
+            elif kind == KIND_ASSIGNMENT_TWO_VAR and self.operators[index] in comparisons:
+                used.add(1)
+        return used
+
+    def node(self, index):
+        """Builds the tree node of a single index (without its children)."""
+        kind = self.kinds[index]
+        constants = self.constants
+        if kind == KIND_ASSIGNMENT:
+            return AssignmentNode(self.target[index], self.source[index], OPERATORS[self.operators[index]], constants[self.values[index]])
+        elif kind == KIND_ASSIGNMENT_TWO_VAR:
+            return AssignmentNodeTwoVar(
+                self.target[index], self.source[index], OPERATORS[self.operators[index]], self.x_k[index],
+                constants[self.c_2[index]], constants[self.c_1[index]],
+            )
+        elif kind == KIND_COPY:
+            return CopyNode(self.target[index], self.source[index])
+        elif kind == KIND_PRINT:
+            return PrintNode(self.target[index])
+        elif kind == KIND_WHILE:
+            return WhileNode(ConditionNode(self.target[index], constants[self.values[index]]), None)
+        elif kind == KIND_IF:
+            return IfNode(ConditionNode(self.target[index], constants[self.values[index]]), None)
+        elif kind == KIND_SEQUENCE:
+            return SequenceNode([])
+        return EmptyNode(self.reasons[index])
+
+    def to_tree(self):
+        """Builds the ProgramNode again without recursion."""
+        if not self.kinds:
+            return ProgramNode(None)
+
+        nodes = [None] * len(self.kinds)
+        # add the nodes from the last to the first, so all children exist when their parent is built
+        for index in range(len(self.kinds) - 1, -1, -1):
+            node = nodes[index] = self.node(index)
+            if isinstance(node, SequenceNode):
+                node.statements = [nodes[child] for child in self.children(index)]
+            elif isinstance(node, WhileNode):
+                node.body = nodes[index + 1]
+            elif isinstance(node, IfNode):
+                node.then_body = nodes[index + 1]
+                if self.end[index + 1] < self.end[index]:
+                    node.else_body = nodes[self.end[index + 1]]
+
+        return ProgramNode(nodes[0])
+
+    def numpy_views(self):
+        """Zero-copy NumPy views of the node arrays (e.g. for bulk analyses of large programs)."""
+        if numpy is None:
+            raise RuntimeError("NumPy is required for numpy_views")
+        return {
+            name: numpy.frombuffer(getattr(self, name), dtype=numpy.uint8 if name in ("kinds", "operators") else numpy.uint32)
+            for name in ("kinds", "end", "target", "source", "x_k", "operators", "values", "c_2", "c_1")
+        }
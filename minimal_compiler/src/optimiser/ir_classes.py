@@ -1,21 +1,35 @@
 class Node:
+    # nodes use __slots__ (no per-node __dict__), FIELDS lists the attributes in order
+    __slots__ = ()
+    FIELDS = ()
+    # fields which hold a variable id (the number of the variable x<id>)
+    VARIABLES = ()
+
     def accept(self, visitor):
-        pass  
-    
+        pass
+
     def __str__(self):
         return "Node"
 
+    def __repr__(self):
+        return self.__str__()
+
 class ProgramNode(Node):
+    __slots__ = FIELDS = ("stmt",)
+
     def __init__(self, stmt):
         self.stmt = stmt
 
     def accept(self, visitor):
-        return visitor.visitProg(self) 
+        return visitor.visitProg(self)
 
     def __str__(self):
         return f"ProgramNode({self.stmt})"
 
 class AssignmentNode(Node):
+    __slots__ = FIELDS = ("target", "source", "operator", "value")
+    VARIABLES = ("target", "source")
+
     def __init__(self, target, source, operator, value):
         self.target = target
         self.source = source
@@ -26,9 +40,28 @@ class AssignmentNode(Node):
         return visitor.visitAssignmentStmt(self)
 
     def __str__(self):
-        return f"AssignmentNode({self.target}, {self.source}, {self.operator}, {self.value})"
-    
+        return f"AssignmentNode(x{self.target}, x{self.source}, {self.operator}, {self.value})"
+
+class CopyNode(Node):
+    # target = source with $copy instead of an addition of 0 (source is never the target), only created by
+    # CopyOptimiser after all other optimisers (which only know x = y + 0)
+    __slots__ = FIELDS = ("target", "source")
+    VARIABLES = ("target", "source")
+
+    def __init__(self, target, source):
+        self.target = target
+        self.source = source
+
+    def accept(self, visitor):
+        return visitor.visitCopyStmt(self)
+
+    def __str__(self):
+        return f"CopyNode(x{self.target}, x{self.source})"
+
 class PrintNode(Node):
+    __slots__ = FIELDS = ("variable",)
+    VARIABLES = ("variable",)
+
     def __init__(self, variable):
         self.variable = variable
 
@@ -36,9 +69,11 @@ class PrintNode(Node):
         return visitor.visitPrintStmt(self)
 
     def __str__(self):
-        return f"PrintNode({self.variable})"
+        return f"PrintNode(x{self.variable})"
 
 class WhileNode(Node):
+    __slots__ = FIELDS = ("condition", "body")
+
     def __init__(self, condition, body):
         self.condition = condition
         self.body = body
@@ -49,7 +84,26 @@ class WhileNode(Node):
     def __str__(self):
         return f"WhileNode({self.condition}, {self.body})"
 
+class IfNode(Node):
+    # runs then_body once if the condition holds, else else_body (None: nothing), only created by
+    # BranchOptimiser after all other optimisers (which only know while loops)
+    __slots__ = FIELDS = ("condition", "then_body", "else_body")
+
+    def __init__(self, condition, then_body, else_body=None):
+        self.condition = condition
+        self.then_body = then_body
+        self.else_body = else_body
+
+    def accept(self, visitor):
+        return visitor.visitIfStmt(self)
+
+    def __str__(self):
+        return f"IfNode({self.condition}, {self.then_body}, {self.else_body})"
+
 class ConditionNode(Node):
+    __slots__ = FIELDS = ("variable", "value")
+    VARIABLES = ("variable",)
+
     def __init__(self, variable, value):
         self.variable = variable
         self.value = value
@@ -58,9 +112,11 @@ class ConditionNode(Node):
         return visitor.visitCondition(self)
 
     def __str__(self):
-        return f"ConditionNode({self.variable}, {self.value})"
+        return f"ConditionNode(x{self.variable}, {self.value})"
 
 class SequenceNode(Node):
+    __slots__ = FIELDS = ("statements",)
+
     def __init__(self, statements):
         self.statements = statements
 
@@ -69,9 +125,12 @@ class SequenceNode(Node):
 
     def __str__(self):
         return f"SequenceNode({self.statements})"
-    
+
 class AssignmentNodeTwoVar(Node):
-    def __init__(self, target, source, operator, x_k, c_2, c_1): 
+    __slots__ = FIELDS = ("target", "source", "operator", "x_k", "c_2", "c_1")
+    VARIABLES = ("target", "source", "x_k")
+
+    def __init__(self, target, source, operator, x_k, c_2, c_1):
         self.target = target
         self.source = source
         self.operator = operator
@@ -83,9 +142,11 @@ class AssignmentNodeTwoVar(Node):
         return visitor.visitAssignmentTwoVarStmt(self)
 
     def __str__(self):
-        return f"AssignmentNodeTwoVar({self.target}, {self.source}, {self.operator}, {self.x_k}, {self.c_2}, {self.c_1})"
-    
+        return f"AssignmentNodeTwoVar(x{self.target}, x{self.source}, {self.operator}, x{self.x_k}, {self.c_2}, {self.c_1})"
+
 class EmptyNode(Node):
+    __slots__ = FIELDS = ("reason",)
+
     def __init__(self, reason):
         self.reason = reason
 
@@ -93,4 +154,4 @@ class EmptyNode(Node):
         return visitor.visitEmptyNode(self)
 
     def __str__(self):
-        return "EmptyNode"
\ No newline at end of file
+        return "EmptyNode"
@@ -0,0 +1,89 @@
+from typing import List, Optional
+from minimal_compiler.src.optimiser.base_optimiser import BaseOptimiser, DirtyRegions
+from minimal_compiler.src.optimiser.ir_classes import *
+
+
+class LoopOptimiser(BaseOptimiser):
+    """
+    Base of optimisers which replace single while loops by other statements (see rewrite_loop).
+
+    The loops are visited inner before outer, so the replacement of an inner loop can make the
+    enclosing loop replaceable within the same round. In later rounds of the fixpoint driver only
+    new loops and loops containing a change are visited. Everything runs on explicit stacks.
+    """
+
+    def rewrite_loop(self, loop: WhileNode) -> Optional[List[Node]]:
+        # the statements replacing the loop, None to keep it
+        return None
+
+    def split_points(self, statements):
+        # a loop is replaced on its own, every top-level statement can be optimised independently
+        return list(range(1, len(statements)))
+
+    def optimise(self, node):
+        return self.optimise_round(node, None)[0]
+
+    def optimise_round(self, node, dirty):
+        if dirty is not None and dirty.everything:
+            dirty = None
+        changes = DirtyRegions()
+        if dirty is not None and not dirty.is_changed(DirtyRegions.ROOT):
+            return node, changes
+
+        program = ProgramNode(node.stmt)
+        parents = {} # id of an owner of statements -> owner of the enclosing statements
+        owners = [] # (owner, visit its loops), pre-order
+        stack = [(DirtyRegions.ROOT, dirty)]
+        while stack:
+            owner, owner_dirty = stack.pop()
+            owners.append((owner, owner_dirty))
+            for stmt in self.statements(program, owner):
+                if not isinstance(stmt, (WhileNode, SequenceNode)):
+                    continue
+                if owner_dirty is None or owner_dirty.is_new(stmt):
+                    stmt_dirty = None
+                elif owner_dirty.is_changed(stmt):
+                    stmt_dirty = owner_dirty
+                else:
+                    continue
+                parents[id(stmt)] = owner
+                stack.append((stmt, stmt_dirty))
+
+        replaced = {} # id of a loop -> its replacement
+        rebuild = set() # ids of owners with a replaced statement
+        for owner, owner_dirty in reversed(owners): # every owner after everything below it
+            if id(owner) in rebuild:
+                statements = []
+                for stmt in self.statements(program, owner):
+                    statements.extend(replaced.get(id(stmt), (stmt,)))
+                self.set_statements(program, owner, statements)
+
+            if isinstance(owner, WhileNode):
+                replacement = self.rewrite_loop(owner)
+                if replacement is not None:
+                    replaced[id(owner)] = replacement
+                    parent = parents[id(owner)]
+                    rebuild.add(id(parent))
+                    for stmt in replacement:
+                        changes.add_new(stmt)
+                    changes.add_changed(parent, parents)
+
+        return program, changes
+
+    @staticmethod
+    def statements(program: ProgramNode, owner) -> List[Node]:
+        node = program.stmt if owner is DirtyRegions.ROOT else owner.body if isinstance(owner, WhileNode) else owner
+        if node is None:
+            return []
+        return node.statements if isinstance(node, SequenceNode) else [node]
+
+    @staticmethod
+    def set_statements(program: ProgramNode, owner, statements: List[Node]):
+        if isinstance(owner, SequenceNode):
+            owner.statements = statements
+            return
+        node = statements[0] if len(statements) == 1 else SequenceNode(statements)
+        if owner is DirtyRegions.ROOT:
+            program.stmt = node
+        else:
+            owner.body = node
@@ -0,0 +1,109 @@
+from typing import List, Optional
+from minimal_compiler.src.optimiser.base_optimiser import BaseOptimiser, DirtyRegions
+from minimal_compiler.src.optimiser.loop_optimiser import LoopOptimiser
+from minimal_compiler.src.optimiser.ast import flatten_ast
+from minimal_compiler.src.optimiser.ir_classes import *
+
+
+def combine(first: AssignmentNode, second: AssignmentNode) -> Optional[tuple]:
+    # (operator, constant) of x = y op c doing the same as first: x = y op a; second: x = x op b, None if there is none
+    a, b = first.value, second.value
+    if first.operator == second.operator:
+        return first.operator, a + b # y + a + b, and (y - a) - b saturates exactly like y - (a + b)
+    if first.operator == "+":
+        # (y + a) - b is max(y + a - b, 0) (y + a is never negative), which is y + (a - b) or y - (b - a)
+        return ("+", a - b) if a >= b else ("-", b - a)
+    if a == 0 or b == 0:
+        return ("+", b) if a == 0 else ("-", a)
+    return None # (y - a) + b with a, b > 0: y is lost below a, so it is not y + (b - a)
+
+
+class ArithmeticChainOptimiser(BaseOptimiser):
+    """
+    Merges consecutive constant updates of the same variable into one assignment:
+
+        x = x + 1;                          x = y + 0;
+        x = x + 1;    =>    x = x + 3       x = x + 7     =>    x = y + 7
+        x = x + 1
+
+    A statement x = x op b merges into the assignment x = y op a before it (y may be x, so copies
+    are merged as well). The subtraction saturates at 0: (y + a) - b and (y - a) - b are single
+    assignments again, (y - a) + b is not unless a or b is 0. A chain which cancels out (x = x + 0)
+    is removed. Every merge saves an $add / $sub call at runtime, and the constants of the merged
+    statements are no longer generated if nothing else uses them.
+    """
+    VERSION = 1
+
+    def optimise(self, node):
+        return self.optimise_round(node, None)[0]
+
+    def optimise_round(self, node, dirty):
+        if dirty is not None and dirty.everything:
+            dirty = None
+        changes = DirtyRegions()
+        if self.constant_table is None or (dirty is not None and not dirty.is_changed(DirtyRegions.ROOT)):
+            return node, changes # the merged constants have to be added to the constant table
+
+        # rewrites in earlier rounds are spliced in flat, so only a whole program pass flattens
+        program = ProgramNode(flatten_ast(node.stmt) if dirty is None and node.stmt is not None else node.stmt)
+        parents = {} # id of an owner of statements -> owner of the enclosing statements
+        stack = [(DirtyRegions.ROOT, dirty)]
+        while stack:
+            owner, owner_dirty = stack.pop()
+            before = LoopOptimiser.statements(program, owner)
+            after = self.merge(before)
+            if len(after) != len(before) or any(a is not b for a, b in zip(after, before)):
+                changes.add_rewritten(owner, parents, before, after)
+                LoopOptimiser.set_statements(program, owner, after)
+
+            for stmt in after:
+                if not isinstance(stmt, (WhileNode, SequenceNode)):
+                    continue
+                if owner_dirty is None or owner_dirty.is_new(stmt):
+                    stmt_dirty = None
+                elif owner_dirty.is_changed(stmt):
+                    stmt_dirty = owner_dirty
+                else:
+                    continue
+                parents[id(stmt)] = owner
+                stack.append((stmt, stmt_dirty))
+
+        return program, changes
+
+    def merge(self, statements: List[Node]) -> List[Node]:
+        # the statement list with all chains merged (the list is a stack: a merged statement can merge again)
+        merged = []
+        for stmt in statements:
+            chain = False
+            while merged and self.continues_chain(merged[-1], stmt):
+                previous = merged.pop()
+                operator, value = combine(previous, stmt)
+                stmt = AssignmentNode(previous.target, previous.source, operator, self.constant(value))
+                chain = True
+            if chain and self.has_no_effect(stmt):
+                continue # a chain which cancels out
+            merged.append(stmt)
+        return merged
+
+    @staticmethod
+    def continues_chain(previous: Node, stmt: Node) -> bool:
+        return isinstance(previous, AssignmentNode) and isinstance(stmt, AssignmentNode) \
+            and stmt.source == stmt.target == previous.target and combine(previous, stmt) is not None
+
+    @staticmethod
+    def has_no_effect(stmt: Node) -> bool:
+        return isinstance(stmt, AssignmentNode) and stmt.target == stmt.source and stmt.value == 0
+
+    def window_size(self):
+        return 2
+
+    def split_points(self, statements):
+        # a removed chain joins its neighbours, so regions are only split next to a statement which is no assignment
+        return [
+            i for i in range(1, len(statements))
+            if not (isinstance(statements[i - 1], AssignmentNode) and isinstance(statements[i], AssignmentNode))
+        ]
+
+    def constant(self, value: int) -> int:
+        self.constant_table.add(value)
+        return value
@@ -0,0 +1,138 @@
+from typing import List, Optional, Set
+from minimal_compiler.src.optimiser.base_optimiser import BaseOptimiser, DirtyRegions
+from minimal_compiler.src.optimiser.loop_optimiser import LoopOptimiser
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.optimisers.comparisons import assigned
+from minimal_compiler.src.optimiser.optimisers.dead_stores import uses
+
+
+class BranchOptimiser(BaseOptimiser):
+    """
+    Lowers the loops which run at most once (the if and if_else templates of the transpiler) to
+    if blocks:
+
+        while d > 0 do              if d > 0 then
+            ...;            =>          ...;
+            d = g + 0                   d = g + 0
+        end                         end
+
+    A loop runs at most once if its body ends with setting the condition variable to 0 (d = d - d,
+    or d = g + 0 / d = g - c with g a variable which is 0 at the start and never assigned). The
+    flag copied into d by the template is tested directly (d = a + 0; if d > 0 then ... becomes
+    d = d - d; if a > 0 then ... if the body neither reads d nor assigns a), and the else branch of
+    if_else (e = a == g; if e > 0 then ...; e = g + 0 end right after the if on a) becomes the else
+    body of that if.
+
+    The other optimisers only know while loops, so this runs once after them (see OptimiserManager).
+    """
+    VERSION = 1
+
+    def __init__(self, max_argument_id: Optional[int] = None):
+        self.max_argument_id = max_argument_id
+
+    def version(self):
+        return f"{super().version()}:{self.max_argument_id}"
+
+    def optimise(self, node):
+        if node.stmt is None:
+            return node
+        program = ProgramNode(node.stmt)
+        zero_constants = set()
+        if self.symbol_table is not None:
+            zero_constants = self.symbol_table.initially_zero(self.max_argument_id) - assigned(program)
+
+        owners, stack = [], [DirtyRegions.ROOT]
+        while stack:
+            owner = stack.pop()
+            owners.append(owner)
+            stack.extend(stmt for stmt in LoopOptimiser.statements(program, owner) if isinstance(stmt, WhileNode))
+        for owner in reversed(owners): # the bodies of a loop are lowered before the loop itself
+            statements = LoopOptimiser.statements(program, owner)
+            LoopOptimiser.set_statements(program, owner, self.lower(statements, zero_constants))
+        return program
+
+    def lower(self, statements: List[Node], zero_constants: Set[int]) -> List[Node]:
+        result = []
+        for stmt in statements:
+            body = LoopOptimiser.statements(None, stmt) if isinstance(stmt, WhileNode) else None
+            if not body or not self.is_zeroing(body[-1], stmt.condition.variable, zero_constants):
+                result.append(stmt)
+                continue
+
+            flag = stmt.condition.variable
+            inner = body[:-1]
+            branch = self.branch_before(result, flag, inner, zero_constants)
+            if branch is not None:
+                # e = a == g; if e > 0 then ... is the else branch of the if on a
+                result[-1] = AssignmentNodeTwoVar(flag, flag, "-", flag, 1, 1)
+                if inner:
+                    branch.else_body = SequenceNode(inner)
+                continue
+
+            previous = result[-1] if result else None
+            if isinstance(previous, AssignmentNode) and previous.target == flag and previous.operator == "+" \
+                    and previous.value == 0 and previous.source != flag and flag not in variables(inner) \
+                    and previous.source not in assigned(ProgramNode(SequenceNode(inner))):
+                # d = a + 0; if d > 0 then ... tests a directly, d is 0 afterwards in both cases
+                result[-1] = AssignmentNodeTwoVar(flag, flag, "-", flag, 1, 1)
+                if inner:
+                    result.append(IfNode(ConditionNode(previous.source, 0), SequenceNode(inner)))
+                continue
+
+            result.append(IfNode(stmt.condition, SequenceNode(body)))
+        return result
+
+    def branch_before(self, result: List[Node], flag: int, inner: List[Node], zero_constants: Set[int]) -> Optional[IfNode]:
+        # the if without else on a if the statements end with it and flag = a == g (only temporaries which the
+        # else body does not use are zeroed in between, the else body can move in front of them)
+        if not result or not self.is_else(result[-1], flag, zero_constants):
+            return None
+        condition, used = result[-1].source, variables(SequenceNode(inner))
+        if flag in used:
+            return None
+        k = len(result) - 2
+        while k >= 0 and isinstance(result[k], AssignmentNodeTwoVar) and result[k].operator == "-" \
+                and result[k].source == result[k].x_k == result[k].target and result[k].target not in used \
+                and result[k].target not in (condition, flag):
+            k -= 1
+        branch = result[k] if k >= 0 else None
+        if not isinstance(branch, IfNode) or branch.else_body is not None or branch.condition.variable != condition \
+                or condition in assigned(ProgramNode(branch.then_body)) or flag in variables(branch.then_body):
+            return None
+        return branch
+
+    @staticmethod
+    def is_zeroing(stmt: Node, variable: int, zero_constants: Set[int]) -> bool:
+        # whether stmt sets variable to 0
+        if isinstance(stmt, AssignmentNodeTwoVar):
+            return stmt.target == variable and stmt.operator == "-" and stmt.source == stmt.x_k
+        if isinstance(stmt, AssignmentNode):
+            return stmt.target == variable and stmt.source in zero_constants \
+                and (stmt.operator == "-" or stmt.operator == "+" and stmt.value == 0)
+        return False
+
+    @staticmethod
+    def is_else(stmt: Node, variable: int, zero_constants: Set[int]) -> bool:
+        # whether stmt is variable = a == g
+        return isinstance(stmt, AssignmentNodeTwoVar) and stmt.target == variable and stmt.operator == "==" \
+            and stmt.x_k in zero_constants and stmt.source != variable
+
+
+def variables(node: Node) -> Set[int]:
+    # the variables read or assigned in a statement (nested statements included)
+    result, stack = set(), [node] if node is not None else []
+    while stack:
+        node = stack.pop()
+        result.update(uses(node))
+        if isinstance(node, (AssignmentNode, AssignmentNodeTwoVar)):
+            result.add(node.target)
+        elif isinstance(node, WhileNode):
+            stack.append(node.body)
+        elif isinstance(node, SequenceNode):
+            stack.extend(node.statements)
+        elif isinstance(node, IfNode):
+            result.add(node.condition.variable)
+            stack.append(node.then_body)
+            if node.else_body is not None:
+                stack.append(node.else_body)
+    return result
@@ -0,0 +1,80 @@
+import os
+from typing import Dict, Optional, Set
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.ast import flatten_ast
+from minimal_compiler.src.optimiser.optimisers.structural_tree_pattern_matching import StructuralTreePatternMatchingOptimiser
+
+# placeholder of the global zero constant of the transpiler ({{g}} in the templates)
+ZERO = 9
+
+
+class ComparisonOptimiser(StructuralTreePatternMatchingOptimiser):
+    """
+    Replaces the comparison templates of the transpiler (transpiler/src/generator/templates) by the
+    native comparisons of the tree-IR: x = y == z, x = y != z and x = y > z (1 or 0) and
+    x = y max z, x = y min z. The patterns are the templates as StructuralTreePatternMatchingOptimiser
+    leaves them (its 2 variable pattern turns the subtraction loops into y = y - z), so this optimiser
+    runs after it. The temporaries of a template are 0 afterwards, the replacement zeroes them as well
+    (the flags of if and if_else last, next to the loops testing them, see BranchOptimiser).
+
+    Most templates set their flags with the global zero constant (x9 in the patterns). A match is only
+    replaced if x9 is bound to a variable which is 0 at the start (see SymbolTable.initially_zero, so
+    only with a max argument id) and never assigned, and if the placeholders are bound to different
+    variables (the templates only use fresh temporaries).
+    """
+    VERSION = 1
+
+    PATTERN_FILE = os.path.join(os.path.dirname(__file__), "patterns", "comparisons.patterns")
+
+    def __init__(self, max_argument_id: Optional[int] = None):
+        self.max_argument_id = max_argument_id
+        self.zero_constants: Set[int] = set()
+
+    def version(self):
+        return f"{super().version()}:{self.max_argument_id}"
+
+    @classmethod
+    def pattern_key(cls) -> str:
+        # the patterns depend on the rules of the structural optimiser
+        return f"{super().pattern_key()}:{StructuralTreePatternMatchingOptimiser.engine().key}"
+
+    @classmethod
+    def parse_pattern(cls, pattern: str) -> Node:
+        # the templates as the structural optimiser rewrites them
+        return flatten_ast(StructuralTreePatternMatchingOptimiser.engine().rewrite(super().parse_pattern(pattern)))
+
+    def accept(self, pattern, bindings: Dict[int, int]) -> bool:
+        if len(set(bindings.values())) != len(bindings):
+            return False
+        if ZERO in bindings:
+            if bindings[ZERO] not in self.zero_constants:
+                return False
+            self.constant_table.add(1) # the result of a comparison
+        return True
+
+    def optimise(self, node):
+        return self.optimise_round(node, None)[0]
+
+    def optimise_round(self, node, dirty):
+        self.zero_constants = set()
+        if self.symbol_table is not None and self.constant_table is not None:
+            self.zero_constants = self.symbol_table.initially_zero(self.max_argument_id) - assigned(node)
+        return super().optimise_round(node, dirty)
+
+
+def assigned(node: ProgramNode) -> Set[int]:
+    # the variables assigned anywhere in the program
+    variables, stack = set(), [node.stmt] if node.stmt is not None else []
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (AssignmentNode, AssignmentNodeTwoVar)):
+            variables.add(node.target)
+        elif isinstance(node, WhileNode):
+            stack.append(node.body)
+        elif isinstance(node, SequenceNode):
+            stack.extend(node.statements)
+        elif isinstance(node, IfNode):
+            stack.append(node.then_body)
+            if node.else_body is not None:
+                stack.append(node.else_body)
+    return variables
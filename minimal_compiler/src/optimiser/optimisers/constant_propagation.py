@@ -0,0 +1,298 @@
+from typing import Dict, List, Optional, Set
+from minimal_compiler.src.optimiser.base_optimiser import BaseOptimiser, DirtyRegions
+from minimal_compiler.src.optimiser.loop_optimiser import LoopOptimiser
+from minimal_compiler.src.optimiser.ast import flatten_ast, copy_ast
+from minimal_compiler.src.optimiser.ir_classes import *
+
+# known values above this size are dropped (keeps the constant table and the compile time small)
+MAX_BITS = 256
+
+
+def apply(operator: str, a: int, b: int) -> Optional[int]:
+    # value of a operator b as computed by the bigint library, None if it is not folded
+    if operator == "+":
+        result = a + b
+    elif operator == "-":
+        result = max(a - b, 0) # saturating
+    elif operator == "*":
+        result = a * b
+    elif operator == "/":
+        result = a // b if b else None
+    elif operator == "%":
+        result = a % b if b else None
+    elif operator == "<<":
+        result = a << b if b <= MAX_BITS else None
+    elif operator == ">>":
+        result = a >> b
+    elif operator == "==":
+        result = int(a == b)
+    elif operator == "!=":
+        result = int(a != b)
+    elif operator == ">":
+        result = int(a > b)
+    elif operator == "max":
+        result = max(a, b)
+    elif operator == "min":
+        result = min(a, b)
+    else:
+        return None
+    return result if result is not None and result.bit_length() <= MAX_BITS else None
+
+
+def evaluate(stmt: Node, known: Dict[int, int]) -> Optional[int]:
+    # value assigned by an assignment if all its operands are known
+    if isinstance(stmt, AssignmentNode):
+        a = known.get(stmt.source)
+        return None if a is None else apply(stmt.operator, a, stmt.value)
+    if stmt.operator == "-" and stmt.source == stmt.x_k:
+        return 0
+    a, b = known.get(stmt.source), known.get(stmt.x_k)
+    return None if a is None or b is None else apply(stmt.operator, a, b)
+
+
+def known_value(stmt: Node, old: Optional[int], value: int, constant_table) -> Optional[List[Node]]:
+    # the cheapest statements giving the target of stmt the known value (old: its known value before), None to keep stmt
+    target = stmt.target
+    if old == value:
+        return []
+    if value == 0:
+        return [AssignmentNodeTwoVar(target, target, "-", target, 1, 1)]
+    if old is not None and constant_table is not None:
+        constant_table.add(abs(value - old))
+        return [AssignmentNode(target, target, "+" if value > old else "-", abs(value - old))]
+    if isinstance(stmt, AssignmentNodeTwoVar) and stmt.operator not in ("+", "-") and constant_table is not None:
+        # setting a constant (two cheap calls) instead of a multiplication, division or shift
+        constant_table.add(value)
+        return [AssignmentNodeTwoVar(target, target, "-", target, 1, 1), AssignmentNode(target, target, "+", value)]
+    return None
+
+
+def same(a: Node, b: Node) -> bool:
+    return type(a) is type(b) and all(getattr(a, key) == getattr(b, key) for key in a.FIELDS)
+
+
+class ConstantPropagationOptimiser(BaseOptimiser):
+    """
+    Forward propagation of known variable values (x0 and the temporaries start as 0, e.g. x = x - x
+    makes x known, and so does leaving a loop: while x > 0 ends with x = 0).
+
+    - an assignment of a known value becomes the cheapest equivalent statement: nothing if the
+      variable already holds the value, x = x - x for 0, x = x + d or x = x - d if its old value
+      is known (a known operand of x = y + z turns into a constant operand)
+    - a loop whose condition variable is known to be 0 is removed
+    - a loop whose number of iterations follows from the known values (e.g. the if idiom
+      g = 1; while g > 0 do ...; g = g - g end) is replaced by the assignments of its final
+      values if they are all known, else by copies of its body
+
+    A loop which stays is entered with every variable it assigns unknown, so only values which
+    do not change in the loop are propagated into it.
+
+    Every variable is an argument of the generated main function, so only x0 and the temporaries
+    are known at the start. With max_argument_id the program is only ever called with the arguments
+    up to it and all higher variables start as 0 (e.g. the zero constant {{g}} of transpiled E-WHILE).
+    """
+    VERSION = 1
+
+    # loops running up to MAX_TRIPS times are evaluated, unrolled if the copies have at most UNROLL_BUDGET nodes
+    MAX_TRIPS = 64
+    UNROLL_BUDGET = 64
+
+    def __init__(self, max_argument_id: Optional[int] = None):
+        self.max_argument_id = max_argument_id
+        self.assigned_in = {} # id of a loop -> (loop, variables assigned in it)
+
+    def version(self):
+        return f"{super().version()}:{self.max_argument_id}"
+
+    def optimise(self, node):
+        return self.optimise_round(node, None)[0]
+
+    def optimise_round(self, node, dirty):
+        # the values flow through the whole program, so every round visits everything
+        changes = DirtyRegions()
+        program = ProgramNode(flatten_ast(node.stmt) if node.stmt is not None else None)
+        self.assigned_in = {}
+        for loop in reversed(self.loops(program)): # inner loops first, so every subtree is walked once
+            self.assigned(loop)
+
+        known = {0: 0}
+        if self.symbol_table is not None:
+            known = dict.fromkeys(self.symbol_table.initially_zero(self.max_argument_id), 0)
+
+        parents = {} # id of a loop -> owner of the enclosing statements
+        work = [(DirtyRegions.ROOT, known)] # (owner, known values before its statements)
+        while work:
+            owner, known = work.pop()
+            before = LoopOptimiser.statements(program, owner)
+            after = []
+            pending = before[::-1]
+            while pending:
+                stmt = pending.pop()
+                if isinstance(stmt, (AssignmentNode, AssignmentNodeTwoVar)):
+                    after.extend(self.propagate(stmt, known))
+                elif isinstance(stmt, WhileNode):
+                    counter = stmt.condition.variable
+                    if known.get(counter) == 0:
+                        continue
+                    simulated = self.simulate(stmt, known)
+                    if simulated is not None:
+                        trips, values = simulated
+                        replacement = self.final_values(stmt, known, values)
+                        if replacement is not None:
+                            after.extend(replacement)
+                            continue
+                        if trips == 1 or trips * self.size(stmt.body) <= self.UNROLL_BUDGET:
+                            body = self.body(stmt)
+                            pending.extend(reversed(body if trips == 1 else [copy_ast(s) for _ in range(trips) for s in body]))
+                            continue
+                    for variable in self.assigned(stmt):
+                        known.pop(variable, None)
+                    parents[id(stmt)] = owner
+                    work.append((stmt, dict(known)))
+                    known[counter] = 0
+                    after.append(stmt)
+                else:
+                    after.append(stmt)
+
+            if len(after) != len(before) or any(a is not b for a, b in zip(after, before)):
+                changes.add_rewritten(owner, parents, before, after)
+                LoopOptimiser.set_statements(program, owner, after)
+
+        return program, changes
+
+    def propagate(self, stmt: Node, known: Dict[int, int]) -> List[Node]:
+        # the statements replacing stmt, updates the known values
+        target = stmt.target
+        value = evaluate(stmt, known)
+        old = known.get(target)
+        if value is None:
+            replacement = self.partially_known(stmt, known)
+            known.pop(target, None)
+        else:
+            known[target] = value
+            replacement = known_value(stmt, old, value, self.constant_table)
+
+        if replacement is None or (len(replacement) == 1 and same(replacement[0], stmt)):
+            return [stmt]
+        return replacement
+
+    def partially_known(self, stmt: Node, known: Dict[int, int]) -> Optional[List[Node]]:
+        # x = y + z with z (or y for +) known becomes x = y + c, z is no longer read
+        if not isinstance(stmt, AssignmentNodeTwoVar) or stmt.operator not in ("+", "-") or self.constant_table is None:
+            return None
+        if stmt.source == stmt.x_k and stmt.operator == "-":
+            return None
+        operand = known.get(stmt.x_k)
+        if operand is not None:
+            return [AssignmentNode(stmt.target, stmt.source, stmt.operator, self.constant(operand))]
+        operand = known.get(stmt.source)
+        if operand is not None and stmt.operator == "+":
+            return [AssignmentNode(stmt.target, stmt.x_k, "+", self.constant(operand))]
+        return None
+
+    def simulate(self, loop: WhileNode, known: Dict[int, int]) -> Optional[tuple]:
+        # (number of iterations, known values after the loop) if the condition variable is known after every iteration
+        counter = loop.condition.variable
+        body = self.body(loop)
+        values = dict(known)
+        trips = 0
+        while values.get(counter) != 0:
+            if counter not in values or trips == self.MAX_TRIPS:
+                return None
+            trips += 1
+            for stmt in body:
+                if isinstance(stmt, (AssignmentNode, AssignmentNodeTwoVar)):
+                    value = evaluate(stmt, values)
+                    if value is None:
+                        values.pop(stmt.target, None)
+                    else:
+                        values[stmt.target] = value
+                elif isinstance(stmt, WhileNode):
+                    for variable in self.assigned(stmt):
+                        values.pop(variable, None)
+                    values[stmt.condition.variable] = 0
+        return trips, values
+
+    def final_values(self, loop: WhileNode, known: Dict[int, int], values: Dict[int, int]) -> Optional[List[Node]]:
+        # the assignments of the values after the loop if they are all known and the loop prints nothing
+        variables = sorted(self.assigned(loop))
+        if any(variable not in values for variable in variables) or self.prints(loop):
+            return None
+        statements = []
+        for variable in variables:
+            value = values[variable]
+            replacement = known_value(AssignmentNode(variable, variable, "+", 0), known.get(variable), value, self.constant_table)
+            if replacement is None:
+                if self.constant_table is None:
+                    return None
+                replacement = [AssignmentNodeTwoVar(variable, variable, "-", variable, 1, 1), AssignmentNode(variable, variable, "+", self.constant(value))]
+            statements += replacement
+        for variable in variables:
+            known[variable] = values[variable]
+        return statements
+
+    def assigned(self, loop: WhileNode) -> Set[int]:
+        # variables assigned anywhere in the loop, nested loops seen before are not walked again
+        cached = self.assigned_in.get(id(loop))
+        if cached is not None and cached[0] is loop:
+            return cached[1]
+        variables = set()
+        stack = list(self.body(loop))
+        while stack:
+            stmt = stack.pop()
+            if isinstance(stmt, (AssignmentNode, AssignmentNodeTwoVar)):
+                variables.add(stmt.target)
+            elif isinstance(stmt, WhileNode):
+                cached = self.assigned_in.get(id(stmt))
+                if cached is not None and cached[0] is stmt:
+                    variables |= cached[1]
+                else:
+                    stack.extend(self.body(stmt))
+            elif isinstance(stmt, SequenceNode):
+                stack.extend(stmt.statements)
+        self.assigned_in[id(loop)] = (loop, variables)
+        return variables
+
+    @staticmethod
+    def prints(loop: WhileNode) -> bool:
+        stack = [loop.body]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, PrintNode):
+                return True
+            if isinstance(node, WhileNode):
+                stack.append(node.body)
+            elif isinstance(node, SequenceNode):
+                stack.extend(node.statements)
+        return False
+
+    @staticmethod
+    def loops(program: ProgramNode) -> List[WhileNode]:
+        # all loops in pre-order
+        loops, stack = [], list(LoopOptimiser.statements(program, DirtyRegions.ROOT))
+        while stack:
+            stmt = stack.pop()
+            if isinstance(stmt, WhileNode):
+                loops.append(stmt)
+                stack.extend(LoopOptimiser.statements(program, stmt))
+        return loops
+
+    @staticmethod
+    def body(loop: WhileNode) -> List[Node]:
+        return LoopOptimiser.statements(None, loop)
+
+    @staticmethod
+    def size(node: Node) -> int:
+        count, stack = 0, [node]
+        while stack:
+            node = stack.pop()
+            count += 1
+            if isinstance(node, WhileNode):
+                stack.append(node.body)
+            elif isinstance(node, SequenceNode):
+                stack.extend(node.statements)
+        return count
+
+    def constant(self, value: int) -> int:
+        self.constant_table.add(value)
+        return value
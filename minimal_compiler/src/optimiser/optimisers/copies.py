@@ -0,0 +1,120 @@
+from typing import Dict, Set
+from minimal_compiler.src.optimiser.base_optimiser import BaseOptimiser, DirtyRegions
+from minimal_compiler.src.optimiser.loop_optimiser import LoopOptimiser
+from minimal_compiler.src.optimiser.ast import flatten_ast
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.ssa import assigned_in_loops
+
+
+def is_copy(stmt: Node) -> bool:
+    # x = y + 0 with y another variable
+    return isinstance(stmt, AssignmentNode) and stmt.operator == "+" and stmt.value == 0 and stmt.source != stmt.target
+
+
+class CopyPropagationOptimiser(BaseOptimiser):
+    """
+    Replaces the reads of a copy (t = s + 0) by reads of its source until t or s is assigned again:
+
+        t = s + 0;                  t = s + 0;
+        x = t * y;          =>      x = s * y;
+        s = s + 1;                  s = s + 1;
+        z = t + 1                   z = t + 1
+
+    Copies whose target is no longer read are left to DeadStoreOptimiser (which also removes the
+    x = x + 0 a copy back to its source becomes). A copy holds inside a loop (and after it) if the
+    loop assigns neither t nor s, reads in loop conditions are kept. Every round visits everything.
+    """
+    VERSION = 1
+
+    def optimise(self, node):
+        return self.optimise_round(node, None)[0]
+
+    def optimise_round(self, node, dirty):
+        changes = DirtyRegions()
+        program = ProgramNode(flatten_ast(node.stmt) if node.stmt is not None else None)
+        assigned = assigned_in_loops(program)
+        parents = {} # id of a loop -> owner of the enclosing statements
+
+        stack = [(DirtyRegions.ROOT, {})] # (owner, copies holding at the start of its statements)
+        while stack:
+            owner, copies = stack.pop()
+            targets: Dict[int, Set[int]] = {} # source -> targets of the copies of it
+            for target, source in copies.items():
+                targets.setdefault(source, set()).add(target)
+
+            before = LoopOptimiser.statements(program, owner)
+            after = []
+            for stmt in before:
+                if isinstance(stmt, WhileNode):
+                    for variable in assigned[id(stmt)]:
+                        self.kill(variable, copies, targets)
+                    parents[id(stmt)] = owner
+                    stack.append((stmt, dict(copies)))
+                    after.append(stmt)
+                    continue
+
+                stmt = self.substitute(stmt, copies)
+                after.append(stmt)
+                if isinstance(stmt, (AssignmentNode, AssignmentNodeTwoVar)):
+                    self.kill(stmt.target, copies, targets)
+                    if is_copy(stmt):
+                        copies[stmt.target] = stmt.source
+                        targets.setdefault(stmt.source, set()).add(stmt.target)
+
+            if any(a is not b for a, b in zip(after, before)):
+                changes.add_rewritten(owner, parents, before, after)
+                LoopOptimiser.set_statements(program, owner, after)
+
+        return program, changes
+
+    @staticmethod
+    def kill(variable: int, copies: Dict[int, int], targets: Dict[int, Set[int]]):
+        # variable is assigned: its copy and the copies of it no longer hold
+        source = copies.pop(variable, None)
+        if source is not None:
+            targets[source].discard(variable)
+        for target in targets.pop(variable, ()):
+            del copies[target]
+
+    @staticmethod
+    def substitute(stmt: Node, copies: Dict[int, int]) -> Node:
+        # the statement reading the sources of the copies (stmt itself if it reads none of their targets)
+        get = copies.get
+        if isinstance(stmt, AssignmentNode):
+            source = get(stmt.source, stmt.source)
+            if source != stmt.source:
+                return AssignmentNode(stmt.target, source, stmt.operator, stmt.value)
+        elif isinstance(stmt, AssignmentNodeTwoVar):
+            source, x_k = get(stmt.source, stmt.source), get(stmt.x_k, stmt.x_k)
+            if source != stmt.source or x_k != stmt.x_k:
+                return AssignmentNodeTwoVar(stmt.target, source, stmt.operator, x_k, stmt.c_2, stmt.c_1)
+        elif isinstance(stmt, PrintNode):
+            variable = get(stmt.variable, stmt.variable)
+            if variable != stmt.variable:
+                return PrintNode(variable)
+        return stmt
+
+
+class CopyOptimiser(BaseOptimiser):
+    """
+    Lowers the copies x = y + 0 to CopyNodes, which the code generator emits as a single $copy
+    instead of an addition of the zero constant. The other optimisers only know x = y + 0, so this
+    runs once after them (see OptimiserManager).
+    """
+    VERSION = 1
+
+    def optimise(self, node):
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if isinstance(current, SequenceNode):
+                current.statements = [CopyNode(stmt.target, stmt.source) if is_copy(stmt) else stmt for stmt in current.statements]
+            for key in current.FIELDS:
+                value = getattr(current, key)
+                if is_copy(value):
+                    setattr(current, key, CopyNode(value.target, value.source))
+                elif isinstance(value, Node):
+                    stack.append(value)
+                elif isinstance(value, list):
+                    stack.extend(value)
+        return node
@@ -0,0 +1,123 @@
+from typing import Dict, List, Set
+from minimal_compiler.src.optimiser.base_optimiser import BaseOptimiser, DirtyRegions
+from minimal_compiler.src.optimiser.ast import flatten_ast
+from minimal_compiler.src.optimiser.ir_classes import *
+
+
+def uses(stmt: Node) -> tuple:
+    # variables read by a statement (without the ones of nested statements)
+    if isinstance(stmt, AssignmentNode):
+        return (stmt.source,)
+    if isinstance(stmt, AssignmentNodeTwoVar):
+        if stmt.operator == "-" and stmt.source == stmt.x_k:
+            return () # x = y - y is 0 whatever y is
+        return (stmt.source, stmt.x_k)
+    if isinstance(stmt, PrintNode):
+        return (stmt.variable,)
+    if isinstance(stmt, WhileNode):
+        return (stmt.condition.variable,)
+    return ()
+
+
+class DeadStoreOptimiser(BaseOptimiser):
+    """
+    Removes assignments whose value is never read (x0 is read when the program returns) and
+    assignments without effect (x = x + 0). Variables left without any use lose their local in the
+    generated code as well.
+
+    Liveness is computed backwards over each statement list. A loop body is entered with the
+    variables live after the loop, the condition variable and the variables the body may read
+    before it assigns them (computed once per loop, inner before outer, since a loop may run zero
+    times it assigns nothing for sure). A read only counts if its statement is kept, so chains of
+    copies go in one pass; removals inside loop bodies can free earlier stores, so the passes are
+    repeated until nothing changes.
+    """
+    VERSION = 1
+
+    def optimise(self, node):
+        return self.optimise_round(node, None)[0]
+
+    def optimise_round(self, node, dirty):
+        # liveness is global: any change can make stores anywhere dead, so every round visits everything
+        changes = DirtyRegions()
+        program = ProgramNode(flatten_ast(node.stmt) if node.stmt is not None else None)
+        while self.remove_dead_stores(program, changes):
+            pass
+        return program, changes
+
+    def remove_dead_stores(self, program: ProgramNode, changes: DirtyRegions) -> bool:
+        reads = self.loop_reads(program)
+        parents = {} # id of a loop -> owner of the enclosing statements
+        removed = False
+        work = [(DirtyRegions.ROOT, {0})] # (owner, variables live after its statements)
+        while work:
+            owner, live = work.pop()
+            statements = self.statements(program, owner)
+            kept = []
+            for stmt in reversed(statements):
+                if isinstance(stmt, (AssignmentNode, AssignmentNodeTwoVar)):
+                    if stmt.target not in live or self.has_no_effect(stmt):
+                        continue
+                    live.discard(stmt.target)
+                    live.update(uses(stmt))
+                elif isinstance(stmt, WhileNode):
+                    live.add(stmt.condition.variable)
+                    live |= reads[id(stmt)]
+                    parents[id(stmt)] = owner
+                    work.append((stmt, set(live)))
+                else:
+                    live.update(uses(stmt))
+                kept.append(stmt)
+
+            if len(kept) < len(statements):
+                kept.reverse()
+                changes.add_rewritten(owner, parents, statements, kept)
+                self.set_statements(program, owner, kept)
+                removed = True
+        return removed
+
+    @classmethod
+    def loop_reads(cls, program: ProgramNode) -> Dict[int, Set[int]]:
+        # id of a loop -> variables read by the loop (condition and body) before they are assigned in it
+        reads = {}
+        for loop in reversed(cls.loops(program)): # inner loops before outer ones
+            live = set()
+            for stmt in reversed(cls.statements(program, loop)):
+                if isinstance(stmt, (AssignmentNode, AssignmentNodeTwoVar)):
+                    live.discard(stmt.target)
+                elif isinstance(stmt, WhileNode):
+                    live |= reads[id(stmt)]
+                live.update(uses(stmt))
+            live.add(loop.condition.variable)
+            reads[id(loop)] = live
+        return reads
+
+    @classmethod
+    def loops(cls, program: ProgramNode) -> List[WhileNode]:
+        # all loops, every loop before the loops nested in it
+        loops, stack = [], list(cls.statements(program, DirtyRegions.ROOT))
+        while stack:
+            stmt = stack.pop()
+            if isinstance(stmt, WhileNode):
+                loops.append(stmt)
+                stack.extend(cls.statements(program, stmt))
+        return loops
+
+    @staticmethod
+    def has_no_effect(stmt: Node) -> bool:
+        return isinstance(stmt, AssignmentNode) and stmt.target == stmt.source and stmt.value == 0
+
+    @staticmethod
+    def statements(program: ProgramNode, owner) -> List[Node]:
+        node = program.stmt if owner is DirtyRegions.ROOT else owner.body
+        if node is None:
+            return []
+        return node.statements if isinstance(node, SequenceNode) else [node]
+
+    @staticmethod
+    def set_statements(program: ProgramNode, owner, statements: List[Node]):
+        node = SequenceNode(statements) if len(statements) != 1 else statements[0]
+        if owner is DirtyRegions.ROOT:
+            program.stmt = node
+        else:
+            owner.body = node
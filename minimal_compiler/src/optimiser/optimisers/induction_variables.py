@@ -0,0 +1,124 @@
+from typing import Dict, List, Optional
+from minimal_compiler.src.optimiser.loop_optimiser import LoopOptimiser
+from minimal_compiler.src.optimiser.ir_classes import *
+
+
+class InductionVariableOptimiser(LoopOptimiser):
+    """
+    Replaces counting loops by their closed form (a few bigint operations instead of one iteration
+    per unit of the counter):
+
+        while c > 0 do          n = ceil(c / d)
+            c = c - d;    =>    v = v + n * a
+            v = v + a;          w = w - n * x
+            w = w - x           c = 0
+        end
+
+    The body may only consist of such updates, in any order: the counter c is decreased by constants,
+    every other assigned variable is only increased or only decreased (saturating) by constants or by
+    variables which the loop does not assign. All updates are then linear in the number of iterations.
+    """
+    VERSION = 1
+
+    def __init__(self):
+        self.temporaries = []
+        self.temporaries_of = None
+
+    def rewrite_loop(self, loop: WhileNode) -> Optional[List[Node]]:
+        analysis = self.analyse(loop)
+        if analysis is None:
+            return None
+        counter, decrement, updates = analysis
+
+        needs_tables = decrement != 1 or any(
+            variables or constant > 1 for _, constant, variables in updates.values()
+        )
+        if needs_tables and (self.symbol_table is None or self.constant_table is None):
+            return None # without the tables no temporaries and constants can be added
+
+        statements = []
+        if decrement == 1:
+            count = counter
+        else:
+            # n = (c + d - 1) / d
+            divisor, count = self.temporary(0), self.temporary(1)
+            statements += self.set_constant(divisor, decrement)
+            statements.append(AssignmentNode(counter, counter, "+", self.constant(decrement - 1)))
+            statements.append(AssignmentNodeTwoVar(count, counter, "/", divisor, 1, 1))
+
+        for variable, (operator, constant, variables) in updates.items():
+            if constant == 1:
+                statements.append(AssignmentNodeTwoVar(variable, variable, operator, count, 1, 1))
+            elif constant > 1:
+                factor, product = self.temporary(0), self.temporary(2)
+                statements += self.set_constant(factor, constant)
+                statements.append(AssignmentNodeTwoVar(product, count, "*", factor, 1, 1))
+                statements.append(AssignmentNodeTwoVar(variable, variable, operator, product, 1, 1))
+            for step in variables:
+                product = self.temporary(2)
+                statements.append(AssignmentNodeTwoVar(product, count, "*", step, 1, 1))
+                statements.append(AssignmentNodeTwoVar(variable, variable, operator, product, 1, 1))
+
+        # the loop ends with the counter at 0
+        statements.append(AssignmentNodeTwoVar(counter, counter, "-", counter, 1, 1))
+        return statements
+
+    def analyse(self, loop: WhileNode):
+        # (counter, total decrement, variable -> [operator, constant, [variables]]) or None if the loop is no counting loop
+        counter = loop.condition.variable
+        body = loop.body.statements if isinstance(loop.body, SequenceNode) else [loop.body]
+
+        decrement = 0
+        updates: Dict[int, list] = {}
+        for stmt in body:
+            if isinstance(stmt, EmptyNode):
+                continue
+            if isinstance(stmt, AssignmentNode):
+                if stmt.source != stmt.target:
+                    return None
+                if stmt.value == 0:
+                    continue # x = x + 0 / x = x - 0
+                if stmt.target == counter:
+                    if stmt.operator != "-":
+                        return None
+                    decrement += stmt.value
+                    continue
+            elif isinstance(stmt, AssignmentNodeTwoVar):
+                if stmt.source != stmt.target or stmt.operator not in ("+", "-") or (stmt.c_2, stmt.c_1) != (1, 1) \
+                        or stmt.target == counter:
+                    return None
+            else:
+                return None
+
+            update = updates.setdefault(stmt.target, [stmt.operator, 0, []])
+            if update[0] != stmt.operator:
+                return None # increased and decreased: not linear because of the saturating subtraction
+            if isinstance(stmt, AssignmentNode):
+                update[1] += stmt.value
+            else:
+                update[2].append(stmt.x_k)
+
+        if decrement == 0:
+            return None
+        for _, _, variables in updates.values():
+            if any(step == counter or step in updates for step in variables):
+                return None # the step has to be the same in every iteration
+        return counter, decrement, updates
+
+    def temporary(self, index: int) -> int:
+        # temporaries only hold values within a replacement, so all replacements share them
+        if self.temporaries_of is not self.symbol_table:
+            self.temporaries, self.temporaries_of = [], self.symbol_table
+        while len(self.temporaries) <= index:
+            self.temporaries.append(self.symbol_table.add_temporary())
+        return self.temporaries[index]
+
+    def constant(self, value: int) -> int:
+        self.constant_table.add(value)
+        return value
+
+    def set_constant(self, variable: int, value: int) -> List[Node]:
+        return [
+            AssignmentNodeTwoVar(variable, variable, "-", variable, 1, 1),
+            AssignmentNode(variable, variable, "+", self.constant(value)),
+        ]
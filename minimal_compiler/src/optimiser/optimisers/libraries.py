@@ -0,0 +1,48 @@
+from typing import List
+from minimal_compiler.src.optimiser.flat_ir import FlatIR
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.pattern_engine import PatternEngine
+from minimal_compiler.src.optimiser.pattern_library import load_library, parse_statements
+from minimal_compiler.src.optimiser.optimisers.structural_tree_pattern_matching import StructuralTreePatternMatchingOptimiser
+
+
+class PatternLibraryOptimiser(StructuralTreePatternMatchingOptimiser):
+    """
+    Applies the rules of a pattern library file given on the command line (--patterns=<file>, see
+    pattern_library), e.g. the idioms of a code generator, without changes to the compiler. It runs
+    after StructuralTreePatternMatchingOptimiser, so its patterns are written like replacements: WHILE
+    code in which the right operand of an assignment can also be a variable (x = y * z).
+    """
+    VERSION = 1
+
+    def __init__(self, path: str):
+        self.path = path
+        self.library = None
+
+    def engine(self) -> PatternEngine:
+        # every file has its own engine (not one per class)
+        if self.library is None:
+            self.library = load_library(self.path, parse_statements, type(self).__name__)
+        return self.library
+
+    def optimise(self, node):
+        hits = [pattern.hits for pattern in self.patterns()]
+        node = super().optimise(node)
+        self.add_constants(hits)
+        return node
+
+    def optimise_round(self, node, dirty):
+        hits = [pattern.hits for pattern in self.patterns()]
+        node, changes = super().optimise_round(node, dirty)
+        self.add_constants(hits)
+        return node, changes
+
+    def add_constants(self, hits: List[int]):
+        # a replacement can use constants the program does not have (x1 = x1 + 3; x1 = x1 + 4 => x1 = x1 + 7),
+        # the ones of the rules applied since hits are added to the constant table for the code generator
+        if self.constant_table is None:
+            return
+        for pattern, before in zip(self.patterns(), hits):
+            if pattern.hits > before:
+                for value in FlatIR.from_tree(SequenceNode(pattern.build({}))).used_constants():
+                    self.constant_table.add(value)
@@ -0,0 +1,120 @@
+from collections import Counter
+from typing import Dict, List, Set
+from minimal_compiler.src.optimiser.base_optimiser import BaseOptimiser, DirtyRegions
+from minimal_compiler.src.optimiser.ast import flatten_ast
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.optimisers.dead_stores import DeadStoreOptimiser, uses
+
+
+class LoopInvariantOptimiser(BaseOptimiser):
+    """
+    Moves assignments which compute the same value in every iteration in front of their loop:
+
+        while c > 0 do              t = y + 0;
+            t = y + 0;      =>      while c > 0 do
+            ...                         ...
+        end                         end
+
+    A statement t = ... of the loop body (nested loops move statements into it first) is
+    moved if the variables it reads are not assigned in the loop, it is the only assignment of t in
+    the loop and t is not read in the loop before it (so every read of t sees its value). If the
+    loop runs zero times the moved statement still assigns t, so t must not be live after the
+    loop either. Divisions, modulo and left shifts are not moved: a loop which never runs must not
+    divide by 0 or shift by a huge amount.
+
+    Liveness and the loop summaries are global (see DeadStoreOptimiser), every round visits
+    everything. A statement reading a moved one becomes invariant as well.
+    """
+    VERSION = 1
+
+    OPERATORS = ("+", "-", "*", ">>", "==", "!=", ">", "max", "min")
+
+    def optimise(self, node):
+        return self.optimise_round(node, None)[0]
+
+    def optimise_round(self, node, dirty):
+        changes = DirtyRegions()
+        program = ProgramNode(flatten_ast(node.stmt) if node.stmt is not None else None)
+        loops = DeadStoreOptimiser.loops(program)
+        reads = DeadStoreOptimiser.loop_reads(program)
+        live_after, parents = self.liveness(program, reads)
+        assignments = self.assignments(loops)
+
+        # Inner loops first: the statements moved out of the nested loops are spliced into a body before it is
+        # split, so they can move further out. Moving statements only removes reads and liveness, so the
+        # analyses of the original program stay valid (if conservative) while the statements move.
+        hoisted = {} # id of a loop -> statements moved in front of it
+        for loop in reversed(loops):
+            before = DeadStoreOptimiser.statements(program, loop)
+            counts = assignments[id(loop)]
+            kept, moved = [], []
+            for stmt in self.splice(before, hoisted):
+                if self.is_invariant(stmt, counts, reads[id(loop)], live_after[id(loop)]):
+                    counts[stmt.target] -= 1
+                    moved.append(stmt)
+                else:
+                    kept.append(stmt)
+            if moved:
+                hoisted[id(loop)] = moved
+            if len(kept) != len(before) or any(a is not b for a, b in zip(kept, before)):
+                changes.add_rewritten(loop, parents, before, kept)
+                DeadStoreOptimiser.set_statements(program, loop, kept)
+
+        if hoisted:
+            before = DeadStoreOptimiser.statements(program, DirtyRegions.ROOT)
+            after = self.splice(before, hoisted)
+            changes.add_rewritten(DirtyRegions.ROOT, parents, before, after)
+            DeadStoreOptimiser.set_statements(program, DirtyRegions.ROOT, after)
+
+        return program, changes
+
+    @staticmethod
+    def splice(statements: List[Node], hoisted: Dict[int, List[Node]]) -> List[Node]:
+        # the statements with the statements moved out of each loop in front of it
+        result = []
+        for stmt in statements:
+            if isinstance(stmt, WhileNode):
+                result.extend(hoisted.get(id(stmt), ()))
+            result.append(stmt)
+        return result
+
+    def is_invariant(self, stmt: Node, counts: Counter, reads: Set[int], live_after: Set[int]) -> bool:
+        if not isinstance(stmt, (AssignmentNode, AssignmentNodeTwoVar)):
+            return False
+        if isinstance(stmt, AssignmentNodeTwoVar) and stmt.operator not in self.OPERATORS:
+            return False
+        target = stmt.target
+        return counts[target] == 1 and target not in reads and target not in live_after \
+            and all(counts[variable] == 0 for variable in uses(stmt))
+
+    @staticmethod
+    def liveness(program: ProgramNode, reads: Dict[int, Set[int]]) -> tuple:
+        # (id of a loop -> variables live after it, id of a loop -> owner of the enclosing statements)
+        live_after, parents = {}, {}
+        work = [(DirtyRegions.ROOT, {0})] # (owner, variables live after its statements)
+        while work:
+            owner, live = work.pop()
+            for stmt in reversed(DeadStoreOptimiser.statements(program, owner)):
+                if isinstance(stmt, (AssignmentNode, AssignmentNodeTwoVar)):
+                    live.discard(stmt.target)
+                elif isinstance(stmt, WhileNode):
+                    live_after[id(stmt)] = set(live)
+                    parents[id(stmt)] = owner
+                    live |= reads[id(stmt)]
+                    work.append((stmt, set(live)))
+                live.update(uses(stmt))
+        return live_after, parents
+
+    @staticmethod
+    def assignments(loops: List[WhileNode]) -> Dict[int, Counter]:
+        # id of a loop -> number of assignments of each variable in it (nested loops included)
+        counts = {}
+        for loop in reversed(loops): # inner loops before outer ones
+            count = Counter()
+            for stmt in DeadStoreOptimiser.statements(None, loop):
+                if isinstance(stmt, (AssignmentNode, AssignmentNodeTwoVar)):
+                    count[stmt.target] += 1
+                elif isinstance(stmt, WhileNode):
+                    count.update(counts[id(stmt)])
+            counts[id(loop)] = count
+        return counts
@@ -0,0 +1,147 @@
+from typing import Dict, List, Optional
+from minimal_compiler.src.optimiser.base_optimiser import BaseOptimiser, DirtyRegions
+from minimal_compiler.src.optimiser.loop_optimiser import LoopOptimiser
+from minimal_compiler.src.optimiser.ast import flatten_ast
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.optimisers.constant_propagation import known_value, same
+from minimal_compiler.src.optimiser.ssa import SSAForm, ConstantPropagation, Value, value_numbers, TOP, BOTTOM
+
+# operators more expensive than a copy (x = y + 0)
+EXPENSIVE = ("*", "/", "%", "<<", ">>")
+
+
+class SSAOptimiser(BaseOptimiser):
+    """
+    Optimises the program in SSA form (see optimiser/ssa.py): sparse conditional constant
+    propagation and global value numbering, then the results are lowered back onto the tree-IR.
+
+    Every SSA value stays in the variable of the program which it defines. The statements are not
+    moved, so the values of a variable never overlap and leaving SSA needs no copies. The lowering
+    walks the program with the value each variable holds (the phis at loop headers included):
+
+    - a loop whose body is not reached is removed
+    - an assignment of a constant becomes the cheapest equivalent statement (as in
+      ConstantPropagationOptimiser), a constant operand of x = y + z turns into a constant operand
+    - an assignment of the value the variable already holds is removed
+    - a multiplication, division, modulo or shift whose value another variable holds becomes a copy
+    - every operand is read from the first variable holding its value (copy coalescing: copies whose
+      variable is no longer read are left to DeadStoreOptimiser)
+    """
+    VERSION = 1
+
+    def __init__(self, max_argument_id: Optional[int] = None):
+        self.max_argument_id = max_argument_id
+
+    def version(self):
+        return f"{super().version()}:{self.max_argument_id}"
+
+    def optimise(self, node):
+        return self.optimise_round(node, None)[0]
+
+    def optimise_round(self, node, dirty):
+        # the values flow through the whole program, so every round visits everything
+        changes = DirtyRegions()
+        program = ProgramNode(flatten_ast(node.stmt) if node.stmt is not None else None)
+        ssa = SSAForm(program)
+        zero_variables = {0}
+        if self.symbol_table is not None:
+            zero_variables = self.symbol_table.initially_zero(self.max_argument_id)
+        propagation = ConstantPropagation(ssa, zero_variables)
+        self.lower(program, ssa, propagation, value_numbers(ssa, propagation), changes)
+        return program, changes
+
+    def lower(self, program: ProgramNode, ssa: SSAForm, propagation: ConstantPropagation, numbers: List[int], changes: DirtyRegions):
+        lattice = propagation.lattice
+        holding = {} # variable -> number of the value it holds
+        holders: Dict[int, dict] = {} # value number -> variables holding it (in the order they got it)
+
+        def hold(value: Value):
+            old = holding.get(value.variable)
+            if old is not None:
+                del holders[old][value.variable]
+            holding[value.variable] = numbers[value.id]
+            holders.setdefault(numbers[value.id], {})[value.variable] = None
+
+        def leader(variable: int, avoid: int) -> int:
+            # the first variable holding the value of variable (a variable without definition holds its entry value)
+            number = holding.get(variable)
+            for candidate in holders.get(number, ()) if number is not None else ():
+                if candidate != avoid:
+                    return candidate
+            return variable
+
+        for value in ssa.entry_values.values():
+            hold(value)
+
+        parents = {} # id of a loop -> owner of the enclosing statements
+        stack = [(DirtyRegions.ROOT, iter(LoopOptimiser.statements(program, DirtyRegions.ROOT)), [])]
+        while stack:
+            owner, statements, after = stack[-1]
+            stmt = next(statements, None)
+            if stmt is None:
+                stack.pop()
+                before = LoopOptimiser.statements(program, owner)
+                if len(after) != len(before) or any(a is not b for a, b in zip(after, before)):
+                    changes.add_rewritten(owner, parents, before, after)
+                    LoopOptimiser.set_statements(program, owner, after)
+                if owner is not DirtyRegions.ROOT:
+                    for phi in ssa.headers[id(owner)].phis.values():
+                        hold(phi) # after the loop the variables hold the values of the header
+                continue
+
+            if isinstance(stmt, WhileNode):
+                header = ssa.headers[id(stmt)]
+                for phi in header.phis.values():
+                    hold(phi)
+                if header.body.id not in propagation.reached:
+                    continue # the condition is 0 whenever the loop is reached
+                after.append(stmt)
+                parents[id(stmt)] = owner
+                stack.append((stmt, iter(LoopOptimiser.statements(program, stmt)), []))
+            elif isinstance(stmt, (AssignmentNode, AssignmentNodeTwoVar)):
+                value = ssa.definitions[id(stmt)]
+                if value.block.id in propagation.reached:
+                    after.extend(self.rewrite(stmt, value, lattice, numbers, holders, leader))
+                else:
+                    after.append(stmt)
+                hold(value)
+            elif isinstance(stmt, PrintNode):
+                variable = leader(stmt.variable, None)
+                after.append(stmt if variable == stmt.variable else PrintNode(variable))
+            else:
+                after.append(stmt)
+
+    def rewrite(self, stmt: Node, value: Value, lattice: list, numbers: List[int], holders: Dict[int, dict], leader) -> List[Node]:
+        # the statements replacing an assignment (before the variables are updated with its value)
+        target = stmt.target
+        known = lattice[value.id]
+        if known != TOP and known != BOTTOM:
+            old = lattice[value.previous.id]
+            replacement = known_value(stmt, old if old != TOP and old != BOTTOM else None, known, self.constant_table)
+            if replacement is not None:
+                return [stmt] if len(replacement) == 1 and same(replacement[0], stmt) else replacement
+
+        if numbers[value.id] == numbers[value.previous.id]:
+            return [] # the variable already holds the value
+
+        if stmt.operator in EXPENSIVE and self.constant_table is not None:
+            copy = next((variable for variable in holders.get(numbers[value.id], ()) if variable != target), None)
+            if copy is not None:
+                self.constant_table.add(0)
+                return [AssignmentNode(target, copy, "+", 0)]
+
+        if isinstance(stmt, AssignmentNode):
+            replacement = AssignmentNode(target, leader(stmt.source, None), stmt.operator, stmt.value)
+        elif stmt.operator == "-" and stmt.source == stmt.x_k:
+            return [stmt]
+        else:
+            source, x_k = (lattice[operand.id] for operand in value.operands)
+            if stmt.operator in ("+", "-") and self.constant_table is not None and isinstance(x_k, int):
+                self.constant_table.add(x_k)
+                replacement = AssignmentNode(target, leader(stmt.source, None), stmt.operator, x_k)
+            elif stmt.operator == "+" and self.constant_table is not None and isinstance(source, int):
+                self.constant_table.add(source)
+                replacement = AssignmentNode(target, leader(stmt.x_k, None), "+", source)
+            else:
+                replacement = AssignmentNodeTwoVar(target, leader(stmt.source, target), stmt.operator, leader(stmt.x_k, target), stmt.c_2, stmt.c_1)
+        return [stmt] if same(replacement, stmt) else [replacement]
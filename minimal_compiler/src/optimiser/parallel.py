@@ -0,0 +1,96 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+from minimal_compiler.src.optimiser.base_optimiser import BaseOptimiser, DirtyRegions
+from minimal_compiler.src.optimiser.ast import flatten_ast
+from minimal_compiler.src.optimiser.flat_ir import FlatIR
+from minimal_compiler.src.optimiser.ir_classes import *
+
+
+def optimise_chunk(optimiser: BaseOptimiser, flat: FlatIR):
+    # runs in a worker process: one whole program round of the optimiser over a chunk of top-level statements,
+    # returns the optimised chunk, whether it changed and the attempts and hits of the patterns in this round
+    counts = [(pattern.attempts, pattern.hits) for pattern in optimiser.patterns()]
+    node, changes = optimiser.optimise_round(flat.to_tree(), None)
+    counts = [(pattern.attempts - attempts, pattern.hits - hits) for pattern, (attempts, hits) in zip(optimiser.patterns(), counts)]
+    return FlatIR.from_tree(node), bool(changes), counts
+
+
+class ParallelOptimiser(BaseOptimiser):
+    """
+    Runs the whole program rounds of an optimiser on chunks of the top-level statements in a process
+    pool (opt-in, see --parallel). The chunks are cut at the split points of the optimiser (see
+    BaseOptimiser.split_points), so every chunk optimises to the statements the whole program round
+    gives there, and the chunks are stitched in their order: the result is identical to the serial
+    optimiser. The chunks are sent to the workers as FlatIR (no recursion when pickled).
+
+    Only optimisers which need nothing but the chunk can be wrapped (StructuralTreePatternMatchingOptimiser,
+    not e.g. ComparisonOptimiser, which looks at the assignments of the whole program). Later rounds
+    only revisit the rewritten regions and run serially, a parallel round reports the whole program
+    as rewritten.
+    """
+
+    def __init__(self, optimiser: BaseOptimiser, workers: Optional[int] = None, chunk_statements: int = 250):
+        self.optimiser = optimiser
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_statements = chunk_statements # smallest chunk worth sending to a worker
+
+    def version(self):
+        # the result does not depend on the chunks, cached IR of the serial optimiser stays valid
+        return self.optimiser.version()
+
+    def window_size(self):
+        return self.optimiser.window_size()
+
+    def split_points(self, statements):
+        return self.optimiser.split_points(statements)
+
+    def patterns(self):
+        return self.optimiser.patterns()
+
+    def optimise(self, node):
+        return self.optimise_round(node, None)[0]
+
+    def optimise_round(self, node, dirty):
+        chunks = None
+        if (dirty is None or dirty.everything) and self.workers > 1 and isinstance(node.stmt, SequenceNode) \
+                and not any(isinstance(stmt, SequenceNode) for stmt in node.stmt.statements):
+            chunks = self.chunks(node.stmt.statements)
+        if chunks is None or len(chunks) < 2:
+            self.optimiser.symbol_table = self.symbol_table
+            self.optimiser.constant_table = self.constant_table
+            return self.optimiser.optimise_round(node, dirty)
+
+        self.optimiser.symbol_table = self.optimiser.constant_table = None # not sent to the workers
+        flats = [FlatIR.from_tree(SequenceNode(chunk)) for chunk in chunks]
+        with ProcessPoolExecutor(min(self.workers, len(chunks))) as pool:
+            results = list(pool.map(optimise_chunk, [self.optimiser] * len(flats), flats))
+
+        statements, changed = [], False
+        for flat, chunk_changed, counts in results:
+            chunk = flat.to_tree().stmt
+            statements.extend(chunk.statements if isinstance(chunk, SequenceNode) else [chunk] if chunk is not None else [])
+            changed |= chunk_changed
+            for pattern, (attempts, hits) in zip(self.optimiser.patterns(), counts):
+                pattern.attempts += attempts
+                pattern.hits += hits
+        return ProgramNode(flatten_ast(SequenceNode(statements))), DirtyRegions(everything=changed)
+
+    def chunks(self, statements: List[Node]) -> List[List[Node]]:
+        # about four chunks per worker (for an even load), each of at least chunk_statements statements
+        count = min(4 * self.workers, len(statements) // max(self.chunk_statements, 1))
+        if count < 2:
+            return [statements]
+        points, result, start = self.split_points(statements), [], 0
+        k = 0
+        for n in range(1, count):
+            # the first split point at or after the even cut
+            cut = n * len(statements) // count
+            while k < len(points) and (points[k] < cut or points[k] <= start):
+                k += 1
+            if k == len(points):
+                break
+            result.append(statements[start:points[k]])
+            start = points[k]
+        result.append(statements[start:])
+        return result
@@ -0,0 +1,310 @@
+from typing import Dict, List, Optional, Tuple
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.ast import copy_ast
+from minimal_compiler.src.optimiser.base_optimiser import DirtyRegions
+
+
+def signature(node: Node) -> tuple:
+    """
+    Structural signature of a statement: its type and literals, for a WhileNode the value of the
+    condition and the length of the body. Two statements can only match if their signatures are equal.
+    """
+    cls = type(node)
+    if cls is AssignmentNode:
+        return (cls, node.operator, node.value)
+    if cls is WhileNode:
+        body = node.body
+        return (cls, node.condition.value, len(body.statements) if isinstance(body, SequenceNode) else -1)
+    if cls is AssignmentNodeTwoVar:
+        return (cls, node.operator, node.c_2, node.c_1)
+    if cls is SequenceNode:
+        return (cls, len(node.statements))
+    if cls is EmptyNode:
+        return (cls, node.reason)
+    return (cls,)
+
+
+def compile_check(pattern: Node) -> tuple:
+    # (type, literal fields, placeholder fields, node fields, list fields) of a pattern node,
+    # patterns are small so the recursion is bounded by the depth of the pattern
+    literals, variables, children, lists = [], [], [], []
+    for key in pattern.FIELDS:
+        value = getattr(pattern, key)
+        if key in pattern.VARIABLES:
+            variables.append((key, value))
+        elif isinstance(value, Node):
+            children.append((key, compile_check(value)))
+        elif isinstance(value, list):
+            lists.append((key, tuple(compile_check(item) for item in value)))
+        else:
+            literals.append((key, value))
+    return (type(pattern), tuple(literals), tuple(variables), tuple(children), tuple(lists))
+
+
+def compile_builder(replacement: Node) -> List[tuple]:
+    # the statements of the (flattened) replacement, a leaf statement becomes (type, fields) with
+    # (True, placeholder) or (False, literal) per field, any other statement is copied with copy_ast
+    statements, stack = [], [replacement]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, SequenceNode):
+            stack.extend(reversed(node.statements))
+        elif any(isinstance(getattr(node, key), (Node, list)) for key in node.FIELDS):
+            statements.append((None, node))
+        else:
+            statements.append((type(node), tuple((key in node.VARIABLES, getattr(node, key)) for key in node.FIELDS)))
+    return statements
+
+
+class CompiledPattern:
+    """
+    A pattern (a window of statements) with its compiled matcher and replacement builder. attempts counts
+    the candidate windows it was matched against, hits the replacements (see OptimisationStats).
+    """
+
+    def __init__(self, order: int, pattern: Node, replacement: Node, name: str = None):
+        self.order = order
+        self.name = name if name is not None else str(order)
+        self.attempts = 0
+        self.hits = 0
+        self.statements = pattern.statements if isinstance(pattern, SequenceNode) else [pattern]
+        self.length = len(self.statements)
+        self.signatures = [signature(stmt) for stmt in self.statements]
+        self.signature = self.signatures[0]
+        self.checks = [compile_check(stmt) for stmt in self.statements]
+        self.builder = compile_builder(replacement)
+
+    def match(self, statements: List[Node], start: int, bind: bool = True) -> Optional[Dict[int, int]]:
+        """
+        Bindings (placeholder -> variable) if the window statements[start:start + length] matches,
+        otherwise None. With bind=False only the structure is compared (an empty dict on a match).
+        """
+        bindings = {}
+        stack = list(zip(self.checks, statements[start:start + self.length]))
+        while stack:
+            (cls, literals, variables, children, lists), node = stack.pop()
+            if type(node) is not cls:
+                return None
+            for key, value in literals:
+                if getattr(node, key) != value:
+                    return None
+            if bind:
+                for key, placeholder in variables:
+                    value = getattr(node, key)
+                    bound = bindings.get(placeholder)
+                    if bound is None:
+                        bindings[placeholder] = value
+                    elif bound != value:
+                        return None
+            for key, check in children:
+                stack.append((check, getattr(node, key)))
+            for key, checks in lists:
+                items = getattr(node, key)
+                if len(items) != len(checks):
+                    return None
+                stack.extend(zip(checks, items))
+        return bindings
+
+    def build(self, bindings: Dict[int, int]) -> List[Node]:
+        """The statements of the replacement with the placeholders bound (unbound ids are kept)."""
+        get = bindings.get
+        return [
+            cls(*[get(value, value) if variable else value for variable, value in fields]) if cls is not None
+            else copy_ast(fields, bindings)
+            for cls, fields in self.builder
+        ]
+
+
+class PatternEngine:
+    """
+    Applies a list of (pattern, replacement) pairs in the order of the list, i.e. with the same result
+    as replacing all (greedy, left to right) matches of the first pattern in the whole program, then all
+    matches of the second pattern and so on. Replacements are never searched again.
+
+    The patterns are compiled once and indexed by the signature of their first statement, so a single
+    pass over a sequence finds the candidate windows of all patterns; the overlaps are then resolved in
+    pattern order. This is only equivalent to the pattern by pattern passes if no pattern can match
+    inside the loop bodies of a later pattern (otherwise its replacement could change whether the later
+    pattern matches), which is checked here, else every pattern gets its own pass.
+    """
+
+    def __init__(self, patterns: List[Tuple[Node, Node]], names: List[str] = None):
+        names = names or [None] * len(patterns)
+        self.patterns = [
+            CompiledPattern(order, pattern, replacement, name)
+            for order, ((pattern, replacement), name) in enumerate(zip(patterns, names))
+        ]
+        self.by_signature = self.index(self.patterns)
+        self.independent = not any(self.matches_inside(pattern) for pattern in self.patterns)
+        if self.independent:
+            self.passes = [self.by_signature]
+        else:
+            self.passes = [self.index([pattern]) for pattern in self.patterns]
+
+    @staticmethod
+    def index(patterns: List[CompiledPattern]) -> Dict[tuple, List[CompiledPattern]]:
+        index = {}
+        for pattern in patterns:
+            index.setdefault(pattern.signature, []).append(pattern)
+        return index
+
+    def window_size(self) -> int:
+        return max((pattern.length for pattern in self.patterns), default=1)
+
+    def matches_inside(self, outer: CompiledPattern) -> bool:
+        # can an earlier pattern (structurally) match a window of a loop body nested in the outer pattern
+        stack = list(outer.statements)
+        while stack:
+            node = stack.pop()
+            if isinstance(node, WhileNode):
+                body = node.body.statements if isinstance(node.body, SequenceNode) else [node.body]
+                for i, stmt in enumerate(body):
+                    for pattern in self.by_signature.get(signature(stmt), ()):
+                        if pattern.order < outer.order and i + pattern.length <= len(body) \
+                                and pattern.match(body, i, bind=False) is not None:
+                            return True
+                stack.extend(body)
+            elif isinstance(node, SequenceNode):
+                stack.extend(node.statements)
+        return False
+
+    def split_points(self, statements: List[Node]) -> List[int]:
+        # A window can only be replaced if its first statement has the signature of the first pattern statement.
+        # A split point must not lie inside any window which starts at such a statement, then the greedy
+        # left-to-right replacement never depends on statements on the other side of it. With a single pass
+        # the statements of a sequence are matched before the loops in them are rewritten, so only the windows
+        # in which every statement has the signature of its pattern statement (the candidates) count.
+        blocked = bytearray(len(statements) + 1)
+        signatures = [signature(stmt) for stmt in statements]
+        for i, stmt_signature in enumerate(signatures):
+            for pattern in self.by_signature.get(stmt_signature, ()):
+                if self.independent and signatures[i:i + pattern.length] != pattern.signatures:
+                    continue
+                end = min(i + pattern.length, len(statements))
+                blocked[i + 1:end] = b"\x01" * (end - i - 1)
+
+        return [k for k in range(1, len(statements)) if not blocked[k]]
+
+    def rewrite(self, stmt: Node, dirty: DirtyRegions = None, changes: DirtyRegions = None, accept=None) -> Node:
+        """
+        Replaces all matches in the statement (rewritten in place where possible) and returns the new statement.
+        With dirty (the regions rewritten since an earlier round) only windows which contain a new or changed
+        statement are tested, and only the loops on the way to them are visited. The rewritten regions are
+        added to changes. accept(pattern, bindings) can reject a match (e.g. if a placeholder must be bound
+        to a variable with a known value).
+        """
+        if dirty is not None and dirty.everything:
+            dirty = None
+        for index in self.passes:
+            stmt = RewritePass(self, index, dirty, changes, accept).run(stmt)
+        return stmt
+
+
+class RewritePass:
+    """One pass of a PatternEngine with the patterns of index over a program."""
+
+    def __init__(self, engine: PatternEngine, index: Dict[tuple, List[CompiledPattern]], dirty: Optional[DirtyRegions], changes: Optional[DirtyRegions], accept=None):
+        self.engine = engine
+        self.index = index
+        self.dirty = dirty
+        self.changes = changes
+        self.accept = accept
+        self.work = [] # (owner, dirty) of the statements still to be rewritten, owner is a WhileNode or SequenceNode
+        self.parents = {} # id of an owner -> owner of the enclosing statements
+
+    def run(self, stmt: Node) -> Node:
+        if self.dirty is not None and not self.dirty.is_changed(DirtyRegions.ROOT):
+            return stmt
+        stmt = self.rewrite_container(stmt, DirtyRegions.ROOT, self.dirty)
+        while self.work:
+            owner, dirty = self.work.pop()
+            if isinstance(owner, WhileNode):
+                owner.body = self.rewrite_container(owner.body, owner, dirty)
+            else:
+                owner.statements = self.rewrite_statements(owner.statements, owner, dirty)
+        return stmt
+
+    def rewrite_container(self, node: Node, owner: object, dirty: Optional[DirtyRegions]) -> Node:
+        if isinstance(node, SequenceNode):
+            node.statements = self.rewrite_statements(node.statements, owner, dirty)
+            return node
+        if node is None:
+            return node
+        statements = self.rewrite_statements([node], owner, dirty)
+        return statements[0] if len(statements) == 1 else SequenceNode(statements)
+
+    def rewrite_statements(self, statements: List[Node], owner: object, dirty: Optional[DirtyRegions]) -> List[Node]:
+        count = len(statements)
+        window = self.engine.window_size()
+        if dirty is None:
+            starts = range(count)
+            signatures = [signature(stmt) for stmt in statements]
+        else:
+            # only a window which contains a new or changed statement can match now
+            allowed = bytearray(count)
+            for d, stmt in enumerate(statements):
+                if dirty.is_new(stmt) or dirty.is_changed(stmt):
+                    start = max(d - window + 1, 0)
+                    allowed[start:d + 1] = b"\x01" * (d + 1 - start)
+            starts = [i for i in range(count) if allowed[i]]
+            signatures = [None] * count
+            for i in starts:
+                for k in range(i, min(i + window, count)):
+                    if signatures[k] is None:
+                        signatures[k] = signature(statements[k])
+
+        # candidate windows of all patterns in one pass, the statements of a candidate have the signatures of the pattern
+        candidates = {}
+        for i in starts:
+            for pattern in self.index.get(signatures[i], ()):
+                if signatures[i:i + pattern.length] == pattern.signatures:
+                    candidates.setdefault(pattern.order, []).append(i)
+
+        # resolve them in pattern order, a window can not contain statements which an earlier pattern replaced
+        replacements = {}
+        if candidates:
+            taken = bytearray(count)
+            for order in sorted(candidates):
+                pattern = self.engine.patterns[order]
+                length, free = pattern.length, 0
+                for i in candidates[order]:
+                    if i < free or any(taken[i:i + length]):
+                        continue
+                    pattern.attempts += 1
+                    bindings = pattern.match(statements, i)
+                    if bindings and (self.accept is None or self.accept(pattern, bindings)):
+                        pattern.hits += 1
+                        replacements[i] = (pattern, bindings)
+                        taken[i:i + length] = b"\x01" * length
+                        free = i + length
+
+        new_statements = []
+        i = 0
+        while i < count:
+            replacement = replacements.get(i)
+            if replacement is not None:
+                pattern, bindings = replacement
+                built = pattern.build(bindings)
+                if self.changes is not None:
+                    for stmt in built:
+                        self.changes.add_new(stmt)
+                new_statements.extend(built)
+                i += pattern.length
+                continue
+            stmt = statements[i]
+            if isinstance(stmt, (WhileNode, SequenceNode)):
+                # new statements are visited completely, otherwise only the loops with changes below them
+                if dirty is None or dirty.is_new(stmt):
+                    self.push(stmt, owner, None)
+                elif dirty.is_changed(stmt):
+                    self.push(stmt, owner, dirty)
+            new_statements.append(stmt)
+            i += 1
+
+        if replacements and self.changes is not None:
+            self.changes.add_changed(owner, self.parents)
+        return new_statements
+
+    def push(self, stmt: Node, owner: object, dirty: Optional[DirtyRegions]):
+        self.parents[id(stmt)] = owner
+        self.work.append((stmt, dirty))
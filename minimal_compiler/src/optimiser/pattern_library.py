@@ -0,0 +1,234 @@
+"""
+Pattern libraries: the rewrite rules of a pattern based optimiser in a data file (see
+optimisers/patterns/*.patterns). Every rule starts with a line `pattern <name>`, followed by the
+pattern as WHILE code, a line `=>` and the replacement, # starts a comment:
+
+    pattern add_loop
+        while x1 > 0 do x1 = x1 - 1; x2 = x2 + 1 end
+    =>
+        x2 = x2 + x1;
+        x1 = x1 - x1
+
+All variables of the pattern are placeholders, the replacement refers to them by the same ids. The
+replacement is WHILE code in which the right operand of an assignment can also be a variable
+(x = y + z, with the operators of the tree-IR: + - * / % << >> == != > max min), the comparisons
+give 1 or 0. How a pattern is parsed is up to the optimiser (see PatternLibraryOptimiser for
+libraries of idioms given on the command line). The rules are tried in the order of the file.
+
+A rule which only holds for some values of its placeholders (e.g. a zero constant of the templates)
+names them after its name, `pattern mul where x3 = 0`. They are not tested when the rule is applied
+(that is up to the optimiser), only when the rules are checked against their replacements (see
+equivalence).
+
+The compiled PatternEngine of a file is cached (see set_cache_directory) under the hash of the file
+and of the way the patterns are parsed, so an unchanged library is neither parsed nor compiled again.
+"""
+import hashlib
+import os
+import pickle
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.pattern_engine import PatternEngine
+
+# bump whenever the compiled form changes, this invalidates cached engines
+FORMAT_VERSION = 1
+
+CACHE_DIRECTORY = None # where compiled engines are cached (None: not cached)
+
+RULE = re.compile(r"pattern(?:\s+(\S+))?(?:\s+where\s+(.*))?$")
+ASSUMPTION = re.compile(r"\s*x(\d+)\s*=\s*(\d+)\s*$")
+TOKEN = re.compile(r"\s*(?:(x\d+)|(\d+)|(==|!=|<<|>>|[=;+\-*/%>]|\bmax\b|\bmin\b|\bwhile\b|\bdo\b|\bend\b|\becho\b))")
+OPERATORS = ("+", "-", "*", "/", "%", "<<", ">>", "==", "!=", ">", "max", "min")
+
+
+def set_cache_directory(directory: Optional[str]):
+    global CACHE_DIRECTORY
+    CACHE_DIRECTORY = directory
+
+
+def read_rules(path: str, text: str) -> List[Tuple[str, str, str, int, int, Dict[int, int]]]:
+    """
+    The rules of a library as (name, pattern text, replacement text, line of the rule, line of the
+    replacement, assumed values of placeholders).
+    """
+    rules, current = [], None
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        if line.startswith("pattern ") or line == "pattern":
+            match = RULE.match(line)
+            if match is None or match.group(1) is None:
+                raise SyntaxError(f"PatternLibraryException: {path}:{number}: pattern without a name")
+            current = [match.group(1), [], None, number, number, read_assumptions(path, number, match.group(2))]
+            rules.append(current)
+        elif current is None:
+            raise SyntaxError(f"PatternLibraryException: {path}:{number}: expected 'pattern <name>'")
+        elif line == "=>":
+            if current[2] is not None:
+                raise SyntaxError(f"PatternLibraryException: {path}:{number}: second '=>' in pattern {current[0]}")
+            current[2], current[4] = [], number + 1
+        else:
+            (current[1] if current[2] is None else current[2]).append(line)
+
+    for name, pattern, replacement, number, _, _ in rules:
+        if not pattern or not replacement:
+            raise SyntaxError(f"PatternLibraryException: {path}:{number}: pattern {name} needs a pattern and a replacement")
+    return [
+        (name, " ".join(pattern), " ".join(replacement), number, start, assumptions)
+        for name, pattern, replacement, number, start, assumptions in rules
+    ]
+
+
+def read_assumptions(path: str, number: int, text: Optional[str]) -> Dict[int, int]:
+    # the where clause of a rule: x<id> = <value>, separated by commas
+    assumptions = {}
+    for part in text.split(",") if text is not None else []:
+        match = ASSUMPTION.match(part)
+        if match is None:
+            raise SyntaxError(f"PatternLibraryException: {path}:{number}: expected 'x<id> = <value>' after where")
+        assumptions[int(match.group(1))] = int(match.group(2))
+    return assumptions
+
+
+def parse_statements(text: str, where: str = "") -> Node:
+    """
+    Parses WHILE statements in which the right operand of an assignment can also be a variable (a
+    replacement) into the tree the IRParser would build, without recursion.
+    """
+    tokens, position = [], 0
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            if text[position:].strip() == "":
+                break
+            raise SyntaxError(f"PatternLibraryException: {where}unexpected '{text[position:].split()[0]}' in statements")
+        variable, constant, symbol = match.groups()
+        tokens.append(("x", int(variable[1:])) if variable else ("c", int(constant)) if constant else (symbol, None))
+        position = match.end()
+
+    def expect(index, kind):
+        if index >= len(tokens) or tokens[index][0] != kind:
+            found = repr(tokens[index][0]) if index < len(tokens) else "the end"
+            expected = {"x": "a variable", "c": "a constant"}.get(kind, repr(kind))
+            raise SyntaxError(f"PatternLibraryException: {where}expected {expected} but found {found} in statements")
+        return tokens[index][1]
+
+    stack = [(None, [])] # (condition of the enclosing loop, statements)
+    i = 0
+    while True:
+        kind = tokens[i][0] if i < len(tokens) else None
+        if kind == "while":
+            variable, value = expect(i + 1, "x"), (expect(i + 2, ">"), expect(i + 3, "c"))[1]
+            expect(i + 4, "do")
+            stack.append((ConditionNode(variable, value), []))
+            i += 5
+            continue
+        if kind == "echo":
+            stack[-1][1].append(PrintNode(expect(i + 1, "x")))
+            i += 2
+        elif kind == "x":
+            target, source = tokens[i][1], (expect(i + 1, "="), expect(i + 2, "x"))[1]
+            operator = tokens[i + 3][0] if i + 3 < len(tokens) else None
+            if operator not in OPERATORS:
+                raise SyntaxError(f"PatternLibraryException: {where}expected an operator after x{source} in statements")
+            if i + 4 < len(tokens) and tokens[i + 4][0] == "x":
+                stack[-1][1].append(AssignmentNodeTwoVar(target, source, operator, tokens[i + 4][1], 1, 1))
+            else:
+                stack[-1][1].append(AssignmentNode(target, source, operator, expect(i + 4, "c")))
+            i += 5
+        else:
+            raise SyntaxError(f"PatternLibraryException: {where}expected a statement in statements")
+
+        # a statement ends with ';' or with the 'end' of its loops
+        while i < len(tokens) and tokens[i][0] == "end" and len(stack) > 1:
+            condition, body = stack.pop()
+            stack[-1][1].append(WhileNode(condition, body[0] if len(body) == 1 else SequenceNode(body)))
+            i += 1
+        if i >= len(tokens):
+            break
+        expect(i, ";")
+        i += 1
+
+    if len(stack) > 1:
+        raise SyntaxError(f"PatternLibraryException: {where}missing 'end' in statements")
+    statements = stack[0][1]
+    return statements[0] if len(statements) == 1 else SequenceNode(statements)
+
+
+def format_statements(node: Node, indent: str = "", variables: Dict[int, int] = None) -> str:
+    """
+    The statements of a tree as parse_statements reads them, one per line (the bodies of loops
+    indented by 4 more spaces). Variable ids found in variables are mapped.
+    """
+    variables = variables or {}
+    name = lambda variable: f"x{variables.get(variable, variable)}"
+    lines, stack = [], [(node, indent, "")] # (node or a line, indentation, text after it)
+    while stack:
+        node, prefix, suffix = stack.pop()
+        if isinstance(node, str):
+            lines.append(prefix + node + suffix)
+        elif isinstance(node, SequenceNode):
+            last = len(node.statements) - 1
+            stack.extend((stmt, prefix, suffix if k == last else ";") for k, stmt in reversed(list(enumerate(node.statements))))
+        elif isinstance(node, WhileNode):
+            lines.append(f"{prefix}while {name(node.condition.variable)} > {node.condition.value} do")
+            stack.append(("end", prefix, suffix))
+            stack.append((node.body, prefix + "    ", ""))
+        elif isinstance(node, AssignmentNode):
+            lines.append(f"{prefix}{name(node.target)} = {name(node.source)} {node.operator} {node.value}{suffix}")
+        elif isinstance(node, AssignmentNodeTwoVar):
+            lines.append(f"{prefix}{name(node.target)} = {name(node.source)} {node.operator} {name(node.x_k)}{suffix}")
+        elif isinstance(node, CopyNode):
+            lines.append(f"{prefix}{name(node.target)} = {name(node.source)} + 0{suffix}")
+        elif isinstance(node, PrintNode):
+            lines.append(f"{prefix}echo {name(node.variable)}{suffix}")
+        else:
+            raise ValueError(f"{type(node).__name__} has no WHILE syntax")
+    return "\n".join(lines)
+
+
+def compile_library(path: str, parse_pattern: Callable[[str], Node], text: str) -> PatternEngine:
+    patterns, names = [], []
+    for name, pattern, replacement, number, start, _ in read_rules(path, text):
+        try:
+            pattern = parse_pattern(pattern)
+        except SyntaxError as error:
+            raise SyntaxError(f"PatternLibraryException: {path}:{number}: pattern {name}: {error}") from error
+        patterns.append((pattern, parse_statements(replacement, f"{path}:{start}: ")))
+        names.append(name)
+    return PatternEngine(patterns, names)
+
+
+def load_library(path: str, parse_pattern: Callable[[str], Node], parser_key: str = "") -> PatternEngine:
+    """
+    The PatternEngine of a library file. parse_pattern turns the WHILE text of a pattern into its
+    tree, parser_key identifies it (part of the cache key). The key of the engine is stored in its
+    key attribute.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    key = hashlib.sha256(f"{FORMAT_VERSION}:{parser_key}:".encode() + data).hexdigest()
+
+    cache_path = os.path.join(CACHE_DIRECTORY, key + ".pat") if CACHE_DIRECTORY else None
+    engine = None
+    if cache_path is not None:
+        try:
+            with open(cache_path, "rb") as file:
+                engine = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            engine = None
+
+    if not isinstance(engine, PatternEngine):
+        engine = compile_library(path, parse_pattern, data.decode())
+        if cache_path is not None:
+            # write to a temporary file first, so a concurrent or interrupted run never sees half an entry
+            os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+            temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(temporary_path, "wb") as file:
+                pickle.dump(engine, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_path, cache_path)
+
+    engine.key = key
+    return engine
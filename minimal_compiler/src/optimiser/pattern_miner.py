@@ -0,0 +1,227 @@
+"""
+Mines a corpus of WHILE programs for the statement shapes new rewrite rules would pay off for: every
+loop and every window of consecutive statements (as the PatternEngine matches them) is renamed to
+placeholders (x0, x1, ... in the order the variables first appear, see canonical) and counted under
+its text. The shapes are ranked by their estimated runtime calls summed over all their occurrences
+(stats.estimated_calls of the shape, times LOOP_ITERATIONS per enclosing loop), and the best ones are
+written as candidate rules in the pattern library format, whose replacement is left to the author.
+
+    python3 mine_patterns.py [<file or directory> ...] [-O<level>] [--top=<n>] [--window=<n>] [--output=<file>]
+
+The programs are mined after the fixpoint passes of an optimisation level (-O1 by default: the shapes
+the built-in rules leave), so the candidates are written like the rules of --patterns.
+"""
+import hashlib
+import os
+from typing import Dict, Iterable, List, Optional
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.pattern_library import format_statements
+from minimal_compiler.src.optimiser.stats import LOOP_ITERATIONS, estimated_calls
+
+# longest window of consecutive statements counted
+MAX_WINDOW = 4
+# larger shapes (in nodes) are not counted, they hardly repeat and make no rule
+MAX_NODES = 40
+
+
+class Candidate:
+    __slots__ = ("text", "count", "calls", "score", "files", "parts")
+
+    def __init__(self, text: str, calls: int, parts: List[str]):
+        self.text = text # the shape with placeholders (WHILE code, see format_statements)
+        self.count = 0 # occurrences
+        self.calls = calls # estimated calls of one run of the shape
+        self.score = 0 # estimated calls summed over the occurrences (weighted by their loop depth)
+        self.files: Dict[str, int] = {} # occurrences per file
+        self.parts = parts # the shapes of the windows one statement shorter or of the body of a loop (for closed)
+
+
+def canonical(statements: List[Node]) -> str:
+    # the text of the statements with their variables renamed in the order they first appear
+    variables, stack = {}, list(reversed(statements))
+    while stack:
+        node = stack.pop()
+        children = []
+        for key in node.FIELDS:
+            value = getattr(node, key)
+            if key in node.VARIABLES:
+                variables.setdefault(value, len(variables))
+            elif isinstance(value, Node):
+                children.append(value)
+            elif isinstance(value, list):
+                children.extend(value)
+        stack.extend(reversed(children))
+    return format_statements(statements[0] if len(statements) == 1 else SequenceNode(statements), "    ", variables)
+
+
+def sizes(node: Node) -> Dict[int, int]:
+    # the number of nodes of every subtree (by id of its root), without recursion
+    size, stack = {}, [(node, False)]
+    while stack:
+        node, done = stack.pop()
+        children = [value for key in node.FIELDS for value in (
+            getattr(node, key) if isinstance(getattr(node, key), list) else [getattr(node, key)]
+        ) if isinstance(value, Node)]
+        if done:
+            size[id(node)] = 1 + sum(size[id(child)] for child in children)
+        else:
+            stack.append((node, True))
+            stack.extend((child, False) for child in children)
+    return size
+
+
+class PatternMiner:
+    """
+    Counts the shapes of the programs given to add: every loop (with its body) and every window of 2
+    to max_window consecutive statements of a sequence, up to max_nodes nodes each.
+    """
+
+    def __init__(self, max_window: int = MAX_WINDOW, max_nodes: int = MAX_NODES):
+        self.max_window = max_window
+        self.max_nodes = max_nodes
+        self.candidates: Dict[str, Candidate] = {}
+        self.files = 0
+
+    def add(self, node: Node, name: str = ""):
+        self.files += 1
+        node = node.stmt if isinstance(node, ProgramNode) else node
+        size = sizes(node)
+        stack = [(node, 0)] # (statement, loops around it)
+        while stack:
+            node, depth = stack.pop()
+            statements = node.statements if isinstance(node, SequenceNode) else [node]
+            for i in range(len(statements)):
+                nodes = 0
+                for k in range(1, min(self.max_window, len(statements) - i) + 1):
+                    nodes += size[id(statements[i + k - 1])]
+                    if nodes > self.max_nodes:
+                        break
+                    if k > 1 or isinstance(statements[i], WhileNode):
+                        self.count(statements[i:i + k], depth, name)
+            for stmt in statements:
+                if isinstance(stmt, WhileNode):
+                    stack.append((stmt.body, depth + 1))
+                elif isinstance(stmt, IfNode):
+                    stack.append((stmt.then_body, depth))
+                    if stmt.else_body is not None:
+                        stack.append((stmt.else_body, depth))
+
+    def count(self, window: List[Node], depth: int, name: str):
+        text = canonical(window)
+        candidate = self.candidates.get(text)
+        if candidate is None:
+            if len(window) > 1:
+                parts = [window[:-1], window[1:]]
+            else: # the body of a loop
+                body = window[0].body
+                parts = [body.statements if isinstance(body, SequenceNode) else [body]]
+            parts = [
+                canonical(part) for part in parts
+                if 1 < len(part) <= self.max_window or len(part) == 1 and isinstance(part[0], WhileNode)
+            ]
+            candidate = self.candidates[text] = Candidate(text, estimated_calls(SequenceNode(window)), parts)
+        candidate.count += 1
+        candidate.score += candidate.calls * LOOP_ITERATIONS ** depth
+        candidate.files[name] = candidate.files.get(name, 0) + 1
+
+    def ranked(self, min_count: int = 2, closed: bool = True) -> List[Candidate]:
+        """
+        The shapes occurring at least min_count times, best score first. With closed, a shape is left
+        out if a window one statement longer or a loop contains it as often as it occurs (only the
+        larger one would make a rule), and so is a shape overlapping a better one as often as that occurs (both
+        are parts of a longer repeated sequence than max_window).
+        """
+        covered = set()
+        if closed:
+            for candidate in self.candidates.values():
+                for part in candidate.parts:
+                    if part in self.candidates and self.candidates[part].count == candidate.count:
+                        covered.add(part)
+        candidates = sorted(
+            (candidate for text, candidate in self.candidates.items() if candidate.count >= min_count and text not in covered),
+            key=lambda candidate: (-candidate.score, -candidate.count, candidate.text),
+        )
+        if not closed:
+            return candidates
+        ranked, overlaps = [], set() # (part, count) of the better shapes
+        for candidate in candidates:
+            if not any((part, candidate.count) in overlaps for part in candidate.parts):
+                ranked.append(candidate)
+            overlaps.update((part, candidate.count) for part in candidate.parts)
+        return ranked
+
+
+def candidate_rules(candidates: Iterable[Candidate], files: int) -> str:
+    """The candidates as rules of a pattern library (with an empty replacement to be written)."""
+    lines = [
+        f"# Candidate rules mined from {files} files (see optimiser/pattern_miner.py), ranked by their estimated",
+        "# runtime calls summed over all occurrences. Write the replacement of a rule before using the file.",
+    ]
+    for rank, candidate in enumerate(candidates, 1):
+        occurrences = sorted(candidate.files.items(), key=lambda item: -item[1])
+        files = ", ".join(f"{name}: {count}" for name, count in occurrences[:3]) + (f", +{len(occurrences) - 3} files" if len(occurrences) > 3 else "")
+        lines += [
+            "",
+            f"# {candidate.count} occurrences ({files}), {candidate.calls} calls per run, score {candidate.score:.3g}",
+            f"pattern candidate_{rank}",
+            candidate.text,
+            "=>",
+            "    # replacement",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def mine(paths: Iterable[str], level: int = 1, max_window: int = MAX_WINDOW, max_nodes: int = MAX_NODES,
+         log: Optional[callable] = None) -> PatternMiner:
+    """
+    Mines WHILE files (and the WHILE code of E-WHILE files, if the transpiler is built) after the
+    fixpoint passes of an optimisation level (see pipelines), directories are searched for both.
+    """
+    from minimal_compiler.src.parser.create_parsetree import create_ir_from_file
+    from minimal_compiler.src.parser.ir_parser import IRParser
+    from minimal_compiler.src.parser.lexer import tokenize_compact
+    from minimal_compiler.src.optimiser.pipelines import optimiser_manager
+
+    miner, seen = PatternMiner(max_window, max_nodes), {}
+    for path in files(paths):
+        with open(path, "rb") as file:
+            digest = hashlib.sha256(file.read()).hexdigest()
+        if digest in seen:
+            # copies (e.g. of the self-compiler) would count its shapes twice
+            if log:
+                log(f"skipping {path} (same as {seen[digest]})")
+            continue
+        seen[digest] = path
+        try:
+            if path.endswith(".ewhile"):
+                from web_transpile import transpile_to_while
+                with open(path) as file:
+                    ast, symbol_table, constant_table = IRParser(tokenize_compact(transpile_to_while(file.read()))).parse_prog()
+            else:
+                ast, symbol_table, constant_table = create_ir_from_file(path)
+        except ImportError:
+            if log:
+                log(f"skipping {path} (the transpiler is not built, see build.py)")
+            continue
+        except (RuntimeError, SyntaxError) as error:
+            # e.g. the samples of syntax errors
+            if log:
+                log(f"skipping {path} ({error})")
+            continue
+        manager = optimiser_manager(level)
+        manager.lowering = [] # the lowering creates nodes the rules can not match (e.g. IfNode)
+        miner.add(manager.optimise(ast, symbol_table, constant_table), path)
+        if log:
+            log(f"mined {path}")
+    return miner
+
+
+def files(paths: Iterable[str]) -> List[str]:
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in sorted(os.walk(path)):
+                found += [os.path.join(directory, name) for name in sorted(names) if name.endswith((".while", ".ewhile"))]
+        else:
+            found.append(path)
+    return found
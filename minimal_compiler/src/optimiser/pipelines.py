@@ -0,0 +1,87 @@
+from typing import Optional, Sequence
+from minimal_compiler.src.optimiser.base_optimiser import OptimiserManager
+from minimal_compiler.src.optimiser.parallel import ParallelOptimiser
+from minimal_compiler.src.optimiser.optimisers.structural_tree_pattern_matching import StructuralTreePatternMatchingOptimiser
+from minimal_compiler.src.optimiser.optimisers.comparisons import ComparisonOptimiser
+from minimal_compiler.src.optimiser.optimisers.induction_variables import InductionVariableOptimiser
+from minimal_compiler.src.optimiser.optimisers.loop_invariants import LoopInvariantOptimiser
+from minimal_compiler.src.optimiser.optimisers.constant_propagation import ConstantPropagationOptimiser
+from minimal_compiler.src.optimiser.optimisers.arithmetic_chains import ArithmeticChainOptimiser
+from minimal_compiler.src.optimiser.optimisers.copies import CopyPropagationOptimiser, CopyOptimiser
+from minimal_compiler.src.optimiser.optimisers.ssa_optimiser import SSAOptimiser
+from minimal_compiler.src.optimiser.optimisers.dead_stores import DeadStoreOptimiser
+from minimal_compiler.src.optimiser.optimisers.branches import BranchOptimiser
+from minimal_compiler.src.optimiser.optimisers.libraries import PatternLibraryOptimiser
+
+# the passes by name, created with the highest argument the program is called with
+PASSES = {
+    "structural": lambda max_argument_id: StructuralTreePatternMatchingOptimiser(),
+    "comparisons": ComparisonOptimiser,
+    "induction_variables": lambda max_argument_id: InductionVariableOptimiser(),
+    "loop_invariants": lambda max_argument_id: LoopInvariantOptimiser(),
+    "constant_propagation": ConstantPropagationOptimiser,
+    "arithmetic_chains": lambda max_argument_id: ArithmeticChainOptimiser(),
+    "copy_propagation": lambda max_argument_id: CopyPropagationOptimiser(),
+    "ssa": SSAOptimiser,
+    "dead_stores": lambda max_argument_id: DeadStoreOptimiser(),
+    "branches": BranchOptimiser,
+    "copies": lambda max_argument_id: CopyOptimiser(),
+}
+
+# the passes which only need the statements they rewrite, their first rounds can run in a process pool (see ParallelOptimiser)
+PARALLEL = {"structural"}
+
+# optimisation level (-O0 to -O3) -> (passes iterated to a fixpoint, lowering passes run once afterwards)
+PIPELINES = {
+    # no optimisation
+    0: ([], []),
+    # the local rewrites: templates to native operations and loops to closed forms
+    1: (["structural", "comparisons", "induction_variables"], ["branches", "copies"]),
+    # the default: additionally the dataflow passes over the whole program
+    2: (
+        [
+            "structural", "comparisons", "induction_variables", "loop_invariants", "constant_propagation",
+            "arithmetic_chains", "copy_propagation", "dead_stores",
+        ],
+        ["branches", "copies"],
+    ),
+    # additionally the SSA middle end (slower to compile)
+    3: (
+        [
+            "structural", "comparisons", "induction_variables", "loop_invariants", "constant_propagation",
+            "arithmetic_chains", "copy_propagation", "ssa", "dead_stores",
+        ],
+        ["branches", "copies"],
+    ),
+}
+
+
+def optimiser_manager(level: int, max_argument_id: Optional[int] = None, use_ssa: bool = False, stats=None,
+                      workers: Optional[int] = None, libraries: Sequence[str] = ()) -> OptimiserManager:
+    """
+    The OptimiserManager running the pipeline of an optimisation level, use_ssa adds the SSA middle
+    end (before dead_stores) to a level without it. stats is an OptimisationStats which collects the
+    statistics of the passes. With workers (> 1) the PARALLEL passes optimise chunks of the program
+    in that many processes. The rules of the pattern library files in libraries are applied right
+    after the structural pass (see PatternLibraryOptimiser).
+    """
+    if level not in PIPELINES:
+        raise ValueError(f"Unknown optimisation level {level} (expected one of {', '.join(map(str, PIPELINES))})")
+    passes, lowering = PIPELINES[level]
+    if use_ssa and passes and "ssa" not in passes:
+        k = passes.index("dead_stores") if "dead_stores" in passes else len(passes)
+        passes = passes[:k] + ["ssa"] + passes[k:]
+    optimisers = [PASSES[name](max_argument_id) for name in passes]
+    if workers is not None and workers > 1:
+        optimisers = [
+            ParallelOptimiser(optimiser, workers) if name in PARALLEL else optimiser
+            for name, optimiser in zip(passes, optimisers)
+        ]
+    if libraries and "structural" in passes:
+        k = passes.index("structural") + 1
+        optimisers[k:k] = [PatternLibraryOptimiser(path) for path in libraries]
+    return OptimiserManager(
+        optimisers,
+        [PASSES[name](max_argument_id) for name in lowering],
+        stats,
+    )
@@ -0,0 +1,320 @@
+from typing import Dict, Iterable, List, Optional, Set
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.optimisers.constant_propagation import apply
+
+# kinds of SSA values
+ENTRY = 0 # value of a variable at the start of the program
+PHI = 1 # value of a variable at a loop header (operands: value on the entry edge, value on the back edge)
+OPERATION = 2 # result of an assignment (operands: [source] with constant, or [source, x_k])
+ZERO = 3 # result of x = y - y
+
+# lattice of the sparse conditional constant propagation, an int is a known value
+TOP = "top" # no value seen yet (the definition is not reached so far)
+BOTTOM = "bottom" # not a constant
+
+# algebraic identities y op c = y of the value numbering
+IDENTITIES = {"+": 0, "-": 0, "*": 1, "/": 1, "<<": 0, ">>": 0, "max": 0}
+COMMUTATIVE = ("+", "*", "==", "!=", "max", "min")
+
+
+class Value:
+    """One SSA value: a single definition of a variable of the program."""
+    __slots__ = ("id", "variable", "kind", "operator", "operands", "constant", "block", "previous", "uses")
+
+    def __init__(self, id, variable, kind, block, operator=None, operands=(), constant=None, previous=None):
+        self.id = id
+        self.variable = variable # the variable of the program holding the value
+        self.kind = kind
+        self.block = block
+        self.operator = operator
+        self.operands = list(operands)
+        self.constant = constant
+        self.previous = previous # value the variable held before this definition
+        self.uses = [] # values and loop headers reading the value
+
+
+class Block:
+    """
+    A basic block of the control-flow graph. A loop header holds the phis of the loop and branches
+    on its condition: to body while the condition value is > 0, else to exit. The predecessors of a
+    header are the block before the loop and the last block of the body (the back edge).
+    """
+    __slots__ = ("id", "phis", "values", "successors", "predecessors", "condition", "body", "exit")
+
+    def __init__(self, id):
+        self.id = id
+        self.phis: Dict[int, Value] = {} # variable -> phi
+        self.values: List[Value] = []
+        self.successors: List[Block] = []
+        self.predecessors: List[Block] = []
+        self.condition: Optional[Value] = None
+        self.body: Optional[Block] = None
+        self.exit: Optional[Block] = None
+
+
+class SSAForm:
+    """
+    SSA form of a tree-IR program with its control-flow graph. Every assignment defines a new value,
+    every loop header a phi for each variable assigned in the loop, so every read refers to exactly
+    one definition. The tree stays the source of the statements: definitions maps the assignment
+    nodes to their values and headers the while nodes to their header blocks, so the results of
+    the analyses can be mapped back onto the tree (see SSAOptimiser).
+    """
+
+    def __init__(self, program: ProgramNode):
+        self.values: List[Value] = []
+        self.blocks: List[Block] = []
+        self.entry = self.block()
+        self.entry_values: Dict[int, Value] = {} # variable -> its value at the start
+        self.definitions: Dict[int, Value] = {} # id of an assignment node -> its value
+        self.headers: Dict[int, Block] = {} # id of a while node -> its header block
+        self.build(program)
+
+    def block(self) -> Block:
+        block = Block(len(self.blocks))
+        self.blocks.append(block)
+        return block
+
+    def value(self, variable, kind, block, **fields) -> Value:
+        value = Value(len(self.values), variable, kind, block, **fields)
+        self.values.append(value)
+        return value
+
+    @staticmethod
+    def edge(source: Block, target: Block):
+        source.successors.append(target)
+        target.predecessors.append(source)
+
+    def build(self, program: ProgramNode):
+        assigned = assigned_in_loops(program)
+        current: Dict[int, Value] = {} # variable -> value it holds at the current point
+
+        def read(variable):
+            if variable not in current:
+                if variable not in self.entry_values:
+                    self.entry_values[variable] = self.value(variable, ENTRY, self.entry)
+                    self.entry.values.append(self.entry_values[variable])
+                current[variable] = self.entry_values[variable]
+            return current[variable]
+
+        block = self.entry
+        stack = [program.stmt] if program.stmt is not None else []
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Block): # end of the body of the loop of this header
+                header = node
+                self.edge(block, header) # back edge
+                for variable, phi in header.phis.items():
+                    phi.operands.append(read(variable))
+                    current[variable] = phi
+                block = header.exit
+            elif isinstance(node, SequenceNode):
+                stack.extend(reversed(node.statements))
+            elif isinstance(node, (AssignmentNode, AssignmentNodeTwoVar)):
+                previous = read(node.target)
+                if isinstance(node, AssignmentNode):
+                    value = self.value(node.target, OPERATION, block, operator=node.operator, operands=[read(node.source)], constant=node.value, previous=previous)
+                elif node.operator == "-" and node.source == node.x_k:
+                    value = self.value(node.target, ZERO, block, previous=previous)
+                else:
+                    value = self.value(node.target, OPERATION, block, operator=node.operator, operands=[read(node.source), read(node.x_k)], previous=previous)
+                block.values.append(value)
+                self.definitions[id(node)] = value
+                current[node.target] = value
+            elif isinstance(node, WhileNode):
+                header = self.block()
+                self.edge(block, header)
+                for variable in sorted(assigned[id(node)]):
+                    header.phis[variable] = self.value(variable, PHI, header, operands=[read(variable)])
+                    current[variable] = header.phis[variable]
+                header.condition = read(node.condition.variable)
+                header.body, header.exit = self.block(), self.block()
+                self.edge(header, header.body)
+                self.edge(header, header.exit)
+                self.headers[id(node)] = header
+                block = header.body
+                stack.append(header)
+                stack.append(node.body)
+
+        for value in self.values:
+            for operand in value.operands:
+                operand.uses.append(value)
+        for header in self.headers.values():
+            header.condition.uses.append(header)
+
+
+def assigned_in_loops(program: ProgramNode) -> Dict[int, Set[int]]:
+    # id of a while node -> variables assigned in it (nested loops included)
+    loops, stack = [], [program.stmt] if program.stmt is not None else []
+    while stack:
+        node = stack.pop()
+        if isinstance(node, WhileNode):
+            loops.append(node)
+            stack.append(node.body)
+        elif isinstance(node, SequenceNode):
+            stack.extend(node.statements)
+
+    assigned = {}
+    for loop in reversed(loops): # inner loops before outer ones
+        variables, stack = set(), [loop.body]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, (AssignmentNode, AssignmentNodeTwoVar)):
+                variables.add(node.target)
+            elif isinstance(node, WhileNode):
+                variables |= assigned[id(node)]
+            elif isinstance(node, SequenceNode):
+                stack.extend(node.statements)
+        assigned[id(loop)] = variables
+    return assigned
+
+
+class ConstantPropagation:
+    """
+    Sparse conditional constant propagation (Wegman and Zadeck) on an SSAForm. Blocks are only
+    evaluated once an edge into them is executable: the body of a loop whose condition value is
+    the constant 0 is never reached, and a phi only meets the values of its executable edges, so a
+    variable which a loop sets to the value it already had stays constant.
+
+    - lattice: value id -> TOP, BOTTOM or the known value
+    - reached: ids of the reached blocks
+    - executable: (source id, target id) of the executable edges
+    """
+
+    def __init__(self, ssa: SSAForm, zero_variables: Iterable[int] = (0,)):
+        self.zero_variables = set(zero_variables)
+        self.lattice: List = [TOP] * len(ssa.values)
+        self.reached: Set[int] = set()
+        self.executable: Set[tuple] = set()
+        self.run(ssa)
+
+    def run(self, ssa: SSAForm):
+        flow = [(None, ssa.entry)]
+        work = []
+        while flow or work:
+            while flow:
+                source, block = flow.pop()
+                if source is not None:
+                    if (source.id, block.id) in self.executable:
+                        continue
+                    self.executable.add((source.id, block.id))
+                if block.id in self.reached:
+                    for phi in block.phis.values():
+                        self.evaluate(phi, work)
+                    continue
+                self.reached.add(block.id)
+                for phi in block.phis.values():
+                    self.evaluate(phi, work)
+                for value in block.values:
+                    self.evaluate(value, work)
+                if block.condition is not None:
+                    self.branch(block, flow)
+                else:
+                    flow.extend((block, successor) for successor in block.successors)
+
+            while work and not flow:
+                item = work.pop()
+                block = item.block if isinstance(item, Value) else item
+                if block.id not in self.reached:
+                    continue
+                if isinstance(item, Value):
+                    self.evaluate(item, work)
+                else:
+                    self.branch(item, flow)
+
+    def branch(self, header: Block, flow: list):
+        condition = self.lattice[header.condition.id]
+        if condition == TOP:
+            return
+        if condition == BOTTOM or condition > 0:
+            flow.append((header, header.body))
+        if condition == BOTTOM or condition == 0:
+            flow.append((header, header.exit))
+
+    def evaluate(self, value: Value, work: list):
+        old = self.lattice[value.id]
+        if old == BOTTOM:
+            return
+        new = self.compute(value)
+        if new != old:
+            self.lattice[value.id] = new
+            work.extend(value.uses)
+
+    def compute(self, value: Value):
+        if value.kind == ENTRY:
+            return 0 if value.variable in self.zero_variables else BOTTOM
+        if value.kind == ZERO:
+            return 0
+        if value.kind == PHI:
+            result = TOP
+            for predecessor, operand in zip(value.block.predecessors, value.operands):
+                if (predecessor.id, value.block.id) in self.executable:
+                    result = meet(result, self.lattice[operand.id])
+            return result
+
+        a = self.lattice[value.operands[0].id]
+        b = value.constant if len(value.operands) == 1 else self.lattice[value.operands[1].id]
+        if a == TOP or b == TOP:
+            return TOP
+        if a == 0 and value.operator in ("-", "*", "<<", ">>", ">", "min") or b == 0 and value.operator in ("*", "min"):
+            return 0 # 0 - y (saturating), 0 * y, y * 0, shifts of 0, 0 > y and the minimum with 0 whatever y is
+        if a == BOTTOM or b == BOTTOM:
+            return BOTTOM
+        result = apply(value.operator, a, b)
+        return BOTTOM if result is None else result
+
+
+def meet(a, b):
+    if a == TOP:
+        return b
+    if b == TOP or a == b:
+        return a
+    return BOTTOM
+
+
+def value_numbers(ssa: SSAForm, propagation: ConstantPropagation) -> List[int]:
+    """
+    Global value numbering of an SSAForm (value id -> value number): values with the same number
+    are equal wherever both are defined. Constants are numbered by their value, operations by their
+    operator and the numbers of their operands (commutative operators with sorted operands, y + 0
+    and similar identities get the number of y). A phi whose back edge is not executable is its
+    entry value, every other phi gets a new number (pessimistic: its back edge value is numbered
+    after it).
+    """
+    numbers = [0] * len(ssa.values)
+    table = {} # key of a constant or an operation -> value number
+    lattice = propagation.lattice
+
+    def number(key):
+        if key not in table:
+            table[key] = len(table) + len(ssa.values) # above the ids, which number the unique values
+        return table[key]
+
+    for value in ssa.values: # definitions before uses (the back edge operands of phis excepted)
+        known = lattice[value.id]
+        if known != TOP and known != BOTTOM:
+            numbers[value.id] = number(("constant", known))
+        elif value.kind == PHI:
+            latch = value.block.predecessors[1]
+            executable = (latch.id, value.block.id) in propagation.executable
+            numbers[value.id] = numbers[value.operands[0].id] if not executable else value.id
+        elif value.kind == OPERATION:
+            a = numbers[value.operands[0].id]
+            if len(value.operands) == 1:
+                constant, b = value.constant, None
+            else:
+                constant, b = lattice[value.operands[1].id], numbers[value.operands[1].id]
+            if IDENTITIES.get(value.operator) == constant:
+                numbers[value.id] = a
+                continue
+            if value.operator == "+" and lattice[value.operands[0].id] == 0 and b is not None:
+                numbers[value.id] = b
+                continue
+            if b is None:
+                b = number(("constant", constant))
+            if value.operator in COMMUTATIVE and b < a:
+                a, b = b, a
+            numbers[value.id] = number((value.operator, a, b))
+        else:
+            numbers[value.id] = value.id if value.kind == ENTRY else number(("constant", 0))
+    return numbers
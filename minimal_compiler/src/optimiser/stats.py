@@ -0,0 +1,108 @@
+import time
+from typing import Dict, Tuple
+from minimal_compiler.src.optimiser.ir_classes import *
+
+# assumed number of iterations of a loop when the runtime calls of a program are estimated
+LOOP_ITERATIONS = 10
+
+
+def estimated_calls(node: Node) -> int:
+    """
+    Static estimate of the calls into the bigint library a program makes: one per statement and per
+    check of a loop or if condition, the statements of a loop body run LOOP_ITERATIONS times (per
+    enclosing loop).
+    """
+    total, stack = 0, [(node.stmt if isinstance(node, ProgramNode) else node, 1)]
+    while stack:
+        node, weight = stack.pop()
+        if node is None or isinstance(node, EmptyNode):
+            continue
+        if isinstance(node, SequenceNode):
+            stack.extend((stmt, weight) for stmt in node.statements)
+        elif isinstance(node, WhileNode):
+            total += weight * (LOOP_ITERATIONS + 1)
+            stack.append((node.body, weight * LOOP_ITERATIONS))
+        elif isinstance(node, IfNode):
+            total += weight
+            stack.append((node.then_body, weight))
+            stack.append((node.else_body, weight))
+        else:
+            total += weight
+    return total
+
+
+def name(optimiser) -> str:
+    # the class of the optimiser (of the wrapped one for a ParallelOptimiser, which has its version)
+    return optimiser.version().split(":")[0]
+
+
+class PassStats:
+    __slots__ = ("rounds", "changed", "seconds", "calls_removed")
+
+    def __init__(self):
+        self.rounds = 0 # rounds the pass ran in
+        self.changed = 0 # rounds in which it rewrote something
+        self.seconds = 0.0
+        self.calls_removed = 0 # estimated_calls before minus after the pass, summed over its rounds
+
+
+class OptimisationStats:
+    """
+    Statistics of an OptimiserManager run (collected if it is given one, see --opt-stats): per pass
+    the rounds, the time spent and the estimated runtime calls it removed (see estimated_calls), per
+    pattern of a pattern based optimiser the candidate windows it was matched against and its hits.
+    """
+
+    def __init__(self):
+        self.passes: Dict[str, PassStats] = {}
+        self.patterns: Dict[Tuple[str, str], list] = {} # (pass, pattern) -> [attempts, hits]
+        self.rounds = 0
+        self.calls_before = self.calls_after = 0
+        self.snapshot = {}
+
+    def start(self, optimisers, ast):
+        self.calls_before = self.calls_after = estimated_calls(ast)
+        # the engines of the pattern based optimisers are shared by all their instances, so only the increase counts
+        # (all engines are built first, compiling the patterns of one can run the engine of another)
+        patterns = [pattern for optimiser in optimisers for pattern in optimiser.patterns()]
+        self.snapshot = {id(pattern): (pattern.attempts, pattern.hits) for pattern in patterns}
+
+    def measure(self, optimiser, step):
+        # runs step (returning the new program and the DirtyRegions it rewrote or None) as a round of optimiser
+        start = time.perf_counter()
+        ast, changes = step()
+        stats = self.passes.setdefault(name(optimiser), PassStats())
+        stats.seconds += time.perf_counter() - start
+        stats.rounds += 1
+        calls = estimated_calls(ast)
+        if changes or calls != self.calls_after:
+            stats.changed += 1
+        stats.calls_removed += self.calls_after - calls
+        self.calls_after = calls
+        return ast, changes
+
+    def finish(self, optimisers, rounds):
+        self.rounds += rounds
+        for optimiser in optimisers:
+            for pattern in optimiser.patterns():
+                attempts, hits = self.snapshot.get(id(pattern), (0, 0))
+                counts = self.patterns.setdefault((name(optimiser), pattern.name), [0, 0])
+                counts[0] += pattern.attempts - attempts
+                counts[1] += pattern.hits - hits
+
+    def report(self) -> str:
+        rows = [(name, stats) for name, stats in self.passes.items()]
+        patterns = [(f"{name}/{pattern}", counts) for (name, pattern), counts in self.patterns.items()]
+        width = max([len("pass")] + [len(name) for name, _ in rows + patterns])
+        lines = [f"{'pass':<{width}} {'rounds':>7} {'changed':>8} {'time [ms]':>10} {'est. calls removed':>19}"]
+        for name, stats in rows:
+            lines.append(f"{name:<{width}} {stats.rounds:>7} {stats.changed:>8} {stats.seconds * 1000:>10.1f} {stats.calls_removed:>19}")
+        seconds = sum(stats.seconds for stats in self.passes.values())
+        lines.append(f"{'total':<{width}} {self.rounds:>7} {'':>8} {seconds * 1000:>10.1f} {self.calls_before - self.calls_after:>19}")
+        if patterns:
+            lines.append("")
+            lines.append(f"{'pattern':<{width}} {'attempts':>8} {'hits':>8}")
+            for name, (attempts, hits) in patterns:
+                lines.append(f"{name:<{width}} {attempts:>8} {hits:>8}")
+        lines.append(f"estimated runtime calls: {self.calls_before} -> {self.calls_after} (loops counted with {LOOP_ITERATIONS} iterations)")
+        return "\n".join(lines)
@@ -0,0 +1,157 @@
+from typing import Dict, Iterable, Optional, Set
+from minimal_compiler.src.optimiser.flat_ir import FlatIR, OPERATORS, KIND_ASSIGNMENT, KIND_ASSIGNMENT_TWO_VAR, KIND_COPY, KIND_WHILE, KIND_IF
+
+# abstract values of a variable (unknown variables are not in the state)
+ZERO = 1
+NONZERO = 2
+
+
+def transfer(kind: int, operator: str, source, other) -> Optional[int]:
+    # abstract value assigned by source operator other (other: ZERO/NONZERO/None of x_k, or the constant)
+    if kind == KIND_ASSIGNMENT:
+        other = NONZERO if other else ZERO
+    if operator == "+":
+        if source == NONZERO or other == NONZERO:
+            return NONZERO
+        return ZERO if source == ZERO and other == ZERO else None
+    if operator == "-":
+        if source == ZERO:
+            return ZERO # saturating
+        return source if other == ZERO else None
+    if operator == "*":
+        if source == ZERO or other == ZERO:
+            return ZERO
+        return NONZERO if source == NONZERO and other == NONZERO else None
+    if operator == "<<":
+        return source
+    if operator == ">>":
+        return ZERO if source == ZERO else source if other == ZERO else None
+    if operator in ("==", "!="):
+        if source is None or other is None or source == other == NONZERO:
+            return None
+        equal = NONZERO if source == other else ZERO # both 0, or 0 and non-zero
+        return equal if operator == "==" else ZERO if equal == NONZERO else NONZERO
+    if operator == ">":
+        if source == ZERO:
+            return ZERO
+        return NONZERO if source == NONZERO and other == ZERO else None
+    if operator == "max":
+        return transfer(KIND_ASSIGNMENT_TWO_VAR, "+", source, other)
+    if operator == "min":
+        return transfer(KIND_ASSIGNMENT_TWO_VAR, "*", source, other)
+    # / and %: division by zero is left to the bigint library
+    return ZERO if source == ZERO and other == NONZERO else None
+
+
+class ZeroAnalysis:
+    """
+    Forward analysis of a FlatIR with the lattice zero / non-zero / unknown per variable, for the code
+    generator (indices are the node indices of the FlatIR):
+
+    - redundant_zeroing: x = x - x statements whose variable is already 0 ($set_to_zero can be skipped)
+    - never_entered: loops whose counter is 0 before the loop (the loop can be dropped)
+    - entered: loops whose counter is non-zero before the loop (the first check can be skipped)
+
+    A loop body starts with every variable assigned in the loop unknown and the counter non-zero,
+    after the loop the counter is 0. The then body of an IfNode starts with the condition variable
+    non-zero, the else body with it 0, after the IfNode only what holds after both is known.
+    """
+
+    def __init__(self, flat: FlatIR, zero_variables: Iterable[int] = (0,)):
+        self.redundant_zeroing: Set[int] = set()
+        self.never_entered: Set[int] = set()
+        self.entered: Set[int] = set()
+        self.analyse(flat, dict.fromkeys(zero_variables, ZERO))
+
+    def analyse(self, flat: FlatIR, state: Dict[int, int]):
+        kinds, end, target, source, x_k = flat.kinds, flat.end, flat.target, flat.source, flat.x_k
+        assigned = self.assigned_in_loops(flat)
+        # (index, state, join) of the loops and branches around the current node, at index the state becomes:
+        # state (after a loop), state with join[0] keeping the current state (start of an else body) or,
+        # without state, what the current state and join[0] have in common (end of an IfNode)
+        pending = []
+        index = 0
+        while index < len(kinds):
+            while pending and pending[-1][0] <= index:
+                _, new_state, join = pending.pop()
+                if new_state is None:
+                    state = {variable: value for variable, value in state.items() if join[0].get(variable) == value}
+                else:
+                    if join is not None:
+                        join[0] = state
+                    state = new_state
+
+            kind = kinds[index]
+            if kind == KIND_ASSIGNMENT or kind == KIND_ASSIGNMENT_TWO_VAR:
+                operator = OPERATORS[flat.operators[index]]
+                if kind == KIND_ASSIGNMENT:
+                    value = transfer(kind, operator, state.get(source[index]), flat.constants[flat.values[index]])
+                elif operator == "-" and source[index] == x_k[index]:
+                    if state.get(target[index]) == ZERO:
+                        self.redundant_zeroing.add(index)
+                    value = ZERO
+                else:
+                    value = transfer(kind, operator, state.get(source[index]), state.get(x_k[index]))
+                if value is None:
+                    state.pop(target[index], None)
+                else:
+                    state[target[index]] = value
+
+            elif kind == KIND_COPY:
+                value = state.get(source[index])
+                if value is None:
+                    state.pop(target[index], None)
+                else:
+                    state[target[index]] = value
+
+            elif kind == KIND_WHILE:
+                counter = target[index]
+                if state.get(counter) == ZERO:
+                    self.never_entered.add(index)
+                    index = end[index]
+                    continue
+                if state.get(counter) == NONZERO:
+                    self.entered.add(index)
+                for variable in assigned[index]:
+                    state.pop(variable, None)
+                after = dict(state)
+                after[counter] = ZERO
+                pending.append((end[index], after, None))
+                state[counter] = NONZERO
+
+            elif kind == KIND_IF:
+                condition = target[index]
+                skipped = dict(state)
+                skipped[condition] = ZERO
+                else_start = end[index + 1]
+                if else_start < end[index]:
+                    join = [None]
+                    pending.append((end[index], None, join))
+                    pending.append((else_start, skipped, join))
+                else:
+                    pending.append((end[index], None, [skipped]))
+                state = dict(state)
+                state[condition] = NONZERO
+            index += 1
+
+    @staticmethod
+    def assigned_in_loops(flat: FlatIR) -> Dict[int, Set[int]]:
+        # loop index -> variables assigned in the loop, inner loops first so every node is visited once per enclosing list
+        kinds, end, target = flat.kinds, flat.end, flat.target
+        assigned = {}
+        for index in range(len(kinds) - 1, -1, -1):
+            if kinds[index] != KIND_WHILE:
+                continue
+            variables = set()
+            child = index + 1
+            while child < end[index]:
+                kind = kinds[child]
+                if kind == KIND_WHILE:
+                    variables |= assigned[child]
+                    child = end[child]
+                    continue
+                if kind == KIND_ASSIGNMENT or kind == KIND_ASSIGNMENT_TWO_VAR or kind == KIND_COPY:
+                    variables.add(target[child])
+                child += 1
+            assigned[index] = variables
+        return assigned
@@ -1,8 +1,11 @@
 from minimal_compiler.src.parser.symbol_table import SymbolTableBuilder
 from minimal_compiler.src.parser.constant_table import ConstantTableBuilder
+import mmap
+import os
 from functools import lru_cache
-from minimal_compiler.src.parser.lexer import tokenize
+from minimal_compiler.src.parser.lexer import tokenize, tokenize_compact, iter_token_windows
 from minimal_compiler.src.parser.parser import HandParser, SimpleParseTreeWalker
+from minimal_compiler.src.parser.ir_parser import IRParser
 
 
 @lru_cache(maxsize=128)
@@ -31,4 +34,50 @@ def create_cached_parsetree(input):
     constant_table_builder = ConstantTableBuilder()
     walker.walk(constant_table_builder, tree)
     
-    return tree, symbol_table_builder.get_symbol_table(), constant_table_builder.get_constant_table()
\ No newline at end of file
+    return tree, symbol_table_builder.get_symbol_table(), constant_table_builder.get_constant_table()
+
+@lru_cache(maxsize=128)
+def create_cached_tokens(input):
+    # the token stream is only read by the parser, so it can be shared
+    return tokenize_compact(input)
+
+
+def create_cached_ir(input):
+    """
+    This function creates the tree-IR (ProgramNode) together with the symbol table and
+    the constant table from the input string in a single, non-recursive pass.
+    Only the token stream is cached (lexing the same input string again is skipped): the
+    optimisers rewrite the tree and the tables in place, so every call builds new ones.
+
+    Unlike create_cached_parsetree no parse tree is built and no ASTBuilder pass is needed,
+    so deep or multi-megabyte programs need neither a raised recursion limit nor the memory
+    for the intermediate *Context objects.
+
+    Parameters:
+    input (str): The input string to parse.
+    """
+
+    parser = IRParser(create_cached_tokens(input))
+    return parser.parse_prog()
+
+
+def create_ir_from_file(filepath):
+    """
+    This function creates the tree-IR together with the symbol table and the constant table
+    from a WHILE file without reading it into a str.
+
+    The file is memory-mapped and lexed in bounded windows which the parser consumes one at a
+    time, so neither a copy of the source text nor the token stream of the whole file is held
+    in memory: peak memory is dominated by the IR itself.
+
+    Parameters:
+    filepath (str): Path to the WHILE file.
+    """
+
+    with open(filepath, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0: # empty files can not be mapped
+            return IRParser(tokenize_compact(b"")).parse_prog()
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            parser = IRParser(iter_token_windows(buffer))
+            return parser.parse_prog()
@@ -0,0 +1,133 @@
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.parser.lexer import TokenType, TokenStream, TOKEN_NAMES
+from minimal_compiler.src.parser.symbol_table import SymbolTable
+from minimal_compiler.src.parser.constant_table import ConstantTable
+
+
+class IRParser:
+    """
+    Single pass parser which builds the tree-IR, the symbol table and the constant table
+    directly from a compact token stream (see tokenize_compact) or from an iterator over
+    consecutive token windows (see iter_token_windows), which are pulled one at a time.
+
+    In contrast to HandParser + SimpleParseTreeWalker + ASTBuilder no parse tree is built and
+    no Python recursion is used: open while loops are kept on an explicit stack and every
+    sequence is collected into one flat SequenceNode (the same shape ASTBuilder produces).
+    """
+
+    def __init__(self, tokens):
+        self.windows = iter([tokens]) if isinstance(tokens, TokenStream) else iter(tokens)
+        self.next_window()
+
+        self.symbol_table = SymbolTable()
+        self.constant_table = ConstantTable()
+
+    def next_window(self):
+        self.tokens = next(self.windows, None)
+        if self.tokens is None:
+            self.current = None
+            return
+        self.types = self.tokens.types
+        self.values = self.tokens.values
+        self.pos = 0
+        self.current = self.types[self.pos]
+
+    def advance(self):
+        self.pos += 1
+        if self.pos < len(self.types):
+            self.current = self.types[self.pos]
+        else:
+            self.next_window()
+
+    def match(self, expected_type):
+        if self.current is None:
+            raise SyntaxError(f'ParserException: Unexpected end, expected {TOKEN_NAMES[expected_type]}')
+        if self.current == expected_type:
+            value = self.values[self.pos]
+            self.advance()
+            return value
+        else:
+            raise SyntaxError(f'ParserException: Expected {TOKEN_NAMES[expected_type]}, but found {self.tokens.text(self.pos)} at {self.tokens.offsets[self.pos]}')
+
+    def parse_prog(self):
+        stack = [] # open while loops: (condition, statements of the enclosing sequence)
+        statements = []
+
+        while True:
+            # statement
+            if self.current == TokenType.VAR:
+                statements.append(self.parse_assignment())
+            elif self.current == TokenType.WHILE:
+                self.advance()
+                condition = self.parse_condition()
+                self.match(TokenType.DO)
+                stack.append((condition, statements))
+                statements = []
+                continue
+            elif self.current == TokenType.PRINT:
+                statements.append(self.parse_print())
+            else:
+                raise SyntaxError(f"ParserException: Unexpected token '{self.tokens.text(self.pos)}' at {self.tokens.offsets[self.pos]} in stmt")
+
+            # close all while loops which end after this statement
+            while self.current != TokenType.SEMI and stack:
+                self.match(TokenType.END)
+                condition, outer_statements = stack.pop()
+                outer_statements.append(WhileNode(condition, self.to_stmt(statements)))
+                statements = outer_statements
+
+            if self.current == TokenType.SEMI:
+                self.advance()
+                continue
+
+            self.match(TokenType.EOF)
+            return ProgramNode(self.to_stmt(statements)), self.symbol_table, self.constant_table
+
+    def to_stmt(self, statements):
+        if len(statements) == 1:
+            return statements[0]
+        return SequenceNode(statements)
+
+    def variable(self):
+        # variables are interned to their id (the number in x<id>) by the lexer
+        return self.match(TokenType.VAR)
+
+    def constant(self):
+        return self.tokens.constants[self.match(TokenType.CONST)]
+
+    def parse_print(self):
+        self.match(TokenType.PRINT)
+        variable = self.variable()
+        self.symbol_table.add_variable(variable)
+        self.symbol_table.mark_used(variable)
+        return PrintNode(variable)
+
+    def parse_assignment(self):
+        target = self.variable()
+        self.match(TokenType.ASSIGN)
+        source = self.variable()
+        if self.current == TokenType.PLUS:
+            operator = "+"
+        elif self.current == TokenType.MINUS:
+            operator = "-"
+        else:
+            raise SyntaxError(f"ParserException: Expected '+' or '-' but found '{self.tokens.text(self.pos)}' at {self.tokens.offsets[self.pos]}")
+        self.advance()
+        value = self.constant()
+
+        self.symbol_table.add_variable(target)
+        self.symbol_table.add_variable(source)
+        self.symbol_table.mark_assigned(target)
+        self.symbol_table.mark_used(source)
+        self.constant_table.add(value)
+        return AssignmentNode(target, source, operator, value)
+
+    def parse_condition(self):
+        variable = self.variable()
+        self.match(TokenType.GREATER)
+        value = self.constant()
+
+        self.symbol_table.add_variable(variable)
+        self.symbol_table.mark_used(variable)
+        self.constant_table.add(value)
+        return ConditionNode(variable, value)
@@ -1,4 +1,5 @@
 import re
+from array import array
 from collections import namedtuple
 
 Token = namedtuple("Token", ["type", "text", "pos"])
@@ -18,7 +19,7 @@ token_specification = [
     ('CONST',   r'(?:[1-9][0-9]*|0)\b'),
     ('WS',      r'[ \t\r\n]+'),
     ('COMMENT', r'/[^\n]*'),
-    ('BLOCK_COMMENT', r'/\*(.|\n)*?\*/'),
+    ('BLOCK_COMMENT', r'/\*(?:.|\n)*?\*/'),
 ]
 
 token_regex = '|'.join('(?P<%s>%s)' % pair for pair in token_specification)
@@ -41,4 +42,161 @@ def tokenize(input_text):
             raise RuntimeError(f'LexerException: Unexpected symbol {input_text[pos]!r} at {pos}')
         
     tokens.append(Token("EOF", "", pos)) # always used as last token
-    return tokens
\ No newline at end of file
+    return tokens
+
+class TokenType:
+    # type codes of the compact token stream (index into TOKEN_NAMES)
+    EOF = 0
+    WHILE = 1
+    DO = 2
+    END = 3
+    ASSIGN = 4
+    PRINT = 5
+    PLUS = 6
+    MINUS = 7
+    GREATER = 8
+    SEMI = 9
+    VAR = 10
+    CONST = 11
+
+TOKEN_NAMES = ["EOF", "WHILE", "DO", "END", "ASSIGN", "PRINT", "PLUS", "MINUS", "GREATER", "SEMI", "VAR", "CONST"]
+IGNORED_TOKENS = ("WS", "COMMENT", "BLOCK_COMMENT")
+
+# Whitespace and comments are skipped as a possessive prefix of every token, so a single
+# regex match per token is enough. (The alternation order is the same as in master_pattern.)
+skip_regex = '(?:%s)*+' % '|'.join(regex for name, regex in token_specification if name in IGNORED_TOKENS)
+compact_token_regex = skip_regex + '(?:%s|(?P<EOF>\\Z))' % '|'.join('(?P<%s>%s)' % (name, regex) for name, regex in token_specification if name not in IGNORED_TOKENS)
+skip_pattern = re.compile(skip_regex)
+compact_pattern = re.compile(compact_token_regex)
+# same patterns for bytes-like input (bytes, mmap), which is lexed without decoding it to a str
+skip_pattern_bytes = re.compile(skip_regex.encode())
+compact_pattern_bytes = re.compile(compact_token_regex.encode())
+GROUP_TYPES = {compact_pattern.groupindex[name]: code for code, name in enumerate(TOKEN_NAMES)}
+
+DEFAULT_WINDOW_SIZE = 1 << 16 # bytes/characters of source lexed per token window
+MAX_VARIABLE_ID = 0xFFFFFFFF # variable indices are stored in unsigned 32-bit arrays (token values, symbol table ids)
+
+
+class TokenStream:
+    """
+    Compact struct-of-arrays token stream.
+
+    Every token takes 13 bytes: its type code (array('B')), offset and length in the source
+    (array('I')) and a value (array('I')). The value of a VAR token is the variable index
+    (x12 -> 12), the value of a CONST token is the id of the constant in constants.
+    Indexing the stream materialises a Token, so HandParser can consume it directly.
+
+    The source can be a str or a bytes-like object (e.g. an mmap). Consecutive windows of the
+    same source (see iter_token_windows) share constants, so constant ids stay global.
+    """
+
+    def __init__(self, source, constants=None, constant_ids=None):
+        self.source = source
+        self.types = array('B')
+        self.offsets = array('I')
+        self.lengths = array('I')
+        self.values = array('I')
+        self.constants = constants if constants is not None else [] # constant id -> value
+        self.constant_ids = constant_ids if constant_ids is not None else {} # value -> constant id
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index):
+        return Token(TOKEN_NAMES[self.types[index]], self.text(index), self.offsets[index])
+
+    def text(self, index):
+        offset = self.offsets[index]
+        return decode(self.source[offset:offset + self.lengths[index]])
+
+    def add_constant(self, value):
+        if value not in self.constant_ids:
+            self.constant_ids[value] = len(self.constants)
+            self.constants.append(value)
+        return self.constant_ids[value]
+
+
+def decode(text):
+    return text if isinstance(text, str) else text.decode(errors="replace")
+
+
+def tokenize_compact(input_text):
+    return next(iter_token_windows(input_text, max(len(input_text), 1)))
+
+
+def iter_token_windows(input_text, window_size=DEFAULT_WINDOW_SIZE):
+    """
+    Lexes the input (str, bytes or mmap) in windows of about window_size characters and yields
+    one TokenStream per window, the last one ends with the EOF token.
+
+    The input is never copied: the regex runs directly on the buffer. A token which touches the
+    end of a window could be cut off, so it is left for the next window. If a window contains
+    no complete token at all (e.g. a very long comment or constant), the window grows.
+    """
+    if isinstance(input_text, str):
+        pattern, skip = compact_pattern, skip_pattern
+    else:
+        pattern, skip = compact_pattern_bytes, skip_pattern_bytes
+
+    constants = []
+    constant_ids = {}
+    pos = 0
+    size = window_size
+    while True:
+        stream = TokenStream(input_text, constants, constant_ids)
+        pos, done = lex_window(stream, pattern, skip, pos, min(pos + size, len(input_text)))
+
+        if len(stream):
+            yield stream
+            size = window_size
+        else:
+            size *= 2
+
+        if done:
+            return
+
+
+def lex_window(stream, pattern, skip, pos, endpos):
+    """
+    Appends the tokens of input_text[pos:endpos] to the stream.
+    Returns the position to continue at and whether the EOF token was reached.
+    """
+    input_text = stream.source
+    is_last = endpos == len(input_text)
+    types = stream.types
+    offsets = stream.offsets
+    lengths = stream.lengths
+    values = stream.values
+
+    for m in pattern.finditer(input_text, pos, endpos):
+        if not is_last and m.end() >= endpos: # token may continue in the next window
+            return pos, False
+
+        if m.start() != pos: # unmatched symbol between two tokens
+            if not is_last:
+                return pos, False
+            pos = skip.match(input_text, pos).end()
+            raise RuntimeError(f'LexerException: Unexpected symbol {decode(input_text[pos:pos + 1])!r} at {pos}')
+
+        group = m.lastindex
+        typ = GROUP_TYPES[group]
+        start = m.start(group)
+        pos = m.end()
+
+        types.append(typ)
+        offsets.append(start)
+        lengths.append(pos - start)
+        if typ == TokenType.VAR:
+            id = int(m.group(group)[1:])
+            if id > MAX_VARIABLE_ID:
+                raise SyntaxError(f'LexerException: Variable index of {decode(m.group(group))} at {start} is larger than {MAX_VARIABLE_ID}')
+            values.append(id)
+        elif typ == TokenType.CONST:
+            values.append(stream.add_constant(int(m.group(group))))
+        else:
+            values.append(0)
+
+        if typ == TokenType.EOF: # always used as last token
+            return pos, True
+
+    return pos, False
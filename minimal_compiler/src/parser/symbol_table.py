@@ -1,40 +1,95 @@
+from array import array
 from minimal_compiler.src.parser.parser import AssignmentContext, WhileStmtContext
 
+
+def variable_name(id):
+    # variables are identified by the number of their name (x<id>), names are only needed for the output
+    return f"x{id}"
+
+
+def variable_id(name):
+    return int(name[1:])
+
+
 class SymbolTable:
+    # flags of a variable id
+    DECLARED = 1
+    USED = 2
+    ASSIGNED = 4
+    TEMPORARY = 8 # introduced by an optimiser: no argument of the program, starts as 0
+
     def __init__(self):
-        self.variables = {}  
-        self.next_address = 0 
+        self.ids = array("I") # declared variable ids in order of declaration
+        self.flags = {} # variable id -> flags (sparse, an id can be as large as the lexer allows)
+        self.highest = 0 # highest declared variable id
+        self.types = {} # variable id -> type, only for variables which are not i32 # TODO: Change dynamic alocation of size
+        self.next_address = 0
+
+    def add_variable(self, id):
+        if id not in self.flags:
+            self.flags[id] = self.DECLARED
+            self.ids.append(id)
+            self.highest = max(self.highest, id)
+
+    def add_temporary(self):
+        # new variable (with the next free id) for intermediate values of an optimiser
+        id = self.highest + 1
+        self.add_variable(id)
+        self.flags[id] |= self.TEMPORARY
+        return id
 
-    def add_variable(self, name):
-        if name not in self.variables:
-            self.variables[name] = {"used": False, "assigned": False, "type": "i32"} # TODO: Change dynamic alocation of size
+    def mark_used(self, id):
+        if self.is_declared(id):
+            self.flags[id] |= self.USED
 
-    def mark_used(self, name):
-        if name in self.variables:
-            self.variables[name]["used"] = True
+    def mark_assigned(self, id):
+        if self.is_declared(id):
+            self.flags[id] |= self.ASSIGNED
 
-    def mark_assigned(self, name):
-        if name in self.variables:
-            self.variables[name]["assigned"] = True
+    def is_declared(self, id):
+        return id in self.flags
 
-    def get_type(self, name):
-        if name in self.variables:
-            return self.variables[name]["type"]
-        return "i32" # default type
+    def get_type(self, id):
+        return self.types.get(id, "i32") # default type
     
-    def set_type(self, name, type):
-        if name in self.variables:
-            self.variables[name]["type"] = type
-
-    def is_used(self, name):
-        if name in self.variables:
-            return self.variables[name]["used"]
-        return False
+    def set_type(self, id, type):
+        if self.is_declared(id):
+            self.types[id] = type
+
+    def is_used(self, id):
+        return self.is_declared(id) and bool(self.flags[id] & self.USED)
     
-    def is_assigned(self, name):
-        if name in self.variables:
-            return self.variables[name]["assigned"]
-        return False
+    def is_assigned(self, id):
+        return self.is_declared(id) and bool(self.flags[id] & self.ASSIGNED)
+
+    def is_temporary(self, id):
+        return self.is_declared(id) and bool(self.flags[id] & self.TEMPORARY)
+
+    def max_id(self):
+        # highest declared variable id (0 if there are no variables)
+        return self.highest
+
+    def max_argument_id(self):
+        # highest declared variable id which is an argument of the program (no temporary)
+        return max((id for id in self.ids if not self.flags[id] & self.TEMPORARY), default=0)
+
+    def initially_zero(self, max_argument_id=None):
+        # ids of the variables which are 0 when the program starts: x0, the temporaries and, if the program
+        # is only called with the arguments up to max_argument_id, all higher variables
+        zero = {0}
+        for id in self.ids:
+            if self.flags[id] & self.TEMPORARY or (max_argument_id is not None and id > max_argument_id):
+                zero.add(id)
+        return zero
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __eq__(self, other):
+        return isinstance(other, SymbolTable) and self.ids == other.ids and self.flags == other.flags and self.types == other.types
 
 
 class SymbolTableBuilder:
@@ -42,8 +97,8 @@ class SymbolTableBuilder:
         self.symbol_table = SymbolTable()
 
     def enterAssignment(self, ctx: AssignmentContext):
-        var_name = ctx.VAR(0).getText()
-        used_var_name = ctx.VAR(1).getText()    
+        var_name = variable_id(ctx.VAR(0).getText())
+        used_var_name = variable_id(ctx.VAR(1).getText())
 
         self.symbol_table.add_variable(var_name) # target variable
         self.symbol_table.add_variable(used_var_name) # source variable
@@ -51,12 +106,12 @@ class SymbolTableBuilder:
         self.symbol_table.mark_used(used_var_name)
 
     def enterPrintStmt(self, ctx):
-        var_name = ctx.VAR().getText()
+        var_name = variable_id(ctx.VAR().getText())
         self.symbol_table.add_variable(var_name)
         self.symbol_table.mark_used(var_name)
 
     def enterWhileStmt(self, ctx: WhileStmtContext):
-        cond_var = ctx.condition().VAR().getText()
+        cond_var = variable_id(ctx.condition().VAR().getText())
         self.symbol_table.add_variable(cond_var)
         self.symbol_table.mark_used(cond_var)        
 
@@ -0,0 +1,50 @@
+import unittest
+from minimal_compiler.src.generator.template_loader import set_path_explicitly
+from minimal_compiler.src.parser.create_parsetree import create_cached_ir
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.base_optimiser import OptimiserManager
+from minimal_compiler.src.optimiser.optimisers.arithmetic_chains import ArithmeticChainOptimiser
+from minimal_compiler.src.generator.generate_wasm import generate
+from util import run_wat
+from utils import config
+
+class TestArithmeticChains(unittest.TestCase):
+    def __init__(self, methodName = "runTest"):
+        super().__init__(methodName)
+
+        set_path_explicitly("./generator/templates/")
+
+    def setUp(self):
+        config.use_gmp = False
+
+    def optimise(self, code):
+        ast, symbol_table, constant_table = create_cached_ir(code)
+        optimised_ast = OptimiserManager([ArithmeticChainOptimiser()]).optimise(ast, symbol_table, constant_table)
+        return optimised_ast, generate(optimised_ast, symbol_table, constant_table)
+
+    def test_chains(self):
+        code = """
+            x2 = x2 + 1; x2 = x2 + 1; x2 = x2 + 1;
+            x3 = x1 + 0; x3 = x3 + 7;
+            x4 = x1 + 5; x4 = x4 - 8;
+            while x4 > 0 do x5 = x5 - 2; x5 = x5 - 3; echo x5; x4 = x4 - 1 end;
+            x6 = x6 + 4; x6 = x6 - 4;
+            x0 = x0 + 9
+        """
+        ast, wat = self.optimise(code)
+
+        self.assertEqual([str(stmt) for stmt in ast.stmt.statements[:3]], [
+            "AssignmentNode(x2, x2, +, 3)", "AssignmentNode(x3, x1, +, 7)", "AssignmentNode(x4, x1, -, 3)",
+        ])
+        self.assertEqual(str(ast.stmt.statements[3].body.statements[0]), "AssignmentNode(x5, x5, -, 5)")
+        self.assertEqual(str(ast.stmt.statements[4:]), "[AssignmentNode(x0, x0, +, 9)]") # x6 + 4 - 4 is x6
+        self.assertEqual(wat.count("(local $constant_"), 6) # 2, 4 and 8 are only used by merged statements
+
+    def test_saturating_subtraction(self):
+        # (x1 - 3) + 2 is 2 for x1 <= 3, it is not merged into x1 - 1, (x1 + 2) - 3 is x1 - 1
+        code = "x0 = x1 - 3; x0 = x0 + 2; x2 = x1 + 2; x2 = x2 - 3; while x2 > 0 do x2 = x2 - 1; x0 = x0 + 1 end"
+        ast, wat = self.optimise(code)
+
+        self.assertEqual(str(ast.stmt.statements[:3]), "[AssignmentNode(x0, x1, -, 3), AssignmentNode(x0, x0, +, 2), AssignmentNode(x2, x1, -, 1)]")
+        for n1 in [0, 1, 3, 5]:
+            self.assertEqual(run_wat(wat, "test_arithmetic_chains", {"n1": n1}), max(n1 - 3, 0) + 2 + max(n1 - 1, 0))
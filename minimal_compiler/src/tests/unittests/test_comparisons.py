@@ -0,0 +1,96 @@
+import unittest
+from minimal_compiler.src.generator.template_loader import set_path_explicitly
+from minimal_compiler.src.parser.create_parsetree import create_cached_ir
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.base_optimiser import OptimiserManager
+from minimal_compiler.src.optimiser.optimisers.structural_tree_pattern_matching import StructuralTreePatternMatchingOptimiser
+from minimal_compiler.src.optimiser.optimisers.comparisons import ComparisonOptimiser
+from minimal_compiler.src.optimiser.optimisers.branches import BranchOptimiser
+from minimal_compiler.src.cache.ir_format import serialize_ir, deserialize_ir
+from minimal_compiler.src.generator.generate_wasm import generate
+from util import run_wat
+from utils import config
+
+class TestComparisons(unittest.TestCase):
+    # the templates of the transpiler with x20 as the global zero constant (only called with x1 and x2)
+    EQUALS = """
+        x10 = x1 + 0; x11 = x2 + 0;
+        x12 = x11 + 0; x15 = x10 + 0; x13 = x11 + 0; x14 = x10 + 0;
+        while x14 > 0 do x13 = x13 - 1; x14 = x14 - 1 end;
+        while x13 > 0 do x12 = x10 + 0; x15 = x11 + 0; x13 = x20 + 0 end;
+        while x12 > 0 do x12 = x12 - 1; x15 = x15 - 1 end;
+        x12 = x20 + 1;
+        while x15 > 0 do x12 = x20 + 0; x15 = x20 + 0 end
+    """
+    IF_ELSE = """
+        x21 = x20 + 0; x22 = x12 + 0;
+        while x22 > 0 do x21 = x20 + 1; x22 = x20 + 0 end;
+        x23 = x21 + 0;
+        while x23 > 0 do x0 = x0 + 7; x23 = x20 - 0 end;
+        x24 = x20 + 1; x22 = x21 + 0;
+        while x22 > 0 do x24 = x20 + 0; x22 = x20 + 0 end;
+        while x24 > 0 do x0 = x0 + 3; x24 = x20 + 0 end
+    """
+    MAX = """
+        x30 = x2 + 0; x33 = x1 + 0; x34 = x2 + 0;
+        while x34 > 0 do x33 = x33 - 1; x34 = x34 - 1 end;
+        while x33 > 0 do x30 = x1 + 0; x33 = x33 - 1 end;
+        x0 = x30 + 0
+    """
+
+    def __init__(self, methodName = "runTest"):
+        super().__init__(methodName)
+
+        set_path_explicitly("./generator/templates/")
+
+    def setUp(self):
+        config.use_gmp = False
+
+    def optimise(self, code, lowering=(), max_argument_id=2):
+        _, symbol_table, constant_table = create_cached_ir(code)
+        expected = generate(create_cached_ir(code)[0], symbol_table, constant_table)
+        optimiser_manager = OptimiserManager(
+            [StructuralTreePatternMatchingOptimiser(), ComparisonOptimiser(max_argument_id)],
+            [optimiser(max_argument_id) for optimiser in lowering],
+        )
+        ast = optimiser_manager.optimise(create_cached_ir(code)[0], symbol_table, constant_table)
+        return ast, symbol_table, constant_table, expected
+
+    def assertSameResults(self, expected, wat, name):
+        for n1, n2 in [(0, 0), (3, 3), (2, 7), (7, 2)]:
+            inputs = {"n1": n1, "n2": n2}
+            self.assertEqual(run_wat(wat, name, inputs), run_wat(expected, name + "_expected", inputs))
+
+    def test_comparisons(self):
+        ast, symbol_table, constant_table, expected = self.optimise(self.EQUALS + "; x0 = x12 + 0;" + self.MAX)
+
+        self.assertEqual([str(stmt) for stmt in ast.stmt.statements[2:7]], [
+            "AssignmentNodeTwoVar(x12, x10, ==, x11, 1, 1)",
+            "AssignmentNodeTwoVar(x13, x13, -, x13, 1, 1)",
+            "AssignmentNodeTwoVar(x14, x14, -, x14, 1, 1)",
+            "AssignmentNodeTwoVar(x15, x15, -, x15, 1, 1)",
+            "AssignmentNode(x0, x12, +, 0)",
+        ])
+        self.assertEqual(str(ast.stmt.statements[7]), "AssignmentNodeTwoVar(x30, x1, max, x2, 1, 1)")
+        self.assertSameResults(expected, generate(ast, symbol_table, constant_table), "test_comparisons")
+
+    def test_zero_constant(self):
+        # all arguments may be set, x20 is not known to be 0
+        ast, _, _, _ = self.optimise(self.EQUALS + ";" + self.MAX, max_argument_id=None)
+
+        self.assertEqual(sum(isinstance(stmt, WhileNode) for stmt in ast.stmt.statements), 2)
+        self.assertEqual(str(ast.stmt.statements[-4]), "AssignmentNodeTwoVar(x30, x1, max, x2, 1, 1)")
+
+    def test_branches(self):
+        ast, symbol_table, constant_table, expected = self.optimise(self.EQUALS + ";" + self.IF_ELSE, [BranchOptimiser])
+
+        branch = ast.stmt.statements[-3]
+        self.assertIsInstance(branch, IfNode)
+        self.assertEqual(str(ast.stmt.statements[-5]), "AssignmentNodeTwoVar(x21, x12, >, x20, 1, 1)")
+        self.assertEqual(branch.condition.variable, 21) # the copy x23 of the flag is not tested
+        self.assertEqual(str(branch.then_body), "SequenceNode([AssignmentNode(x0, x0, +, 7)])")
+        self.assertEqual(str(branch.else_body), "SequenceNode([AssignmentNode(x0, x0, +, 3)])")
+
+        wat = generate(ast, symbol_table, constant_table)
+        self.assertEqual(generate(*deserialize_ir(serialize_ir(ast, symbol_table, constant_table))), wat)
+        self.assertSameResults(expected, wat, "test_branches")
@@ -0,0 +1,100 @@
+import unittest
+from minimal_compiler.src.generator.template_loader import set_path_explicitly
+from minimal_compiler.src.parser.create_parsetree import create_cached_ir
+from minimal_compiler.src.optimiser.ast import build_ast
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.base_optimiser import OptimiserManager
+from minimal_compiler.src.optimiser.optimisers.constant_propagation import ConstantPropagationOptimiser
+from minimal_compiler.src.optimiser.optimisers.dead_stores import DeadStoreOptimiser
+from minimal_compiler.src.generator.generate_wasm import generate
+from util import run_wat
+from utils import config
+
+class TestConstantPropagation(unittest.TestCase):
+    def __init__(self, methodName = "runTest"):
+        super().__init__(methodName)
+
+        set_path_explicitly("./generator/templates/")
+
+    def setUp(self):
+        config.use_gmp = False
+
+    def optimise(self, code, ast=None, max_argument_id=None, dead_stores=True):
+        parsed, symbol_table, constant_table = create_cached_ir(code)
+        optimisers = [ConstantPropagationOptimiser(max_argument_id)] + ([DeadStoreOptimiser()] if dead_stores else [])
+        optimiser_manager = OptimiserManager(optimisers)
+        optimised_ast = optimiser_manager.optimise(ast or parsed, symbol_table, constant_table)
+        return optimised_ast, generate(optimised_ast, symbol_table, constant_table)
+
+    def test_known_values(self):
+        code = """
+            x0 = x0 + 5;
+            x2 = x0 + 3;
+            x0 = x2 + 1;
+            while x3 > 0 do x3 = x3 - 1; echo x3 end;
+            x4 = x3 + 2;
+            while x0 > 0 do x0 = x0 - 1 end;
+            while x0 > 0 do echo x0 end;
+            x0 = x4 + 0
+        """
+        ast, _ = self.optimise(code, dead_stores=False)
+
+        # x3 is 0 after its loop, x0 after the third one, the last loop never runs
+        statements = ast.stmt.statements
+        self.assertEqual(str(statements[2]), "AssignmentNode(x0, x0, +, 4)")
+        self.assertEqual(str(statements[-2:]), "[AssignmentNodeTwoVar(x0, x0, -, x0, 1, 1), AssignmentNode(x0, x0, +, 2)]")
+        self.assertEqual(sum(isinstance(stmt, WhileNode) for stmt in statements), 1)
+
+    def test_loop_invariants(self):
+        # only values the loop does not change are known in its body
+        code = "x4 = x0 + 3; while x1 > 0 do x1 = x1 - 1 end"
+        ast = build_ast(code)
+        ast.stmt.statements[1].body = SequenceNode([
+            AssignmentNodeTwoVar(5, 5, "+", 4, 1, 1), AssignmentNodeTwoVar(6, 6, "+", 0, 1, 1), AssignmentNode(0, 0, "+", 1),
+        ])
+
+        ast, wat = self.optimise(code, ast)
+
+        body = ast.stmt.body.statements # x4 is not read anymore
+        self.assertEqual(str(body[0]), "AssignmentNode(x5, x5, +, 3)")
+        self.assertIsInstance(body[1], AssignmentNodeTwoVar)
+
+    def test_if_idiom(self):
+        # transpiled if: {{1}} = {{g}} + 1; while {{1}} > 0 do ...; {{1}} = {{g}} + 0 end with the zero constant x9
+        code = """
+            x3 = x9 + 1;
+            while x3 > 0 do
+                x0 = x1 + 2;
+                x3 = x9 + 0
+            end;
+            x4 = x9 + 0;
+            while x4 > 0 do
+                x0 = x0 + 7;
+                x4 = x9 + 0
+            end
+        """
+        ast, _ = self.optimise(code)
+        self.assertEqual(str(ast.stmt.statements[0]), "AssignmentNode(x3, x9, +, 1)") # x9 could be an argument
+
+        ast, wat = self.optimise(code, max_argument_id=1)
+
+        self.assertEqual(str(ast.stmt), "AssignmentNode(x0, x1, +, 2)")
+        self.assertEqual(run_wat(wat, "test_constant_propagation", {"n1": 7}), 9)
+
+    def test_unrolled_loop(self):
+        code = """
+            while x2 > 0 do x2 = x2 - 1 end;
+            x2 = x2 + 3;
+            while x2 > 0 do
+                x0 = x1 + 1;
+                echo x0;
+                x2 = x2 - 1
+            end
+        """
+        ast = build_ast(code)
+        ast.stmt.statements[2].body.statements[0] = AssignmentNodeTwoVar(0, 0, "+", 1, 1, 1)
+
+        ast, wat = self.optimise(code, ast)
+
+        self.assertEqual(sum(isinstance(stmt, WhileNode) for stmt in ast.stmt.statements), 1)
+        self.assertEqual(run_wat(wat, "test_constant_propagation_unrolled", {"n1": 7}), 21)
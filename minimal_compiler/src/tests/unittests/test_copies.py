@@ -0,0 +1,60 @@
+import unittest
+from minimal_compiler.src.generator.template_loader import set_path_explicitly
+from minimal_compiler.src.parser.create_parsetree import create_cached_ir
+from minimal_compiler.src.optimiser.ast import build_ast
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.flat_ir import FlatIR
+from minimal_compiler.src.optimiser.base_optimiser import OptimiserManager
+from minimal_compiler.src.optimiser.optimisers.copies import CopyPropagationOptimiser, CopyOptimiser
+from minimal_compiler.src.optimiser.optimisers.dead_stores import DeadStoreOptimiser
+from minimal_compiler.src.cache.ir_format import serialize_ir, deserialize_ir
+from minimal_compiler.src.generator.generate_wasm import generate
+from util import run_wat
+from utils import config
+
+class TestCopies(unittest.TestCase):
+    def __init__(self, methodName = "runTest"):
+        super().__init__(methodName)
+
+        set_path_explicitly("./generator/templates/")
+
+    def setUp(self):
+        config.use_gmp = False
+
+    def optimise(self, code, lowering=()):
+        ast, symbol_table, constant_table = create_cached_ir(code)
+        expected = generate(create_cached_ir(code)[0], symbol_table, constant_table)
+        optimised = OptimiserManager([CopyPropagationOptimiser(), DeadStoreOptimiser()], list(lowering)).optimise(ast, symbol_table, constant_table)
+        return optimised, expected, generate(optimised, symbol_table, constant_table), symbol_table, constant_table
+
+    def assertSameResults(self, expected, wat, name):
+        for n1 in [0, 1, 5]:
+            self.assertEqual(run_wat(wat, name, {"n1": n1, "n2": 3}), run_wat(expected, name + "_expected", {"n1": n1, "n2": 3}))
+
+    def test_propagation(self):
+        code = """
+            x3 = x1 + 0;
+            x4 = x3 + 2;
+            x5 = x2 + 0;
+            while x4 > 0 do x6 = x5 + 1; echo x6; x4 = x4 - 1 end;
+            x1 = x1 + 1;
+            echo x1;
+            x0 = x3 + 0
+        """
+        ast, expected, wat, _, _ = self.optimise(code)
+
+        # x5 holds in the loop (its copy is removed), x3 is read after x1 changed and stays
+        self.assertEqual(str(ast.stmt.statements[:2]), "[AssignmentNode(x3, x1, +, 0), AssignmentNode(x4, x1, +, 2)]")
+        self.assertEqual(str(ast.stmt.statements[2].body.statements[0]), "AssignmentNode(x6, x2, +, 1)")
+        self.assertSameResults(expected, wat, "test_copy_propagation")
+
+    def test_copy_node(self):
+        code = "x3 = x1 + 0; x4 = x3 + 0; x3 = x3 + 1; x0 = x4 + 0; x0 = x0 + 0"
+        ast, expected, wat, symbol_table, constant_table = self.optimise(code, [CopyOptimiser()])
+
+        self.assertEqual(str(ast.stmt), "CopyNode(x0, x1)")
+        self.assertIn("(call $copy (local.get $x0) (local.get $x1))", wat)
+        self.assertNotIn("(call $add", wat)
+        self.assertEqual(str(FlatIR.from_tree(ast).to_tree()), str(ast))
+        self.assertEqual(generate(*deserialize_ir(serialize_ir(ast, symbol_table, constant_table))), wat)
+        self.assertSameResults(expected, wat, "test_copy_node")
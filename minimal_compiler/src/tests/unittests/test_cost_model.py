@@ -0,0 +1,59 @@
+import unittest
+from minimal_compiler.src.optimiser.ast import build_ast
+from minimal_compiler.src.optimiser.cost_model import Cost, CostModel, cheapest
+from minimal_compiler.src.optimiser.pattern_library import parse_statements
+from minimal_compiler.src.optimiser.stats import LOOP_ITERATIONS, estimated_calls
+
+class TestCostModel(unittest.TestCase):
+    def test_cost(self):
+        n1, n2 = Cost.symbol("n1"), Cost.symbol("n2")
+        cost = n1 * (Cost.constant(2) + n2) + n2 * n1 + Cost.constant(1)
+        self.assertEqual(str(cost), "2*n1*n2 + 2*n1 + 1")
+        self.assertEqual(cost.evaluate({"n1": 3}), 2 * 3 * LOOP_ITERATIONS + 7)
+        self.assertEqual(cost.format(1, {"n2": 0}), "2*n1 + ... (2 more terms)")
+        self.assertEqual(cost + Cost.constant(-1) + n1 * Cost.constant(-2), Cost({("n1", "n2"): 2}))
+
+    def test_calls(self):
+        # all trip counts unknown: the evaluated calls are the estimated calls
+        code = "while x1 > 0 do x2 = x2 + 1; while x2 > 3 do x2 = x2 - x1 end; x1 = x1 * x3 end; echo x2"
+        model = CostModel(parse_statements(code))
+        self.assertEqual(str(model.calls()), "2*n1*n2 + 4*n1 + 2")
+        self.assertEqual(model.evaluate(model.calls()), estimated_calls(parse_statements(code)))
+        loop = parse_statements(code).statements[0]
+        model = CostModel(loop, values={"n1": 2, "n2": 0})
+        self.assertEqual(model.evaluate(model.calls()), 2 * 4 + 1)
+        self.assertEqual(str(model.cost(loop.body.statements[1]).runs), "n1")
+
+    def test_trip_counts(self):
+        program = build_ast("""
+            x3 = x1 + 0;
+            x4 = x4 + 1;
+            while x3 > 0 do x3 = x3 - 1; x5 = x5 + 2 end;
+            while x6 > 2 do x6 = x6 - 2 end;
+            while x7 > 0 do x7 = x7 - 1; x7 = x7 - 1 end
+        """)
+        model = CostModel(program)
+        loops = [model.loops[id(stmt)] for stmt in program.stmt.statements[2:]]
+        self.assertEqual([str(loop.trips) for loop in loops], ["x1", "((x6 - 2) / 2)", "n3"])
+        self.assertEqual(loops[0].reason, "counts x3 down by 1")
+
+        # the loop sets its counter to a variable which stays 0
+        program = parse_statements("while x1 > 0 do echo x2; x1 = x9 + 0 end")
+        self.assertEqual(str(CostModel(program).loops[id(program)].trips), "n1")
+        self.assertEqual(CostModel(program, zero={0, 9}).loops[id(program)].trips, Cost.constant(1))
+
+    def test_sizes(self):
+        code = "x3 = x1 + 0; while x3 > 0 do x3 = x3 - 1; x4 = x4 + x2; x5 = x5 * x2 end; echo x5"
+        program = parse_statements(code)
+        model = CostModel(program, zero={0, 3, 4}, input_bits=64, values={"x1": 16})
+        loop = model.loops[id(program.statements[1])]
+        self.assertEqual((loop.growth, loop.sums), ({5: 64}, {4}))
+        # the size of x5 after the loop: 64 bits more per iteration, printed in 32-bit limbs
+        self.assertEqual(model.cost(program.statements[2]).bits, 64 + 16 * 64)
+        self.assertEqual(model.cost(program.statements[2]).work, (17 * 64 // 32) ** 2)
+        self.assertIn("x5 +64 bits, x4 +log2", model.report())
+
+        # x2 * 8 as a multiplication or as additions
+        alternatives = [parse_statements("x1 = x2 * 8"), parse_statements("x1 = x2 + x2; x1 = x1 + x1; x1 = x1 + x1")]
+        self.assertEqual(cheapest(alternatives, input_bits=32), 0)
+        self.assertEqual(cheapest(alternatives[::-1], input_bits=32), 1)
@@ -0,0 +1,74 @@
+import unittest
+from minimal_compiler.src.generator.template_loader import set_path_explicitly
+from minimal_compiler.src.parser.create_parsetree import create_cached_ir
+from minimal_compiler.src.optimiser.ast import build_ast
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.base_optimiser import OptimiserManager
+from minimal_compiler.src.optimiser.optimisers.structural_tree_pattern_matching import StructuralTreePatternMatchingOptimiser
+from minimal_compiler.src.optimiser.optimisers.dead_stores import DeadStoreOptimiser
+from minimal_compiler.src.generator.generate_wasm import generate
+from util import run_wat
+from utils import config
+
+class TestDeadStores(unittest.TestCase):
+    def __init__(self, methodName = "runTest"):
+        super().__init__(methodName)
+
+        set_path_explicitly("./generator/templates/")
+
+    def setUp(self):
+        config.use_gmp = False
+
+    def test_straight_line(self):
+        ast = build_ast("x2 = x1 + 0; x3 = x2 + 0; x4 = x1 + 2; x0 = x4 + 0; x0 = x0 + 0; echo x1")
+        ast.stmt.statements.insert(4, AssignmentNodeTwoVar(4, 4, "-", 4, 1, 1))
+
+        ast = DeadStoreOptimiser().optimise(ast)
+
+        self.assertEqual(
+            str(ast.stmt.statements),
+            "[AssignmentNode(x4, x1, +, 2), AssignmentNode(x0, x4, +, 0), PrintNode(x1)]",
+        )
+
+    def test_loops(self):
+        code = """
+            x2 = x1 + 3;
+            x6 = x1 + 1;
+            while x1 > 0 do
+                x0 = x2 + 1;
+                x2 = x1 + 0;
+                x3 = x2 + 1;
+                x5 = x6 + 0;
+                x1 = x1 - 1
+            end;
+            x2 = x2 + 1
+        """
+        ast = DeadStoreOptimiser().optimise(build_ast(code))
+
+        # x2 is read in the next iteration, x3 and x5 never, x6 only by the removed x5
+        self.assertEqual(
+            str(ast.stmt),
+            "SequenceNode([AssignmentNode(x2, x1, +, 3), WhileNode(ConditionNode(x1, 0), SequenceNode(["
+            "AssignmentNode(x0, x2, +, 1), AssignmentNode(x2, x1, +, 0), AssignmentNode(x1, x1, -, 1)]))])",
+        )
+
+    def test_exposed_pattern(self):
+        # removing x5 turns the loop into a pattern of the other optimiser, the zeroed counter is dead as well
+        code = "while x1 > 0 do x1 = x1 - 1; x5 = x1 + 0; x0 = x0 + 1 end"
+        manager = OptimiserManager([StructuralTreePatternMatchingOptimiser(), DeadStoreOptimiser()])
+
+        ast = manager.optimise(build_ast(code))
+
+        self.assertEqual(str(ast.stmt), "AssignmentNodeTwoVar(x0, x0, +, x1, 1, 1)")
+
+    def test_unused_variables(self):
+        code = "x3 = x2 + 5; x4 = x3 + 0; x0 = x1 + 2"
+        parsed, symbol_table, constant_table = create_cached_ir(code)
+        ast = OptimiserManager([DeadStoreOptimiser()]).optimise(parsed, symbol_table, constant_table)
+
+        wat = generate(ast, symbol_table, constant_table)
+
+        self.assertNotIn("(local $x3 ", wat)
+        self.assertNotIn("(local.get $arg_x2)", wat)
+        self.assertIn("(param $arg_x4 i32)", wat) # the signature stays the same
+        self.assertEqual(run_wat(wat, "test_dead_stores", {"n1": 7}), 9)
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from minimal_compiler.src.optimiser.ast import build_ast
+from minimal_compiler.src.optimiser.equivalence import BatchInterpreter, check_library, check_rule, numpy
+from minimal_compiler.src.optimiser.optimisers.constant_propagation import apply
+from minimal_compiler.src.optimiser.optimisers.structural_tree_pattern_matching import StructuralTreePatternMatchingOptimiser
+from minimal_compiler.src.optimiser.optimisers.comparisons import ComparisonOptimiser
+from minimal_compiler.src.optimiser.pattern_library import parse_statements, read_rules
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestEquivalence(unittest.TestCase):
+    def test_interpreter(self):
+        a, b = [0, 5, 7, 3, 2**40, 9], [0, 2, 0, 3, 30, 100]
+        for operator in ["+", "-", "*", "/", "%", "<<", ">>", "==", "!=", ">", "max", "min"]:
+            for dtype in [numpy.int64, object]:
+                interpreter = BatchInterpreter({1: numpy.array(a, object), 2: numpy.array(b, object)}, dtype)
+                interpreter.run(parse_statements(f"x0 = x1 {operator} x2"))
+                # the bigint library: x / 0 is 0, x % 0 is x
+                expected = [apply(operator, x, y) if y or operator not in ("/", "%") else 0 if operator == "/" else x for x, y in zip(a, b)]
+                lanes = ~interpreter.overflow
+                self.assertEqual([int(value) for value in interpreter.values[0][lanes]], [value for value, keep in zip(expected, lanes) if keep], operator)
+                if dtype is object:
+                    self.assertTrue(lanes.all())
+
+        # x1 * 2^x2 in a loop, a lane stops after the budget
+        interpreter = BatchInterpreter({1: numpy.array([3, 0, 2**62], object), 2: numpy.array([4, 5000, 1], object)}, numpy.int64)
+        interpreter.run(parse_statements("while x2 > 0 do x1 = x1 * 2; x2 = x2 - 1 end; echo x1"))
+        self.assertEqual(interpreter.live.tolist(), [True, False, False])
+        self.assertEqual(interpreter.overflow.tolist(), [False, False, True])
+        self.assertEqual(interpreter.output(0), [48])
+
+        # the library copies an operand onto the target first, which clears it if the target is that operand
+        interpreter = BatchInterpreter({1: numpy.array([5, 5, 6, 1], object), 2: numpy.array([1, 3, 4, 4], object)}, numpy.int64)
+        interpreter.run(parse_statements("x3 = x1 + 0; x3 = x3 * x2; x4 = x1 + 0; x4 = x4 % x2; x5 = x1 + 0; x5 = x5 / x2; x6 = x2 + 0; x6 = x1 * x6"))
+        self.assertEqual([interpreter.values[id].tolist() for id in [3, 4, 5, 6]], [[0, 15, 24, 4], [0, 2, 0, 0], [0, 1, 1, 0], [5, 15, 24, 0]])
+
+    def test_counterexample(self):
+        pattern = build_ast("while x1 > 0 do x1 = x1 - 1; x2 = x2 + 1 end").stmt
+        self.assertIsNone(check_rule(pattern, parse_statements("x2 = x2 + x1; x1 = x1 - x1")).counterexample)
+
+        # the loop leaves x1 at 0
+        result = check_rule(pattern, parse_statements("x2 = x2 + x1"), name="add_loop")
+        self.assertEqual(result.counterexample.inputs, {1: 1, 2: 0})
+        self.assertEqual((result.counterexample.pattern, result.counterexample.replacement), ({1: 0}, {1: 1}))
+        self.assertEqual(str(result), "add_loop: counterexample with x1 = 1, x2 = 0: x1 is 0 instead of 1 after the pattern")
+
+        # only differs in values beyond int64 (run with Python ints)
+        result = check_rule(parse_statements("x2 = x1 + 0"), parse_statements("x2 = x1 % x3"), {3: 2**64})
+        self.assertGreaterEqual(result.counterexample.inputs[1], 2**64)
+        self.assertEqual(result.undecided, 0)
+        result = check_rule(parse_statements("x2 = x1 + x1; x3 = x2 - x1"), parse_statements("x2 = x1 * x4; x3 = x1 + 0"), {4: 2})
+        self.assertEqual((result.counterexample, result.undecided), (None, 0))
+
+    def test_libraries(self):
+        comparisons = check_library(ComparisonOptimiser.PATTERN_FILE, ComparisonOptimiser.parse_pattern)
+        self.assertEqual([result.name for result in comparisons if result.counterexample or not result.checked], [])
+
+        structural = check_library(StructuralTreePatternMatchingOptimiser.PATTERN_FILE, StructuralTreePatternMatchingOptimiser.parse_pattern)
+        self.assertEqual([result.name for result in structural if result.counterexample or not result.checked], [])
+
+    def test_assumptions(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "rules.patterns")
+            with open(path, "w") as file:
+                file.write("pattern copy where x3 = 0, x4 = 7\n  x2 = x3 + 0; x2 = x2 + x1\n=>\n  x2 = x1 + 0\n")
+            self.assertEqual(read_rules(path, open(path).read())[0][5], {3: 0, 4: 7})
+            self.assertIsNone(check_library(path)[0].counterexample)
+            with self.assertRaisesRegex(SyntaxError, "rules.patterns:1: expected 'x<id> = <value>' after where"):
+                read_rules(path, "pattern copy where x3 == 0\n  x2 = x3 + 0\n=>\n  x2 = x1 + 0\n")
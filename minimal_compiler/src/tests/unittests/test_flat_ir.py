@@ -0,0 +1,75 @@
+import unittest
+from minimal_compiler.src.generator.template_loader import set_path_explicitly
+from minimal_compiler.src.parser.create_parsetree import create_cached_ir
+from minimal_compiler.src.optimiser.base_optimiser import OptimiserManager
+from minimal_compiler.src.optimiser.optimisers.structural_tree_pattern_matching import StructuralTreePatternMatchingOptimiser
+from minimal_compiler.src.optimiser.flat_ir import FlatIR, KIND_ASSIGNMENT, KIND_WHILE, numpy
+from minimal_compiler.src.optimiser.ir_classes import AssignmentNode
+from minimal_compiler.src.generator.generate_wasm import generate
+from util import run_wat
+from utils import config
+
+class TestFlatIR(unittest.TestCase):
+    def __init__(self, methodName = "runTest"):
+        super().__init__(methodName)
+
+        set_path_explicitly("./generator/templates/")
+
+    CODE = """
+        x3 = x1 + 0;
+        x4 = x1 + 3;
+        while x4 > 0 do
+            x3 = x3 + 1;
+            x4 = x4 - 1
+        end;
+        While x3 > 0 Do
+            x5 = x5 + 7;
+            While x5 > 0 Do
+                x5 = x5 - 1
+            End;
+            x3 = x3 - 1;
+            x0 = x0 + 1
+        End;
+        echo x0
+    """
+
+    def setUp(self):
+        config.use_gmp = False
+
+    def test_round_trip(self):
+        ast, _, _ = create_cached_ir(self.CODE)
+
+        flat = FlatIR.from_tree(ast)
+
+        self.assertEqual(str(flat.to_tree()), str(ast))
+        self.assertEqual(flat.kinds[1], KIND_ASSIGNMENT)
+        self.assertEqual(list(flat.children(4)), [5, 6]) # body of the first while loop
+        self.assertEqual(flat.end[7], len(flat) - 1) # second while loop, followed by echo
+
+    def test_same_wasm_as_tree(self):
+        optimiser_manager = OptimiserManager([StructuralTreePatternMatchingOptimiser()])
+        ast, symbol_table, constant_table = create_cached_ir(self.CODE)
+
+        flat = optimiser_manager.optimise(FlatIR.from_tree(ast))
+        optimised_ast = optimiser_manager.optimise(ast)
+
+        self.assertIsInstance(flat, FlatIR)
+        wat = generate(flat, symbol_table, constant_table)
+        self.assertEqual(wat, generate(optimised_ast, symbol_table, constant_table))
+        self.assertEqual(run_wat(wat, "test_flat_ir", {"n1": 2}), 7)
+
+    def test_nodes_without_dict(self):
+        ast, _, _ = create_cached_ir(self.CODE)
+
+        self.assertFalse(hasattr(ast.stmt.statements[0], "__dict__"))
+        self.assertEqual(AssignmentNode.FIELDS, ("target", "source", "operator", "value"))
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_numpy_views(self):
+        ast, _, _ = create_cached_ir(self.CODE)
+        flat = FlatIR.from_tree(ast)
+
+        views = flat.numpy_views()
+
+        self.assertEqual(int((views["kinds"] == KIND_WHILE).sum()), 3)
+        self.assertEqual(sorted(set(views["target"][views["kinds"] == KIND_ASSIGNMENT].tolist())), [0, 3, 4, 5])
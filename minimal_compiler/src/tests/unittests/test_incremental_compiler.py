@@ -0,0 +1,107 @@
+import re
+import unittest
+from minimal_compiler.src.generator.template_loader import set_path_explicitly
+from minimal_compiler.src.incremental.incremental_compiler import IncrementalCompiler
+from minimal_compiler.src.optimiser.base_optimiser import OptimiserManager
+from minimal_compiler.src.optimiser.optimisers.structural_tree_pattern_matching import (
+    StructuralTreePatternMatchingOptimiser,
+)
+from utils import config
+from util import run_wat
+
+def normalise(compiler, wat):
+    # block labels, constant names and the order of declarations may differ between incremental and fresh compilation
+    values = {name: value for value, name in compiler.constant_names.get_full_table().items()}
+    wat = re.sub(r"constant_\d+", lambda match: f"constant_value_{values[match.group(0)]}", wat)
+    return sorted(re.sub(r"\$while_(block|loop)\d+", "$while", wat).splitlines())
+
+def compile_fresh(code):
+    compiler = IncrementalCompiler(OptimiserManager([StructuralTreePatternMatchingOptimiser()]))
+    return normalise(compiler, compiler.compile(code))
+
+class TestIncrementalCompiler(unittest.TestCase):
+    def __init__(self, methodName = "runTest"):
+        super().__init__(methodName)
+
+        set_path_explicitly("./generator/templates/")
+
+    def setUp(self):
+        # the code is compiled here (not in run_wat), so the bigint library has to be chosen before
+        config.use_gmp = False
+
+    CODE = """
+        x2 = x2 + 1;
+
+        While x1 > 0 Do
+            x3 = x2 + 0;
+            x4 = x1 - 1;
+            While x4 > 0 Do
+                x5 = x3 + 0;
+                While x5 > 0 Do
+                    x2 = x2 + 1;
+                    x5 = x5 - 1
+                End;
+
+                x4 = x4 - 1
+            End;
+            x1 = x1 - 1
+        End;
+
+        x7 = x6 + 3;
+        While x7 > 0 Do
+            x7 = x7 - 1;
+            x8 = x8 + 1
+        End;
+
+        x0 = x2 + 0
+    """
+
+    def new_compiler(self):
+        return IncrementalCompiler(OptimiserManager([StructuralTreePatternMatchingOptimiser()]))
+
+    def test_small_edit_reparses_one_statement(self):
+        compiler = self.new_compiler()
+        compiler.compile(self.CODE)
+        self.assertEqual(compiler.parsed_statements, 5)
+
+        edited = self.CODE.replace("x7 = x6 + 3", "x7 = x6 + 4")
+        wat = compiler.compile(edited)
+
+        self.assertEqual(compiler.parsed_statements, 1)
+        self.assertEqual(normalise(compiler, wat), compile_fresh(edited))
+
+        edited = edited.replace("x0 = x2 + 0", "x0 = x8 + 0")
+        wat = compiler.compile(edited)
+
+        self.assertEqual(compiler.parsed_statements, 1)
+        self.assertEqual(run_wat(wat, "test_small_edit_reparses_one_statement", {"n1": 0}), 4)
+
+    def test_edits_match_fresh_compilation(self):
+        edits = [
+            ("x2 = x2 + 1;", "x2 = x2 + 1; x9 = x9 + 5;"), # insert a statement
+            ("x9 = x9 + 5;", ""), # delete it again
+            ("x1 = x1 - 1\n        End;", "x1 = x1 - 1\n        End; While x9 > 0 Do x9 = x9 - 1; x7 = x7 + 1 End;"),
+            ("x4 = x1 - 1;", "x4 = x1 - 2; / comment\n"),
+            ("x0 = x2 + 0", "x0 = x2 + 0 / comment at the end"),
+            ("While x7 > 0 Do", "While x7 > 0 Do While x8 > 0 Do x8 = x8 - 1 End;"), # changes the nesting
+            ("x7 = x6 + 3;", "x7 = x6 + 3; x10 = x7 + 0;"),
+        ]
+
+        compiler = self.new_compiler()
+        code = self.CODE
+        compiler.compile(code)
+        for old, new in edits:
+            code = code.replace(old, new, 1)
+            self.assertEqual(normalise(compiler, compiler.compile(code)), compile_fresh(code))
+
+        self.assertEqual(run_wat(compiler.compile(code), "test_edits_match_fresh_compilation", {"n1": 4}), 6)
+
+    def test_syntax_error_keeps_previous_version(self):
+        compiler = self.new_compiler()
+        compiler.compile(self.CODE)
+
+        with self.assertRaises(SyntaxError):
+            compiler.compile(self.CODE.replace("x7 = x6 + 3;", "x7 = x6 + 3;;"))
+
+        edited = self.CODE.replace("x7 = x6 + 3", "x7 = x6 + 1")
+        self.assertEqual(normalise(compiler, compiler.compile(edited)), compile_fresh(edited))
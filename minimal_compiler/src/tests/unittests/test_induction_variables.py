@@ -0,0 +1,103 @@
+import unittest
+from minimal_compiler.src.generator.template_loader import set_path_explicitly
+from minimal_compiler.src.parser.create_parsetree import create_cached_ir
+from minimal_compiler.src.optimiser.ast import build_ast
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.base_optimiser import OptimiserManager
+from minimal_compiler.src.optimiser.optimisers.structural_tree_pattern_matching import StructuralTreePatternMatchingOptimiser
+from minimal_compiler.src.optimiser.optimisers.induction_variables import InductionVariableOptimiser
+from minimal_compiler.src.generator.generate_wasm import generate
+from util import run_wat
+from utils import config
+
+def loops(node):
+    stack, count = [node], 0
+    while stack:
+        node = stack.pop()
+        if isinstance(node, WhileNode):
+            count += 1
+        stack.extend(value for key in node.FIELDS for value in [getattr(node, key)] if isinstance(value, Node))
+        stack.extend(item for key in node.FIELDS for value in [getattr(node, key)] if isinstance(value, list) for item in value)
+    return count
+
+class TestInductionVariables(unittest.TestCase):
+    def __init__(self, methodName = "runTest"):
+        super().__init__(methodName)
+
+        set_path_explicitly("./generator/templates/")
+
+    def setUp(self):
+        config.use_gmp = False
+
+    def compile(self, code, ast=None):
+        parsed, symbol_table, constant_table = create_cached_ir(code)
+        optimiser_manager = OptimiserManager([StructuralTreePatternMatchingOptimiser(), InductionVariableOptimiser()])
+        optimised_ast = optimiser_manager.optimise(ast or parsed, symbol_table, constant_table)
+        return optimised_ast, generate(optimised_ast, symbol_table, constant_table), symbol_table
+
+    def test_reordered_updates(self):
+        code = """
+            x4 = x4 + 100;
+            while x1 > 0 do
+                x3 = x3 + 2;
+                x4 = x4 - 1;
+                x1 = x1 - 1;
+                x0 = x0 + 3;
+                x3 = x3 + 5
+            end
+        """
+        ast, wat, _ = self.compile(code)
+
+        self.assertEqual(loops(ast), 0)
+        self.assertEqual(run_wat(wat, "test_induction_reordered", {"n1": 7}), 21)
+
+    def test_constant_decrement(self):
+        code = """
+            while x1 > 0 do
+                x0 = x0 + 1;
+                x1 = x1 - 2
+            end;
+            while x2 > 0 do
+                x2 = x2 - 1
+            end
+        """
+        ast, wat, symbol_table = self.compile(code)
+
+        self.assertEqual(loops(ast), 0)
+        self.assertEqual(symbol_table.max_argument_id(), 2) # the temporaries are no arguments
+        self.assertGreater(symbol_table.max_id(), 2)
+        self.assertNotIn(f"$arg_x{symbol_table.max_id()}", wat)
+        self.assertEqual(run_wat(wat, "test_induction_decrement", {"n1": 7}), 4)
+
+    def test_invariant_step(self):
+        # x0 = x0 + x2 (e.g. left by an inner loop rewritten before) is linear if the loop does not assign x2
+        code = "x2 = x2 + 5; while x1 > 0 do x1 = x1 - 1 end"
+        ast, _, _ = create_cached_ir(code)
+        ast.stmt.statements[1].body = SequenceNode([AssignmentNode(1, 1, "-", 1), AssignmentNodeTwoVar(0, 0, "+", 2, 1, 1)])
+
+        optimised_ast, wat, _ = self.compile(code, ast)
+
+        self.assertEqual(loops(optimised_ast), 0)
+        self.assertEqual(run_wat(wat, "test_induction_invariant", {"n1": 4}), 20)
+
+    def test_no_counting_loop(self):
+        for code in [
+            "while x1 > 0 do x1 = x1 - 1; x2 = x2 + 1; x2 = x2 - 1 end", # saturating subtraction
+            "while x1 > 0 do x1 = x1 - 1; x2 = x3 + 0 end",
+            "while x1 > 0 do x1 = x1 - 1; echo x1 end",
+            "while x1 > 0 do x2 = x2 + 1 end",
+        ]:
+            ast = InductionVariableOptimiser().optimise(build_ast(code))
+            self.assertEqual(loops(ast), 1, code)
+
+    def test_without_tables(self):
+        # without symbol and constant table only loops which need no temporaries are replaced
+        ast = InductionVariableOptimiser().optimise(build_ast(
+            "while x1 > 0 do x1 = x1 - 1; x2 = x2 + 1 end; while x3 > 0 do x3 = x3 - 2 end"
+        ))
+
+        self.assertEqual(
+            str(ast.stmt.statements[:2]),
+            "[AssignmentNodeTwoVar(x2, x2, +, x1, 1, 1), AssignmentNodeTwoVar(x1, x1, -, x1, 1, 1)]",
+        )
+        self.assertEqual(loops(ast), 1)
@@ -0,0 +1,105 @@
+import os
+import shutil
+import unittest
+from minimal_compiler.src.generator.template_loader import set_path_explicitly
+from minimal_compiler.src.parser.create_parsetree import create_cached_ir
+from minimal_compiler.src.optimiser.base_optimiser import OptimiserManager
+from minimal_compiler.src.optimiser.optimisers.structural_tree_pattern_matching import StructuralTreePatternMatchingOptimiser
+from minimal_compiler.src.generator.generate_wasm import generate
+from minimal_compiler.src.cache.ir_format import serialize_ir, deserialize_ir, IRFormatException, FORMAT_VERSION
+from minimal_compiler.src.cache.ir_cache import IRCache
+from utils import config
+
+class TestIRCache(unittest.TestCase):
+    def __init__(self, methodName = "runTest"):
+        super().__init__(methodName)
+
+        set_path_explicitly("./generator/templates/")
+
+    CACHE_DIR = "./minimal_compiler/src/tests/unittests/temp/ir_cache/"
+
+    CODE = """
+        x1 = x1 + 100000000000000000000000;
+        x3 = x1 + 0;
+        x4 = x2 + 0;
+        while x4 > 0 do
+            x3 = x3 + 1;
+            x4 = x4 - 1
+        end;
+        x0 = x3 + 0;
+        echo x0
+    """
+
+    def setUp(self):
+        config.use_gmp = False
+        shutil.rmtree(self.CACHE_DIR, ignore_errors=True)
+
+    def optimise(self, code):
+        optimiser_manager = OptimiserManager([StructuralTreePatternMatchingOptimiser()])
+        ast, symbol_table, constant_table = create_cached_ir(code)
+        return optimiser_manager.optimise(ast), symbol_table, constant_table
+
+    def test_round_trip(self):
+        ast, symbol_table, constant_table = self.optimise(self.CODE)
+
+        data = serialize_ir(ast, symbol_table, constant_table)
+        loaded_ast, loaded_symbol_table, loaded_constant_table = deserialize_ir(data)
+
+        self.assertEqual(str(loaded_ast), str(ast))
+        self.assertEqual(loaded_symbol_table, symbol_table)
+        self.assertEqual(loaded_constant_table.get_full_table(), constant_table.get_full_table())
+        self.assertEqual(
+            generate(loaded_ast, loaded_symbol_table, loaded_constant_table),
+            generate(ast, symbol_table, constant_table),
+        )
+
+    def test_deep_nesting(self):
+        depth = 5000
+        code = "While x1 > 0 Do " * depth + "x1 = x1 - 1; echo x1" + " End" * depth
+        ast, symbol_table, constant_table = create_cached_ir(code)
+
+        loaded_ast, _, _ = deserialize_ir(serialize_ir(ast, symbol_table, constant_table))
+
+        node = loaded_ast.stmt
+        for _ in range(depth):
+            self.assertEqual(node.condition.variable, 1)
+            node = node.body
+        self.assertEqual(len(node.statements), 2)
+
+    def test_corrupt_data(self):
+        data = serialize_ir(*self.optimise(self.CODE))
+
+        for corrupt in [b"", b"WIR", data[:-1], data + b"\x00", b"XYZ" + data[3:]]:
+            with self.assertRaises(IRFormatException):
+                deserialize_ir(corrupt)
+
+    def test_cache(self):
+        cache = IRCache(self.CACHE_DIR)
+        version = OptimiserManager([StructuralTreePatternMatchingOptimiser()]).version()
+        key = cache.key(self.CODE, version)
+
+        self.assertIsNone(cache.load(key))
+
+        ast, symbol_table, constant_table = self.optimise(self.CODE)
+        cache.store(key, ast, symbol_table, constant_table)
+        loaded_ast, _, _ = cache.load(key)
+
+        self.assertEqual(str(loaded_ast), str(ast))
+
+        # other source or other optimisers, other entry
+        self.assertNotEqual(cache.key(self.CODE + " ", version), key)
+        self.assertNotEqual(cache.key(self.CODE, OptimiserManager([]).version()), key)
+
+        # a damaged entry is a miss
+        with open(cache.path(key), "wb") as file:
+            file.write(b"WIR" + bytes([FORMAT_VERSION, 5]))
+        self.assertIsNone(cache.load(key))
+
+    def test_file_key(self):
+        cache = IRCache(self.CACHE_DIR)
+        os.makedirs(self.CACHE_DIR, exist_ok=True)
+        file_path = self.CACHE_DIR + "test_file_key.while"
+        with open(file_path, "w") as file:
+            file.write(self.CODE)
+
+        self.assertEqual(cache.file_key(file_path, "version"), cache.key(self.CODE, "version"))
@@ -0,0 +1,125 @@
+import os
+import sys
+import unittest
+from minimal_compiler.src.generator.template_loader import set_path_explicitly
+from minimal_compiler.src.parser.create_parsetree import create_cached_parsetree, create_cached_ir, create_ir_from_file
+from minimal_compiler.src.optimiser.ast import ASTBuilder
+from minimal_compiler.src.optimiser.pipelines import optimiser_manager
+from util import compile_and_run
+
+class TestIRParser(unittest.TestCase):
+    def __init__(self, methodName = "runTest"):
+        super().__init__(methodName)
+
+        set_path_explicitly("./generator/templates/")
+
+    def test_same_ir_as_parse_tree(self):
+        code = """
+            x2 = x2 + 1;
+
+            While x1 > 0 Do
+                x3 = x2 + 0;
+                x4 = x1 - 1;
+                While x4 > 0 Do
+                    x5 = x3 + 7;
+                    While x5 > 0 Do
+                        x2 = x2 + 1;
+                        x5 = x5 - 1
+                    End;
+
+                    x4 = x4 - 1
+                End;
+                x1 = x1 - 1
+            End;
+
+            x0 = x2 + 0
+        """
+        tree, symbol_table, constant_table = create_cached_parsetree(code)
+        expected_ast = ASTBuilder().visit(tree)
+
+        ast, ir_symbol_table, ir_constant_table = create_cached_ir(code)
+
+        self.assertEqual(str(ast), str(expected_ast))
+        self.assertEqual(ir_symbol_table, symbol_table)
+        self.assertEqual(ir_constant_table.get_full_table(), constant_table.get_full_table())
+
+    def test_ir_from_file(self):
+        code = ";\n".join(["x1 = x1 + 1", "While x1 > 0 Do x2 = x2 + 3; x1 = x1 - 1 End"] * 3000)
+
+        os.makedirs("./minimal_compiler/src/tests/unittests/temp/", exist_ok=True)
+        file_path = "./minimal_compiler/src/tests/unittests/temp/test_ir_from_file.while"
+        with open(file_path, "w") as file:
+            file.write(code)
+
+        ast, symbol_table, constant_table = create_ir_from_file(file_path)
+        expected_ast, expected_symbol_table, expected_constant_table = create_cached_ir(code)
+
+        self.assertEqual(str(ast), str(expected_ast))
+        self.assertEqual(symbol_table, expected_symbol_table)
+        self.assertEqual(constant_table.get_full_table(), expected_constant_table.get_full_table())
+
+    def test_syntax_error(self):
+        code = """
+            While x1 > 0 Do
+                x1 = x1 - 1
+        """
+        with self.assertRaises(SyntaxError):
+            create_cached_ir(code)
+
+    def test_deep_nesting_without_recursion(self):
+        depth = 5000
+        code = "While x1 > 0 Do " * depth + "x1 = x1 - 1" + " End" * depth
+
+        recursion_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(1000)
+        try:
+            ast, symbol_table, constant_table = create_cached_ir(code)
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+
+        self.assertEqual(list(symbol_table), [1])
+        self.assertEqual(list(constant_table.get_full_table()), [0, 1])
+
+    def test_long_program(self):
+        code = ";\n".join(["x1 = x1 + 1"] * 5000) + ";\nx0 = x1 + 0"
+        args = {"n1": 0}
+
+        expected_result = 5000
+
+        result = compile_and_run(code, "test_long_program", args)
+
+        self.assertEqual(result, expected_result)
+
+    def test_symbol_ids(self):
+        code = "x3 = x1 + 1; While x1 > 0 Do x1 = x1 - 1 End; echo x5"
+
+        ast, symbol_table, constant_table = create_cached_ir(code)
+
+        self.assertEqual(ast.stmt.statements[0].target, 3)
+        self.assertEqual(list(symbol_table), [3, 1, 5])
+        self.assertEqual(symbol_table.max_id(), 5)
+        self.assertTrue(symbol_table.is_assigned(3))
+        self.assertFalse(symbol_table.is_used(3))
+        self.assertTrue(symbol_table.is_used(1))
+        self.assertTrue(symbol_table.is_used(5))
+        self.assertFalse(symbol_table.is_declared(2))
+        self.assertFalse(symbol_table.is_declared(100))
+
+        # the flags are kept per declared id, not for every id up to the highest
+        ast, symbol_table, constant_table = create_cached_ir("x4294967295 = x1 + 1")
+        self.assertEqual((symbol_table.max_id(), symbol_table.max_argument_id(), len(symbol_table.flags)), (4294967295, 4294967295, 2))
+        self.assertTrue(symbol_table.is_assigned(4294967295))
+        self.assertFalse(symbol_table.is_declared(4294967294))
+
+    def test_cached_ir_is_not_shared(self):
+        # the optimisers rewrite the tree and the tables in place, a second call must not see that
+        code = "x2 = x1 + 0; While x2 > 0 Do x2 = x2 - 1; x3 = x3 + 1 End"
+        ast, symbol_table, constant_table = create_cached_ir(code)
+        optimiser_manager(2).optimise(ast, symbol_table, constant_table)
+
+        fresh, fresh_symbol_table, fresh_constant_table = create_cached_ir(code)
+        self.assertIsNot(fresh, ast)
+        self.assertIsNot(fresh_symbol_table, symbol_table)
+        self.assertIsNot(fresh_constant_table, constant_table)
+        self.assertEqual(str(fresh), str(create_cached_ir(code)[0]))
+        self.assertEqual(len(fresh.stmt.statements), 2)
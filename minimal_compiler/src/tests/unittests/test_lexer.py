@@ -0,0 +1,73 @@
+import unittest
+from minimal_compiler.src.generator.template_loader import set_path_explicitly
+from minimal_compiler.src.parser.lexer import tokenize, tokenize_compact, iter_token_windows, TokenType
+from minimal_compiler.src.parser.parser import HandParser
+
+class TestLexer(unittest.TestCase):
+    def __init__(self, methodName = "runTest"):
+        super().__init__(methodName)
+
+        set_path_explicitly("./generator/templates/")
+
+    CODE = """
+        / comment
+        x2 = x2 + 100000000000000000000000;
+
+        While x1 > 0 Do
+            x0 = x0 + 1;
+            echo x0;
+            x1 = x1 - 1
+        End
+    """
+
+    def test_same_tokens_as_tokenize(self):
+        self.assertEqual(list(tokenize_compact(self.CODE)), tokenize(self.CODE))
+
+    def test_token_values(self):
+        stream = tokenize_compact(self.CODE)
+
+        variables = [stream.values[i] for i in range(len(stream)) if stream.types[i] == TokenType.VAR]
+        constants = [stream.constants[stream.values[i]] for i in range(len(stream)) if stream.types[i] == TokenType.CONST]
+
+        self.assertEqual(variables, [2, 2, 1, 0, 0, 0, 1, 1])
+        self.assertEqual(constants, [100000000000000000000000, 0, 1, 1])
+        self.assertEqual(stream.constants, [100000000000000000000000, 0, 1])
+        self.assertEqual(stream.types[-1], TokenType.EOF)
+
+    def test_hand_parser_consumes_stream(self):
+        tree = HandParser(tokenize_compact(self.CODE)).parse_prog()
+        expected_tree = HandParser(tokenize(self.CODE)).parse_prog()
+
+        self.assertEqual(tree.getText(), expected_tree.getText())
+
+    def test_token_windows(self):
+        expected_tokens = tokenize(self.CODE)
+
+        for window_size in [1, 3, 16, 1000]:
+            windows = list(iter_token_windows(self.CODE.encode(), window_size))
+            tokens = [token for window in windows for token in window]
+
+            self.assertEqual(tokens, expected_tokens)
+            self.assertIs(windows[0].constants, windows[-1].constants)
+
+    def test_unexpected_symbol(self):
+        code = "x1 = x1 + 1;\n  x2 = $"
+
+        with self.assertRaises(RuntimeError) as expected:
+            tokenize(code)
+        with self.assertRaises(RuntimeError) as compact:
+            tokenize_compact(code)
+
+        self.assertEqual(str(compact.exception), str(expected.exception))
+
+        with self.assertRaises(RuntimeError) as windowed:
+            list(iter_token_windows(code.encode(), 4))
+
+        self.assertEqual(str(windowed.exception), str(expected.exception))
+
+    def test_variable_index_out_of_range(self):
+        self.assertEqual(tokenize_compact("x4294967295 = x1 + 1").values[0], 4294967295)
+        with self.assertRaisesRegex(SyntaxError, "Variable index of x4294967296 at 0 is larger than 4294967295"):
+            tokenize_compact("x4294967296 = x1 + 1")
+        with self.assertRaises(SyntaxError):
+            list(iter_token_windows(b"x1 = x1 + 1;\n  x4294967296 = x1 + 1", 4))
@@ -0,0 +1,73 @@
+import unittest
+from minimal_compiler.src.generator.template_loader import set_path_explicitly
+from minimal_compiler.src.parser.create_parsetree import create_cached_ir
+from minimal_compiler.src.optimiser.ast import build_ast
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.base_optimiser import OptimiserManager
+from minimal_compiler.src.optimiser.optimisers.loop_invariants import LoopInvariantOptimiser
+from minimal_compiler.src.generator.generate_wasm import generate
+from util import run_wat
+from utils import config
+
+class TestLoopInvariants(unittest.TestCase):
+    def __init__(self, methodName = "runTest"):
+        super().__init__(methodName)
+
+        set_path_explicitly("./generator/templates/")
+
+    def setUp(self):
+        config.use_gmp = False
+
+    def optimise(self, code, ast):
+        _, symbol_table, constant_table = create_cached_ir(code)
+        expected = generate(ast, symbol_table, constant_table) # before the optimiser rewrites the tree
+        optimised_ast = OptimiserManager([LoopInvariantOptimiser()]).optimise(ast, symbol_table, constant_table)
+        return optimised_ast, expected, generate(optimised_ast, symbol_table, constant_table)
+
+    def assertSameResults(self, expected, wat, name):
+        for n1 in [0, 1, 4]:
+            self.assertEqual(run_wat(wat, name, {"n1": n1, "n2": 3}), run_wat(expected, name + "_expected", {"n1": n1, "n2": 3}))
+
+    def test_invariants(self):
+        code = """
+            while x1 > 0 do
+                x5 = x2 + 3; x4 = x5 + 1; x6 = x6 + 1; x7 = x2 + 1; x8 = x1 + 0; x9 = x2 + 0;
+                x1 = x1 - 1
+            end;
+            echo x7
+        """
+        ast = build_ast(code)
+        loop = ast.stmt.statements[0]
+        loop.body.statements[5] = AssignmentNodeTwoVar(9, 2, "/", 4, 1, 1)
+        loop.body.statements[6:6] = [
+            AssignmentNodeTwoVar(0, 0, "+", 4, 1, 1), AssignmentNodeTwoVar(0, 0, "+", 9, 1, 1), AssignmentNodeTwoVar(0, 0, "+", 8, 1, 1),
+        ]
+
+        ast, expected, wat = self.optimise(code, ast)
+
+        # x6 reads itself, x7 is read after the loop, x8 reads the counter, x9 is a division (x4 could be 0)
+        self.assertEqual(str(ast.stmt.statements[:2]), "[AssignmentNode(x5, x2, +, 3), AssignmentNode(x4, x5, +, 1)]")
+        self.assertEqual(len(ast.stmt.statements[2].body.statements), 8)
+        self.assertSameResults(expected, wat, "test_loop_invariants")
+
+    def test_nested_loops(self):
+        # x5 moves out of both loops, x2 is assigned twice in the outer loop and stays
+        code = """
+            while x1 > 0 do
+                x2 = x3 + 0;
+                while x2 > 0 do
+                    x5 = x3 + 2;
+                    x0 = x0 + 1;
+                    x2 = x2 - 1
+                end;
+                x1 = x1 - 1
+            end
+        """
+        ast = build_ast(code)
+        ast.stmt.body.statements[1].body.statements[1] = AssignmentNodeTwoVar(0, 0, "+", 5, 1, 1)
+
+        ast, expected, wat = self.optimise(code, ast)
+
+        self.assertEqual(str(ast.stmt.statements[0]), "AssignmentNode(x5, x3, +, 2)")
+        self.assertEqual(str(ast.stmt.statements[1].body.statements[0]), "AssignmentNode(x2, x3, +, 0)")
+        self.assertSameResults(expected, wat, "test_loop_invariants_nested")
@@ -0,0 +1,56 @@
+import unittest
+from minimal_compiler.src.generator.template_loader import set_path_explicitly
+from minimal_compiler.src.optimiser.ast import build_ast
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.base_optimiser import OptimiserManager
+from minimal_compiler.src.optimiser.parallel import ParallelOptimiser
+from minimal_compiler.src.optimiser.optimisers.structural_tree_pattern_matching import StructuralTreePatternMatchingOptimiser
+from minimal_compiler.src.optimiser.optimisers.induction_variables import InductionVariableOptimiser
+from minimal_compiler.src.optimiser.stats import OptimisationStats
+from utils import config
+
+class TestParallel(unittest.TestCase):
+    # a multiplication (a window of 5 statements), loops with and without matches in between
+    CODE = """
+        x1 = x1 + 1;
+        x4 = x1 + 0; x5 = x2 + 0; x6 = x5 + 0; x3 = x10 + 0;
+        while x4 > 0 do x4 = x4 - 1; while x5 > 0 do x5 = x5 - 1; x3 = x3 + 1 end; x5 = x6 + 0 end;
+        x0 = x3 + 0;
+        while x7 > 0 do x8 = x8 + 2; x7 = x7 - 1 end;
+        while x2 > 0 do x9 = x9 + 1; x2 = x2 - 1 end;
+        echo x9
+    """
+
+    def __init__(self, methodName = "runTest"):
+        super().__init__(methodName)
+
+        set_path_explicitly("./generator/templates/")
+
+    def setUp(self):
+        config.use_gmp = False
+
+    def optimise(self, optimiser, code):
+        stats = OptimisationStats()
+        ast = OptimiserManager([optimiser, InductionVariableOptimiser()], stats=stats).optimise(build_ast(code))
+        return str(ast), {pattern: counts[1] for pattern, counts in stats.patterns.items()}
+
+    def test_same_as_serial(self):
+        code = ";".join([self.CODE] * 6)
+        serial = self.optimise(StructuralTreePatternMatchingOptimiser(), code)
+        parallel = ParallelOptimiser(StructuralTreePatternMatchingOptimiser(), workers=2, chunk_statements=4)
+
+        self.assertGreater(len(parallel.chunks(build_ast(code).stmt.statements)), 2)
+        self.assertEqual(self.optimise(parallel, code), serial)
+        self.assertEqual(serial[1][("StructuralTreePatternMatchingOptimiser", "mul")], 6)
+        self.assertIn("AssignmentNodeTwoVar(x3, x1, *, x2, 1, 1)", serial[0])
+
+    def test_chunks(self):
+        statements = build_ast(";".join([self.CODE] * 6)).stmt.statements
+        optimiser = ParallelOptimiser(StructuralTreePatternMatchingOptimiser(), workers=2, chunk_statements=4)
+        chunks = optimiser.chunks(statements)
+
+        # the chunks are cut at split points only (never inside a multiplication)
+        self.assertEqual(sum(chunks, []), statements)
+        points = set(optimiser.split_points(statements))
+        self.assertTrue(all(sum(map(len, chunks[:k])) in points for k in range(1, len(chunks))))
+        self.assertEqual(ParallelOptimiser(StructuralTreePatternMatchingOptimiser(), workers=2).chunks(statements), [statements])
@@ -0,0 +1,111 @@
+import unittest
+from minimal_compiler.src.generator.template_loader import set_path_explicitly
+from minimal_compiler.src.optimiser.ast import build_ast
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.pattern_engine import PatternEngine, signature
+from minimal_compiler.src.optimiser.base_optimiser import OptimiserManager, DirtyRegions
+from minimal_compiler.src.optimiser.optimisers.structural_tree_pattern_matching import StructuralTreePatternMatchingOptimiser
+from util import compile_and_run
+from utils import config
+
+class ExposingOptimiser(StructuralTreePatternMatchingOptimiser):
+    # the first pattern turns the loop body into the body of the second pattern
+    PATTERNS = [
+        ("x1 = x1 + 1; x1 = x1 - 1", AssignmentNode(1, 1, "+", 0)),
+        ("while x1 > 0 do x2 = x2 + 0; x1 = x1 - 1 end", AssignmentNodeTwoVar(1, 1, "-", 1, 1, 1)),
+    ]
+
+def engine(*patterns):
+    return PatternEngine([(build_ast(pattern).stmt, replacement) for pattern, replacement in patterns])
+
+class TestPatternEngine(unittest.TestCase):
+    def __init__(self, methodName = "runTest"):
+        super().__init__(methodName)
+
+        set_path_explicitly("./generator/templates/")
+
+    def setUp(self):
+        config.use_gmp = False
+
+    def test_patterns_compiled_once(self):
+        engine = StructuralTreePatternMatchingOptimiser.engine()
+
+        self.assertIs(StructuralTreePatternMatchingOptimiser().engine(), engine)
+        self.assertTrue(engine.independent)
+        self.assertEqual(engine.window_size(), 10)
+        self.assertEqual(engine.patterns[5].signature, (WhileNode, 0, 2))
+        self.assertEqual(signature(AssignmentNode(1, 2, "+", 0)), (AssignmentNode, "+", 0))
+
+    def test_earlier_pattern_wins(self):
+        # the second pattern matches first in the sequence, but the first pattern is applied to the whole program before it
+        first = ("x1 = x1 + 1; x2 = x2 + 2", AssignmentNode(1, 2, "*", 2))
+        second = ("x3 = x3 + 5; x1 = x1 + 1", AssignmentNode(3, 1, "/", 1))
+        stmt = build_ast("x7 = x7 + 5; x8 = x8 + 1; x9 = x9 + 2; x7 = x7 + 5; x8 = x8 + 1").stmt
+
+        result = engine(first, second).rewrite(stmt)
+
+        self.assertEqual(
+            str(result.statements),
+            "[AssignmentNode(x7, x7, +, 5), AssignmentNode(x8, x9, *, 2), AssignmentNode(x7, x8, /, 1)]",
+        )
+
+    def test_dependent_patterns(self):
+        # the first pattern can match inside the loop of the second one, so each pattern needs its own pass
+        first = ("x1 = x1 - 1; x2 = x2 + 1", AssignmentNode(2, 1, "+", 0))
+        second = ("while x1 > 0 do x1 = x1 - 1; x2 = x2 + 1 end", AssignmentNode(2, 1, "-", 0))
+        stmt = build_ast("while x3 > 0 do x3 = x3 - 1; x4 = x4 + 1 end; echo x4").stmt
+
+        patterns = engine(first, second)
+        result = patterns.rewrite(stmt)
+
+        self.assertFalse(patterns.independent)
+        self.assertEqual(str(result.statements[0]), "WhileNode(ConditionNode(x3, 0), SequenceNode([AssignmentNode(x4, x3, +, 0)]))")
+
+    def test_replaced_program(self):
+        code = """
+            x4 = x1 + 0;
+            x5 = x1 + 0;
+            x6 = x5 + 0;
+            x0 = x3 + 0;
+            while x4 > 0 Do
+                x4 = x4 - 1;
+                while x5 > 0 Do
+                    x5 = x5 - 1;
+                    x0 = x0 + 1
+                end;
+                x5 = x6 + 0
+            end
+        """
+        ast = StructuralTreePatternMatchingOptimiser().optimise(build_ast(code))
+
+        self.assertIsInstance(ast.stmt.statements[0], AssignmentNodeTwoVar)
+        self.assertEqual(ast.stmt.statements[0].operator, "*")
+        self.assertFalse(any(isinstance(stmt, WhileNode) for stmt in ast.stmt.statements))
+        self.assertEqual(compile_and_run(code + "; echo x0", "test_pattern_engine", {"n1": 7}), 49)
+
+    def test_fixpoint(self):
+        depth = 200
+        code = "While x4 > 0 Do echo x4; " * depth + "while x3 > 0 do x3 = x3 + 1; x3 = x3 - 1; x3 = x3 - 1 end" + " End" * depth
+        manager = OptimiserManager([ExposingOptimiser()])
+
+        ast = manager.optimise(build_ast(code + "; while x5 > 0 do x5 = x5 - 1 end"))
+
+        self.assertEqual(manager.rounds, 3) # the second round rewrites the exposed loop, the third finds nothing
+        node = ast.stmt.statements[0]
+        for _ in range(depth):
+            node = node.body.statements[1]
+        self.assertEqual(str(node), "AssignmentNodeTwoVar(x3, x3, -, x3, 1, 1)")
+
+    def test_dirty_regions(self):
+        code = "while x4 > 0 do while x3 > 0 do x3 = x3 + 1; x3 = x3 - 1; x3 = x3 - 1 end end; while x5 > 0 do echo x5 end"
+        ast = build_ast(code)
+        outer, other = ast.stmt.statements
+
+        _, changes = ExposingOptimiser().optimise_round(ast, None)
+
+        # only the changed loop and its ancestors are revisited in the next round
+        self.assertTrue(changes.is_changed(DirtyRegions.ROOT))
+        self.assertTrue(changes.is_changed(outer))
+        self.assertTrue(changes.is_changed(outer.body))
+        self.assertFalse(changes.is_changed(other))
+        self.assertEqual(len(changes.new), 1)
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+from minimal_compiler.src.generator.template_loader import set_path_explicitly
+from minimal_compiler.src.optimiser.ast import build_ast
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser import pattern_library
+from minimal_compiler.src.optimiser.pattern_library import load_library, parse_statements, read_rules
+from minimal_compiler.src.optimiser.pipelines import optimiser_manager
+from minimal_compiler.src.optimiser.optimisers.structural_tree_pattern_matching import StructuralTreePatternMatchingOptimiser
+from minimal_compiler.src.parser.create_parsetree import create_cached_ir
+from minimal_compiler.src.generator.generate_wasm import generate
+from util import run_wat
+from utils import config
+
+class TestPatternLibrary(unittest.TestCase):
+    LIBRARY = """
+        # x2 = 2 * x1 as the code generator writes it (after the structural optimiser)
+        pattern double
+            x2 = x1 + 0;
+            x3 = x1 + 0;
+            x2 = x2 + x3;
+            x3 = x3 - x3
+        =>
+            x2 = x1 + x1;
+            x3 = x3 - x3
+    """
+
+    def __init__(self, methodName = "runTest"):
+        super().__init__(methodName)
+
+        set_path_explicitly("./generator/templates/")
+
+    def setUp(self):
+        config.use_gmp = False
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        pattern_library.set_cache_directory(None)
+        self.directory.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as file:
+            file.write(text)
+        return path
+
+    def test_parse_statements(self):
+        code = "x1 = x2 + 3; while x1 > 0 do x1 = x1 - 1 end; while x3 > 0 do x3 = x3 - 1; echo x4 end"
+        self.assertEqual(str(parse_statements(code)), str(build_ast(code).stmt))
+        self.assertEqual(str(parse_statements("x0 = x1 max x2; x3 = x3 - x3")),
+                         "SequenceNode([AssignmentNodeTwoVar(x0, x1, max, x2, 1, 1), AssignmentNodeTwoVar(x3, x3, -, x3, 1, 1)])")
+        with self.assertRaisesRegex(SyntaxError, "lib.patterns:4: expected a constant"):
+            load_library(self.write("lib.patterns", "pattern a\n  x1 = x1 + 1\n=>\n  x1 = x1 +\n"), build_ast)
+
+    def test_builtin_library(self):
+        engine = StructuralTreePatternMatchingOptimiser.engine()
+
+        self.assertEqual([pattern.name for pattern in engine.patterns][:5], ["div", "modulo", "left_shift", "right_shift", "mul"])
+        # x0 = x1 / x2 and 4 zeroings
+        self.assertEqual([kind for kind, _ in engine.patterns[0].builder], [AssignmentNodeTwoVar] * 5)
+        self.assertIn(engine.key[:16], StructuralTreePatternMatchingOptimiser().version())
+
+    def test_cache(self):
+        path = self.write("idioms.patterns", self.LIBRARY)
+        pattern_library.set_cache_directory(os.path.join(self.directory.name, "cache"))
+
+        engine = load_library(path, parse_statements)
+        self.assertEqual(os.listdir(os.path.join(self.directory.name, "cache")), [engine.key + ".pat"])
+        cached = load_library(path, parse_statements)
+        self.assertIsNot(cached, engine)
+        self.assertEqual(cached.key, engine.key)
+        self.assertEqual(cached.patterns[0].builder, engine.patterns[0].builder)
+
+        # another file or another parser is another entry
+        self.assertNotEqual(load_library(self.write("idioms.patterns", self.LIBRARY + "\n"), parse_statements).key, engine.key)
+        self.assertNotEqual(load_library(path, parse_statements, "other").key, engine.key)
+
+    def test_library_optimiser(self):
+        code = "x2 = x1 + 0; x3 = x1 + 0; while x3 > 0 do x2 = x2 + 1; x3 = x3 - 1 end; x0 = x2 + 0"
+        ast, symbol_table, constant_table = create_cached_ir(code)
+        expected = generate(ast, symbol_table, constant_table)
+        manager = optimiser_manager(1, libraries=[self.write("idioms.patterns", self.LIBRARY)])
+
+        self.assertEqual(type(manager.optimisers[1]).__name__, "PatternLibraryOptimiser")
+        ast = manager.optimise(create_cached_ir(code)[0], symbol_table, constant_table)
+        self.assertEqual(str(ast.stmt.statements[0]), "AssignmentNodeTwoVar(x2, x1, +, x1, 1, 1)")
+        for n1 in [0, 4]:
+            inputs = {"n1": n1, "n2": 0}
+            self.assertEqual(run_wat(generate(ast, symbol_table, constant_table), "test_library", inputs), run_wat(expected, "test_library_expected", inputs))
+
+    def test_library_constants(self):
+        # the replacement uses a constant the program does not have
+        path = self.write("fold.patterns", "pattern fold\n  x1 = x1 + 3; x1 = x1 + 4\n=>\n  x1 = x1 + 7\n")
+        code = "x1 = x1 + 3; x1 = x1 + 4; x0 = x1 + 0"
+        for level in [1, 2]:
+            ast, symbol_table, constant_table = create_cached_ir(code)
+            manager = optimiser_manager(level, libraries=[path])
+            ast = manager.optimise(ast, symbol_table, constant_table)
+            self.assertEqual(next(pattern.hits for pattern in manager.optimisers[1].patterns()), 1)
+            self.assertIn(7, constant_table.get_full_table())
+            self.assertEqual(run_wat(generate(ast, symbol_table, constant_table), f"test_library_constants_O{level}", {"n1": 2}), 9)
+
+    def test_builtin_rules_run_like_templates(self):
+        path = StructuralTreePatternMatchingOptimiser.PATTERN_FILE
+        patterns = {name: pattern for name, pattern, _, _, _, _ in read_rules(path, open(path).read())}
+        # the quotient is 0 for x1 < x2, the temporaries of right_shift hold the lowest shifted-out bit
+        # (the library gives 0 if they alias their operands)
+        cases = [
+            ("div", "x0", [{"n1": 2, "n2": 5}, {"n1": 5, "n2": 5}, {"n1": 17, "n2": 5}, {"n1": 0, "n2": 3}]),
+            ("right_shift", "x7", [{"n2": 1, "n4": 5}, {"n2": 2, "n4": 6}, {"n2": 0, "n4": 5}]),
+        ]
+        for name, output, inputs in cases:
+            code = patterns[name] + f"; x0 = {output} + 0"
+            expected = generate(*create_cached_ir(code))
+            for level in [1, 2]:
+                ast, symbol_table, constant_table = create_cached_ir(code)
+                ast = optimiser_manager(level).optimise(ast, symbol_table, constant_table)
+                wat = generate(ast, symbol_table, constant_table)
+                for values in inputs:
+                    result = run_wat(wat, f"test_{name}_O{level}", values)
+                    self.assertEqual(result, run_wat(expected, f"test_{name}", values), (level, values))
+                    if name == "div":
+                        self.assertEqual(result, values["n1"] // values["n2"], values)
@@ -0,0 +1,56 @@
+import unittest
+from minimal_compiler.src.optimiser.ast import build_ast
+from minimal_compiler.src.optimiser.pattern_library import format_statements, parse_statements, read_rules
+from minimal_compiler.src.optimiser.pattern_miner import PatternMiner, candidate_rules, canonical
+from minimal_compiler.src.optimiser.stats import LOOP_ITERATIONS
+
+class TestPatternMiner(unittest.TestCase):
+    # the same loop with other variables three times, once inside another loop
+    CODE = """
+        x3 = x1 + 0;
+        while x3 > 0 do x3 = x3 - 1; x4 = x4 + 2 end;
+        x5 = x2 + 0;
+        while x5 > 0 do x5 = x5 - 1; x6 = x6 + 2 end;
+        while x7 > 0 do
+            x8 = x1 + 0;
+            while x8 > 0 do x8 = x8 - 1; x9 = x9 + 2 end;
+            x7 = x7 - 1
+        end
+    """
+
+    def test_format_statements(self):
+        code = "x1 = x2 + 3; while x1 > 0 do x1 = x1 - 1; while x3 > 0 do x3 = x3 * x4; echo x4 end end"
+        text = format_statements(parse_statements(code), "  ", {1: 7})
+        self.assertEqual(text.splitlines()[:3], ["  x7 = x2 + 3;", "  while x7 > 0 do", "      x7 = x7 - 1;"])
+        self.assertEqual(str(parse_statements(text)), str(parse_statements(code.replace("x1", "x7"))))
+
+    def test_canonical(self):
+        statements = build_ast(self.CODE).stmt.statements
+        self.assertEqual(canonical(statements[0:2]), canonical(statements[2:4]))
+        self.assertEqual(canonical(statements[1:2]), "    while x0 > 0 do\n        x0 = x0 - 1;\n        x1 = x1 + 2\n    end")
+
+    def test_ranked(self):
+        miner = PatternMiner()
+        miner.add(build_ast(self.CODE), "a.while")
+        miner.add(build_ast("while x1 > 0 do x1 = x1 - 1; x2 = x2 + 2 end"), "b.while")
+
+        best = miner.ranked()[0]
+        self.assertEqual(best.text, canonical(build_ast(self.CODE).stmt.statements[1:2]))
+        self.assertEqual((best.count, best.files), (4, {"a.while": 3, "b.while": 1}))
+        self.assertEqual(best.score, best.calls * (3 + LOOP_ITERATIONS))
+        # the copy before the loop only occurs with it (twice at the top, once in the loop): only the window of both is left
+        texts = [candidate.text for candidate in miner.ranked()]
+        self.assertIn(canonical(build_ast(self.CODE).stmt.statements[0:2]), texts)
+        self.assertEqual(len(texts), 2)
+        self.assertGreater(len(miner.ranked(closed=False)), 2)
+
+    def test_candidate_rules(self):
+        miner = PatternMiner()
+        miner.add(build_ast(self.CODE), "a.while")
+        rules = candidate_rules(miner.ranked(), miner.files)
+
+        with self.assertRaisesRegex(SyntaxError, "pattern candidate_1 needs a pattern and a replacement"):
+            read_rules("mined.patterns", rules)
+        name, pattern, *_ = read_rules("mined.patterns", rules.replace("# replacement", "x0 = x0 + 0"))[0]
+        self.assertEqual(name, "candidate_1")
+        self.assertEqual(format_statements(parse_statements(pattern), "    "), miner.ranked()[0].text)
@@ -0,0 +1,67 @@
+import unittest
+from minimal_compiler.src.generator.template_loader import set_path_explicitly
+from minimal_compiler.src.parser.create_parsetree import create_cached_ir
+from minimal_compiler.src.optimiser.ast import build_ast
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.pipelines import PIPELINES, optimiser_manager
+from minimal_compiler.src.optimiser.stats import OptimisationStats, estimated_calls
+from minimal_compiler.src.generator.generate_wasm import generate
+from util import run_wat
+from utils import config
+
+class TestPipelines(unittest.TestCase):
+    CODE = """
+        x3 = x1 + 0; x4 = x2 + 0;
+        while x4 > 0 do x3 = x3 + 1; x4 = x4 - 1 end;
+        x5 = x3 + 2; x5 = x5 + 3;
+        x0 = x5 + 0
+    """
+
+    def __init__(self, methodName = "runTest"):
+        super().__init__(methodName)
+
+        set_path_explicitly("./generator/templates/")
+
+    def setUp(self):
+        config.use_gmp = False
+
+    def ir(self):
+        return create_cached_ir(self.CODE)
+
+    def test_levels(self):
+        self.assertEqual(optimiser_manager(0).version(), "")
+        self.assertEqual([type(optimiser).__name__ for optimiser in optimiser_manager(1).optimisers],
+                         ["StructuralTreePatternMatchingOptimiser", "ComparisonOptimiser", "InductionVariableOptimiser"])
+        self.assertNotIn("SSAOptimiser", optimiser_manager(2).version())
+        self.assertEqual(optimiser_manager(2, use_ssa=True).version(), optimiser_manager(3).version())
+        self.assertRaises(ValueError, optimiser_manager, 4)
+
+        expected = generate(*create_cached_ir(self.CODE))
+        for level in PIPELINES:
+            ast, symbol_table, constant_table = self.ir()
+            wat = generate(optimiser_manager(level).optimise(ast, symbol_table, constant_table), symbol_table, constant_table)
+            for n1, n2 in [(0, 0), (4, 3)]:
+                inputs = {"n1": n1, "n2": n2}
+                self.assertEqual(run_wat(wat, f"test_level_{level}", inputs), run_wat(expected, "test_levels_expected", inputs))
+
+    def test_stats(self):
+        self.assertEqual(estimated_calls(build_ast("x1 = x1 + 1; while x1 > 0 do x1 = x1 - 1 end")), 1 + 11 + 10)
+
+        stats = OptimisationStats()
+        ast, symbol_table, constant_table = self.ir()
+        before = estimated_calls(ast)
+        ast = optimiser_manager(2, stats=stats).optimise(ast, symbol_table, constant_table)
+
+        # the loop becomes x3 = x3 + x4 (and x4 = 0) and the additions to x5 are merged
+        self.assertEqual(stats.calls_before, before)
+        self.assertEqual(stats.calls_after, estimated_calls(ast))
+        self.assertEqual(stats.calls_before - stats.calls_after, sum(passes.calls_removed for passes in stats.passes.values()))
+        self.assertGreater(stats.passes["StructuralTreePatternMatchingOptimiser"].calls_removed, 0)
+        self.assertGreater(stats.passes["ArithmeticChainOptimiser"].calls_removed, 0)
+        self.assertEqual(stats.passes["BranchOptimiser"].rounds, 1)
+
+        attempts, hits = stats.patterns[("StructuralTreePatternMatchingOptimiser", "add_loop_swapped")]
+        self.assertEqual(hits, 1)
+        self.assertGreaterEqual(attempts, hits)
+        self.assertEqual(stats.patterns[("StructuralTreePatternMatchingOptimiser", "mul")][1], 0)
+        self.assertIn("StructuralTreePatternMatchingOptimiser/add_loop_swapped", stats.report())
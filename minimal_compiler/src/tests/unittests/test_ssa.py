@@ -0,0 +1,82 @@
+import unittest
+from minimal_compiler.src.generator.template_loader import set_path_explicitly
+from minimal_compiler.src.parser.create_parsetree import create_cached_ir
+from minimal_compiler.src.optimiser.ast import build_ast
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.base_optimiser import OptimiserManager
+from minimal_compiler.src.optimiser.ssa import SSAForm, ConstantPropagation, value_numbers, PHI, BOTTOM
+from minimal_compiler.src.optimiser.optimisers.ssa_optimiser import SSAOptimiser
+from minimal_compiler.src.optimiser.optimisers.dead_stores import DeadStoreOptimiser
+from minimal_compiler.src.generator.generate_wasm import generate
+from util import run_wat
+from utils import config
+
+class TestSSA(unittest.TestCase):
+    def __init__(self, methodName = "runTest"):
+        super().__init__(methodName)
+
+        set_path_explicitly("./generator/templates/")
+
+    def setUp(self):
+        config.use_gmp = False
+
+    def test_ssa_form(self):
+        ast = build_ast("x2 = x1 + 1; while x1 > 0 do x2 = x2 + 3; x1 = x1 - 1 end; x0 = x2 + 0")
+        ssa = SSAForm(ast)
+
+        header = ssa.headers[id(ast.stmt.statements[1])]
+        self.assertEqual(sorted(header.phis), [1, 2])
+        self.assertEqual(header.successors, [header.body, header.exit])
+        self.assertEqual(header.predecessors, [ssa.entry, header.body]) # the body is the last block of the loop
+        self.assertIs(header.condition, header.phis[1])
+
+        phi = header.phis[2]
+        self.assertEqual(phi.kind, PHI)
+        self.assertIs(phi.operands[0], ssa.definitions[id(ast.stmt.statements[0])])
+        self.assertIs(phi.operands[1], ssa.definitions[id(ast.stmt.statements[1].body.statements[0])])
+        self.assertIs(ssa.definitions[id(ast.stmt.statements[2])].operands[0], phi) # read after the loop
+
+    def test_constant_propagation(self):
+        code = """
+            x3 = x0 + 5;
+            while x1 > 0 do x3 = x0 + 5; x4 = x4 + 1; x1 = x1 - 1 end;
+            while x0 > 0 do x2 = x2 + 1 end;
+            x5 = x3 + 1
+        """
+        ast = build_ast(code)
+        ssa = SSAForm(ast)
+        propagation = ConstantPropagation(ssa)
+
+        # x3 is 5 on both edges into the header, so also after the loop, the loop on x0 is never entered
+        self.assertEqual(propagation.lattice[ssa.definitions[id(ast.stmt.statements[3])].id], 6)
+        self.assertEqual(propagation.lattice[ssa.headers[id(ast.stmt.statements[1])].phis[4].id], BOTTOM)
+        self.assertNotIn(ssa.headers[id(ast.stmt.statements[2])].body.id, propagation.reached)
+
+        numbers = value_numbers(ssa, propagation)
+        first, second = (ssa.definitions[id(stmt)] for stmt in (ast.stmt.statements[0], ast.stmt.statements[1].body.statements[0]))
+        self.assertEqual(numbers[first.id], numbers[second.id])
+
+    def test_optimiser(self):
+        code = "x3 = x1 + 0; x4 = x1 + 0; x5 = x2 + 0; x6 = x4 + 0; x7 = x7 + 0; while x5 > 0 do x5 = x5 - 1; x0 = x0 + 1 end"
+        ast = build_ast(code)
+        statements = ast.stmt.statements
+        statements[0] = AssignmentNodeTwoVar(3, 1, "*", 2, 1, 1)
+        statements[1] = AssignmentNodeTwoVar(4, 1, "+", 0, 1, 1) # x0 is 0: x4 = x1 + 0
+        statements[3] = AssignmentNodeTwoVar(6, 2, "*", 4, 1, 1) # x2 * x4 is x1 * x2
+        statements[4] = AssignmentNodeTwoVar(7, 5, "-", 6, 1, 1)
+        statements[5].body.statements[1] = AssignmentNodeTwoVar(0, 0, "+", 7, 1, 1)
+
+        _, symbol_table, constant_table = create_cached_ir(code)
+        expected = generate(ast, symbol_table, constant_table)
+        optimiser_manager = OptimiserManager([SSAOptimiser(), DeadStoreOptimiser()])
+        optimised = optimiser_manager.optimise(ast, symbol_table, constant_table)
+        wat = generate(optimised, symbol_table, constant_table)
+
+        self.assertEqual([str(stmt) for stmt in optimised.stmt.statements[:3]], [
+            "AssignmentNodeTwoVar(x3, x1, *, x2, 1, 1)", # x4 and x5 are copies of x1 and x2, x6 of x3
+            "AssignmentNode(x5, x2, +, 0)",
+            "AssignmentNodeTwoVar(x7, x2, -, x3, 1, 1)",
+        ])
+        for n1, n2 in [(0, 3), (1, 3), (2, 9)]:
+            inputs = {"n1": n1, "n2": n2}
+            self.assertEqual(run_wat(wat, "test_ssa", inputs), run_wat(expected, "test_ssa_expected", inputs))
@@ -1,3 +1,4 @@
+import sys
 import unittest
 from minimal_compiler.src.generator.template_loader import set_path_explicitly
 from util import compile_and_run
@@ -52,4 +53,20 @@ class TestWhile(unittest.TestCase):
 
         result = compile_and_run(code, "test_nested_while", args)
 
-        self.assertEqual(result, expected_result)
\ No newline at end of file
+        self.assertEqual(result, expected_result)
+
+    def test_deeply_nested_while_without_recursion(self):
+        depth = 2000
+        code = "While x1 > 0 Do " * depth + "x1 = x1 - 1; x0 = x0 + 1" + " End" * depth
+        args = {"n1": 3}
+
+        expected_result = 3
+
+        recursion_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(1000)
+        try:
+            result = compile_and_run(code, "test_deeply_nested_while_without_recursion", args)
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+
+        self.assertEqual(result, expected_result)
@@ -0,0 +1,72 @@
+import unittest
+from minimal_compiler.src.generator.template_loader import set_path_explicitly
+from minimal_compiler.src.parser.create_parsetree import create_cached_ir
+from minimal_compiler.src.optimiser.ast import build_ast
+from minimal_compiler.src.optimiser.ir_classes import *
+from minimal_compiler.src.optimiser.flat_ir import FlatIR
+from minimal_compiler.src.optimiser.zero_analysis import ZeroAnalysis
+from minimal_compiler.src.generator.generate_wasm import generate
+from util import run_wat
+from utils import config
+
+class TestZeroAnalysis(unittest.TestCase):
+    def __init__(self, methodName = "runTest"):
+        super().__init__(methodName)
+
+        set_path_explicitly("./generator/templates/")
+
+    def setUp(self):
+        config.use_gmp = False
+
+    def analyse(self, ast):
+        # (indices of the redundant zeroings, condition variables of the never entered and the entered loops)
+        flat = FlatIR.from_tree(ast)
+        analysis = ZeroAnalysis(flat)
+        counters = lambda indices: [flat.target[index] for index in sorted(indices)]
+        return sorted(analysis.redundant_zeroing), counters(analysis.never_entered), counters(analysis.entered)
+
+    def test_loops(self):
+        code = """
+            x2 = x1 + 1;
+            while x2 > 0 do x2 = x2 - 1 end;
+            while x2 > 0 do echo x2 end;
+            while x0 > 0 do echo x0 end;
+            x3 = x2 + 0;
+            while x3 > 0 do echo x3 end;
+            x5 = x3 + 4;
+            while x5 > 0 do x5 = x5 - 1; x6 = x6 + 1 end
+        """
+        redundant, never_entered, entered = self.analyse(build_ast(code))
+
+        # x2 is 0 after its loop, x1 + 1 and x3 + 4 are non-zero whatever x1 and x3 are
+        self.assertEqual(never_entered, [2, 0, 3])
+        self.assertEqual(entered, [2, 5])
+        self.assertEqual(redundant, [])
+
+    def test_redundant_zeroing(self):
+        ast = build_ast("while x1 > 0 do x2 = x2 + 1 end; echo x2")
+        ast.stmt.statements[1:1] = [AssignmentNodeTwoVar(1, 1, "-", 1, 1, 1), AssignmentNodeTwoVar(2, 2, "-", 2, 1, 1), AssignmentNodeTwoVar(2, 2, "-", 2, 1, 1)]
+
+        redundant, _, _ = self.analyse(ast)
+
+        # x1 is 0 after its loop, x2 after the first zeroing (nodes: sequence, while, x2 + 1, the three zeroings, echo)
+        self.assertEqual(redundant, [3, 5])
+
+    def test_loop_body(self):
+        # in the body only the counter is known (non-zero), the variables assigned in the loop are unknown
+        code = "x2 = x2 + 1; while x1 > 0 do while x1 > 0 do x1 = x1 - 1 end; while x2 > 0 do x2 = x2 - 1 end; x2 = x2 + 1 end"
+        _, never_entered, entered = self.analyse(build_ast(code))
+
+        self.assertEqual(entered, [1]) # the inner loop on x1, not the one on x2
+        self.assertEqual(never_entered, [])
+
+    def test_generated_code(self):
+        code = "x2 = x1 + 1; while x2 > 0 do x0 = x0 + 1; x2 = x2 - 1 end; while x2 > 0 do x0 = x0 + 5 end"
+        ast, symbol_table, constant_table = create_cached_ir(code)
+
+        wat = generate(ast, symbol_table, constant_table)
+
+        self.assertEqual(wat.count("(call $is_gt"), 1) # checked at the end of the first loop only
+        self.assertIn(";; x2 > 0 on entry", wat)
+        self.assertIn(";; Loop skipped: x2 is 0", wat)
+        self.assertEqual(run_wat(wat, "test_zero_analysis", {"n1": 4}), 5)
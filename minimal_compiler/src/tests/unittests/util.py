@@ -1,8 +1,7 @@
 import sys
 import os
-from minimal_compiler.src.parser.create_parsetree import create_cached_parsetree
+from minimal_compiler.src.parser.create_parsetree import create_cached_ir
 from minimal_compiler.src.generator.generate_wasm import generate
-from minimal_compiler.src.optimiser.ast import ASTBuilder
 from minimal_compiler.src.optimiser.base_optimiser import OptimiserManager
 from minimal_compiler.src.optimiser.optimisers.structural_tree_pattern_matching import (
     StructuralTreePatternMatchingOptimiser,
@@ -21,6 +20,24 @@ def compile_and_run(code: str, name: str, args: dict = None) -> int:
     # while to wat
     main(code, "./minimal_compiler/src/tests/unittests/temp/" + name + ".while")
 
+    return run_compiled(name, args)
+
+
+def run_wat(wat: str, name: str, args: dict = None) -> int:
+    # Force unit tests to use the original bigint library instead of GMP
+    config.use_gmp = False
+
+    # create temp folder if not exists
+    if not os.path.exists("./minimal_compiler/src/tests/unittests/temp/"):
+        os.makedirs("./minimal_compiler/src/tests/unittests/temp/")
+
+    with open("./minimal_compiler/src/tests/unittests/temp/" + name + ".wat", "w") as file:
+        file.write(wat)
+
+    return run_compiled(name, args)
+
+
+def run_compiled(name: str, args: dict = None) -> int:
     # wat to wasm
     import subprocess
 
@@ -33,18 +50,15 @@ def compile_and_run(code: str, name: str, args: dict = None) -> int:
         ]
     )
 
-    # wasm to result via node
-    args_string = ""
-    if args is not None:
-        for key, value in args.items():
-            args_string += f"{key}={value} "
+    # wasm to result via node (one argument n<i>=<value> per input)
+    args_list = [f"{key}={value}" for key, value in args.items()] if args is not None else []
 
     result = subprocess.run(
         [
             "node",
             "./wasm_runner/wasm_runner.js",
             "./minimal_compiler/src/tests/unittests/temp/" + name + ".wasm",
-            args_string,
+            *args_list,
         ],
         capture_output=True,
     ).stdout.decode("utf-8")
@@ -72,13 +86,7 @@ def main(input_data=None, file_path=None):
             with open(file_path, "r") as file:
                 code = file.read()
 
-            tree, symbol_table, constant_table = create_cached_parsetree(code)
-
-            # optimise the tree
-            ast_builder = (
-                ASTBuilder()
-            )  # Using a custom ast as an intermediate representation
-            ast = ast_builder.visit(tree)
+            ast, symbol_table, constant_table = create_cached_ir(code)
 
             optimiser_manager = OptimiserManager(
                 # TODO: Evtl. add rerun or reordering optimiser
@@ -99,13 +107,7 @@ def main(input_data=None, file_path=None):
     else:
         try:
             code = input_data
-            tree, symbol_table, constant_table = create_cached_parsetree(code)
-
-            # optimise the tree
-            ast_builder = (
-                ASTBuilder()
-            )  # Using a custom ast as an intermediate representation
-            ast = ast_builder.visit(tree)
+            ast, symbol_table, constant_table = create_cached_ir(code)
 
             optimiser_manager = OptimiserManager(
                 # TODO: Evtl. add rerun or reordering optimiser
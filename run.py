@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
+import os
 import sys
 from colorama import Fore, Back, Style, init
 from utils.utils import to_absolute_path
-from utils.minimal_compiler import minimal_compiler
+from utils.minimal_compiler import minimal_compiler, minimal_compiler_watch
 from utils.wasm_tools import (
     print_wasm_as_hex,
     hex_to_wasm_bytes,
@@ -34,6 +35,8 @@ def main():
     for arg in sys.argv[1:]:
         if arg.startswith("--"):
             flags.append(arg[2:])
+        elif arg in ("-O0", "-O1", "-O2", "-O3"):
+            flags.append(arg[1:])
         elif arg.endswith(".ewhile") or arg.endswith(".while"):
             filepath = arg
         elif arg.endswith(".wasm"):
@@ -54,7 +57,7 @@ def main():
             config.is_self_lexer = True
 
         if "no-optimisation" in flags:
-            config.no_optimisation = True
+            config.optimisation_level = 0
 
         if "no-gmp" in flags:
             config.use_gmp = False
@@ -62,6 +65,30 @@ def main():
         if "no-execution" in flags:
             config.no_execution = True
 
+        if "no-ir-cache" in flags:
+            config.use_ir_cache = False
+
+        if "ssa" in flags:
+            config.use_ssa = True
+
+        if "opt-stats" in flags:
+            config.opt_stats = True
+
+        if "cost-report" in flags:
+            config.cost_report = True
+
+        for flag in flags:
+            if flag.startswith("max-argument="):
+                config.max_argument_id = int(flag.split("=", 1)[1])
+            elif flag in ("O0", "O1", "O2", "O3"):
+                config.optimisation_level = int(flag[1])
+            elif flag == "parallel":
+                config.optimisation_workers = os.cpu_count()
+            elif flag.startswith("parallel="):
+                config.optimisation_workers = int(flag.split("=", 1)[1])
+            elif flag.startswith("patterns="):
+                config.pattern_libraries.append(to_absolute_path(flag.split("=", 1)[1]))
+
         output = ""
 
         if prebuilt_compiler:
@@ -70,6 +97,8 @@ def main():
             output = self_compiler(filepath, inputs)
         elif "lexer" in flags:
             output = self_lexer_debug(filepath, inputs)
+        elif "watch" in flags:
+            output = minimal_compiler_watch(filepath, inputs)
         else:
             output = minimal_compiler(filepath, inputs)
 
@@ -14,11 +14,13 @@ Options:
     -i: Run integration tests (both compilers)
     -im: Run integration tests (minimal compiler only)
     -is: Run integration tests (self compiler only)
+    -p: Check the rewrite rules of the optimiser (and of the given .patterns files)
 """
 
 import sys
 from tests.unit_tests import run_unittests
 from tests.integration_tests import run_integration_tests
+from tests.pattern_checks import run_pattern_checks
 from utils import config
 
 # Set higher recursion limit for the self compiler
@@ -48,3 +50,6 @@ if __name__ == "__main__":
         run_integration_tests("minimal")
     elif "-is" in args:
         run_integration_tests("self")
+    elif "-p" in args:
+        if not run_pattern_checks([arg for arg in args if arg.endswith(".patterns")]):
+            sys.exit(1)
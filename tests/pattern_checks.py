@@ -0,0 +1,40 @@
+import sys
+import time
+from minimal_compiler.src.optimiser.equivalence import check_library
+from minimal_compiler.src.optimiser.optimisers.structural_tree_pattern_matching import StructuralTreePatternMatchingOptimiser
+from minimal_compiler.src.optimiser.optimisers.comparisons import ComparisonOptimiser
+
+
+def run_pattern_checks(paths):
+    """
+    Check the rewrite rules of the built-in pattern libraries and of the given ones.
+
+    Every pattern and its replacement run on thousands of random inputs (see
+    minimal_compiler/src/optimiser/equivalence.py), the variables they leave have to be equal.
+    The given libraries are parsed like the ones of the --patterns flag.
+
+    Args:
+        paths (list): Paths of additional pattern library files
+
+    Returns:
+        bool: True if no counterexample was found
+    """
+    libraries = [
+        (StructuralTreePatternMatchingOptimiser.PATTERN_FILE, StructuralTreePatternMatchingOptimiser.parse_pattern),
+        (ComparisonOptimiser.PATTERN_FILE, ComparisonOptimiser.parse_pattern),
+    ]
+    libraries += [(path, None) for path in paths]
+
+    failed = 0
+    for path, parse_pattern in libraries:
+        print(f"Checking the rewrite rules of {path}")
+        sys.stdout.flush()
+        start = time.perf_counter()
+        results = check_library(path, parse_pattern) if parse_pattern else check_library(path)
+        for result in results:
+            print(f"  {result}")
+        failed += sum(result.counterexample is not None for result in results)
+        print(f"  {len(results)} rules in {time.perf_counter() - start:.2f}s")
+
+    print(f"{failed} rules with counterexamples" if failed else "No counterexamples")
+    return failed == 0
@@ -98,6 +98,36 @@ class TestPrograms(unittest.TestCase):
         self.assertEqual(result3, expected_result3, f"Test case with {args3} failed, expected {expected_result3}, got {result3}")
         self.assertEqual(result4, expected_result4, f"Test case with {args4} failed, expected {expected_result4}, got {result4}")
 
+    def test_division_smaller_dividend(self):
+        code = """
+            let valOne, valTwo, valThree;
+            valTwo = x1;
+            valThree = 16;
+            valOne = valTwo / valThree;
+            x0 = valOne
+        """
+        args1 = {"n1": 5}
+        args2 = {"n1": 15}
+        args3 = {"n1": 16}
+        args4 = {"n1": 0}
+
+        expected_result1 = 0
+        expected_result2 = 0
+        expected_result3 = 1
+        expected_result4 = 0
+
+        results = compile_and_run(code, "test_division_smaller_dividend", [args1, args2, args3, args4])
+        
+        result1 = results[0]
+        result2 = results[1]
+        result3 = results[2]
+        result4 = results[3]
+
+        self.assertEqual(result1, expected_result1, f"Test case with {args1} failed, expected {expected_result1}, got {result1}")
+        self.assertEqual(result2, expected_result2, f"Test case with {args2} failed, expected {expected_result2}, got {result2}")
+        self.assertEqual(result3, expected_result3, f"Test case with {args3} failed, expected {expected_result3}, got {result3}")
+        self.assertEqual(result4, expected_result4, f"Test case with {args4} failed, expected {expected_result4}, got {result4}")
+
     def test_multiplication(self):
         code = """
             let valOne, valTwo, valThree;
@@ -5,9 +5,16 @@
 is_capture_output = True
 is_full_hex = False
 is_self_lexer = False
-no_optimisation = False
+optimisation_level = 2  # -O0 to -O3, selects the pass pipeline (see minimal_compiler/src/optimiser/pipelines.py)
 no_execution = False
+use_ir_cache = True
 use_gmp = True
+max_argument_id = None  # highest xi a program is called with (None: any); higher variables start as 0 when optimising
+use_ssa = False  # also optimise the program in SSA form (global value numbering, sparse conditional constant propagation)
+opt_stats = False  # print the statistics of the optimisation passes and patterns
+cost_report = False  # print the estimated costs of the optimised program (see minimal_compiler/src/optimiser/cost_model.py)
+optimisation_workers = None  # processes for the parallel optimisation of large programs (None: serial)
+pattern_libraries = []  # pattern library files with additional rewrite rules (see minimal_compiler/src/optimiser/pattern_library.py)
 print_self_compiler_to_file = True
 self_compiler_output_file_txt = "/out/self_compiler_output.txt"
 self_compiler_output_file_hex = "/out/self_compiler_output_hex.txt"
@@ -1,15 +1,21 @@
 import sys
 import os
+import time
 from colorama import Fore, Back, Style
 from utils.wasm_runner import run_wasm
 from transpiler.transpile import generate_while
-from minimal_compiler.src.parser.create_parsetree import create_cached_parsetree
+from minimal_compiler.src.parser.create_parsetree import create_ir_from_file
 from minimal_compiler.src.generator.generate_wasm import generate
-from minimal_compiler.src.optimiser.ast import ASTBuilder
 from minimal_compiler.src.optimiser.base_optimiser import OptimiserManager
 from minimal_compiler.src.optimiser.optimisers.structural_tree_pattern_matching import (
     StructuralTreePatternMatchingOptimiser,
 )
+from minimal_compiler.src.optimiser.optimisers.induction_variables import InductionVariableOptimiser
+from minimal_compiler.src.optimiser import pipelines, pattern_library
+from minimal_compiler.src.optimiser.stats import OptimisationStats
+from minimal_compiler.src.optimiser.cost_model import cost_report
+from minimal_compiler.src.incremental.incremental_compiler import IncrementalCompiler
+from minimal_compiler.src.cache.ir_cache import IRCache
 from utils import config
 
 
@@ -103,8 +109,10 @@ def compile_to_wasm(filepath):
 def generate_wat(filepath):
     """Generate a WebAssembly Text (WAT) file from a WHILE file.
 
-    Parses the WHILE file, builds an abstract syntax tree, optionally applies optimizations,
-    and generates a WAT file from the processed tree.
+    Parses the WHILE file directly into an abstract syntax tree, optionally applies optimizations,
+    and generates a WAT file from the processed tree. The optimised tree is stored in the IR cache
+    (unless config.use_ir_cache is False), so recompiling an unchanged file skips lexing, parsing
+    and optimisation.
 
     Args:
         filepath (str): Path to the WHILE file
@@ -112,35 +120,62 @@ def generate_wat(filepath):
     Returns:
         str: Path to the generated WAT file
     """
-    # Clear the parse tree cache to ensure a fresh compilation process
-    create_cached_parsetree.cache_clear()
-
-    with open(filepath, "r") as file:
-        code = file.read()
-    tree, symbol_table, constant_table = create_cached_parsetree(code)
-
-    # optimise the tree
-    ast_builder = ASTBuilder()  # Using a custom ast as an intermediate representation
-    ast = ast_builder.visit(tree)
-
-    # print_ast_structure(ast)
-
-    if not config.no_optimisation:
-        optimiser_manager = OptimiserManager(
-            # TODO: Evtl. add rerun or reordering optimiser
-            # Also copy propagation possible with x0 = x1 + 0 to x0 = copy(x1)
-            [
-                StructuralTreePatternMatchingOptimiser(),
-            ]
-        )
-        optimised_ast = optimiser_manager.optimise(ast)
-    else:
+    # the passes of the optimisation level are rerun on rewritten regions until nothing changes (see
+    # OptimiserManager.optimise), then the loops which run at most once become IfNodes and copies CopyNodes
+    stats = OptimisationStats() if config.opt_stats else None
+    # the compiled pattern libraries are cached next to the ir cache
+    pattern_library.set_cache_directory(sys.path[0] + "/out/pattern_cache" if config.use_ir_cache else None)
+    optimiser_manager = pipelines.optimiser_manager(
+        config.optimisation_level, config.max_argument_id, config.use_ssa, stats, config.optimisation_workers,
+        config.pattern_libraries,
+    )
+    if config.optimisation_level == 0:
         print(f"{Fore.YELLOW}No optimisation applied{Style.RESET_ALL}")
-        optimised_ast = ast
+
+    # unchanged sources compiled with the same optimisers are loaded from the ir cache
+    # (not with --opt-stats, the statistics are collected while optimising)
+    ir_cache = IRCache(sys.path[0] + "/out/ir_cache") if config.use_ir_cache and stats is None else None
+    cached = None
+    if ir_cache:
+        cache_key = ir_cache.file_key(filepath, optimiser_manager.version())
+        cached = ir_cache.load(cache_key)
+
+    if cached is not None:
+        optimised_ast, symbol_table, constant_table = cached
+        print(f"{Fore.BLUE}Loaded optimised IR from cache{Style.RESET_ALL}")
+    else:
+        # parse the memory-mapped file directly into the custom ast (intermediate representation)
+        ast, symbol_table, constant_table = create_ir_from_file(filepath)
+
+        # print_ast_structure(ast)
+
+        # the tables are passed on, optimisers may add temporary variables and constants
+        optimised_ast = optimiser_manager.optimise(ast, symbol_table, constant_table)
+        if ir_cache:
+            ir_cache.store(cache_key, optimised_ast, symbol_table, constant_table)
+        if stats is not None:
+            print(stats.report())
 
     # print_ast_structure(optimised_ast)
 
+    if config.cost_report:
+        zero = symbol_table.initially_zero(config.max_argument_id) if symbol_table is not None else {0}
+        print(cost_report(optimised_ast, zero))
+
     wat = generate(optimised_ast, symbol_table, constant_table)
+    return write_wat(filepath, wat)
+
+
+def write_wat(filepath, wat):
+    """Write the WAT code compiled from a WHILE file to the out directory.
+
+    Args:
+        filepath (str): Path to the WHILE file the code was compiled from
+        wat (str): The WAT code
+
+    Returns:
+        str: Path to the written WAT file
+    """
     filename = os.path.basename(filepath)
     out_dir = sys.path[0] + "/out"
     os.makedirs(out_dir, exist_ok=True)
@@ -154,6 +189,70 @@ def generate_wat(filepath):
     return wat_filepath
 
 
+def minimal_compiler_watch(filepath, inputs, interval=0.5):
+    """Recompile and run a WHILE/EWHILE program every time the file changes.
+
+    Uses an IncrementalCompiler, so after the first compilation only the top-level
+    statements touched by an edit are parsed, optimised and generated again.
+    Runs until interrupted with Ctrl+C.
+
+    Args:
+        filepath (str): Path to the source file (.while or .ewhile)
+        inputs (list): List of input values for the program
+        interval (float, optional): Seconds between two checks of the file. Defaults to 0.5.
+
+    Returns:
+        str: Output from the last WASM execution
+    """
+    if config.optimisation_level == 0:
+        compiler = IncrementalCompiler()
+    else:
+        # no LoopInvariantOptimiser, ConstantPropagationOptimiser and DeadStoreOptimiser: values and liveness
+        # flow through the whole program, the regions are optimised on their own (and without the tables
+        # ArithmeticChainOptimiser can not add its merged constants)
+        compiler = IncrementalCompiler(
+            OptimiserManager([StructuralTreePatternMatchingOptimiser(), InductionVariableOptimiser()])
+        )
+
+    print(
+        f"{Back.BLUE}{Fore.WHITE}{Style.BRIGHT} WATCHING {filepath} (Ctrl+C to stop) {Style.RESET_ALL}"
+    )
+    output = ""
+    last_modified = None
+    try:
+        while True:
+            modified = os.path.getmtime(filepath)
+            if modified != last_modified:
+                last_modified = modified
+                try:
+                    while_filepath = (
+                        generate_while(filepath)
+                        if filepath.endswith(".ewhile")
+                        else filepath
+                    )
+                    with open(while_filepath, "r") as file:
+                        code = file.read()
+
+                    start = time.time()
+                    wat = compiler.compile(code)
+                    print(
+                        f"{Fore.BLUE}Recompiled in {time.time() - start:.3f}s:{Style.RESET_ALL} "
+                        f"{compiler.parsed_statements} statements parsed, {compiler.optimised_regions} regions generated"
+                    )
+                    wasm_filepath = generate_wasm(write_wat(while_filepath, wat))
+
+                    if not config.no_execution:
+                        output = run_wasm(wasm_filepath, inputs)
+                        print(output)
+                except (SyntaxError, RuntimeError) as e:
+                    print(
+                        f"{Back.RED}{Fore.WHITE} ERROR {Style.RESET_ALL} {Fore.RED}{str(e)}{Style.RESET_ALL}"
+                    )
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        return output
+
+
 def generate_wasm(filepath):
     """Generate a WebAssembly binary file from a WAT file.
 
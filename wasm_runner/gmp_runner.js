@@ -73,6 +73,7 @@ async function runWasmTest() {
         sub: (a, b, c) => gmpModule._sub(a, b, c),
         set_to_zero: (ptr) => gmpModule._set_to_zero(ptr),
         is_gt: (a, b) => gmpModule._is_gt(a, b),
+        is_equal: (a, b) => gmpModule._is_equal(a, b),
         copy: (dest, src) => gmpModule._copy(dest, src),
         mul: (output, a, b) => gmpModule._mul(output, a, b),
         div: (output, a, b) => gmpModule._big_div(output, a, b),
@@ -71,6 +71,7 @@ async function runWasmTest() {
         sub: libExports.sub,
         set_to_zero: libExports.set_to_zero,
         is_gt: libExports.is_gt,
+        is_equal: libExports.is_equal,
         copy: libExports.copy,
         mul: libExports.mul,
         div: libExports.big_div,